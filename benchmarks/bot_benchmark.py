@@ -0,0 +1,265 @@
+"""End-to-end MovieBot benchmark without Telegram.
+
+The real MovieBot handlers run on a generated database (datagen.py), with
+Bot API calls answered by fake_bot_api.py and channel membership checks by
+fake_telethon.py. Each scenario feeds updates through
+Application.process_update from a number of concurrent simulated users and
+records per-update latency:
+
+  menu          the Movies button: first catalog page (handle_message)
+  trending      the Trending button: first page of the user's trending list
+  browse        catalog page callbacks deeper in the list (handle_callback_query)
+  search        the Search button followed by a query
+  open          opening a movie card from a list
+  watch         the Watch button: watch history write and file send
+  later         the Watch Later button
+  remove        the Remove button under a Watch Later card
+  preview       the Send all button: a catalog page as media groups
+  lang          picking a language: settings write and main menu
+  subscription  get_subscription_status for random users (cache + Telethon stub)
+
+browse, open, watch, later, remove, preview and lang are one scenario per
+inline button action (callbacks.py), so each route's latency is measured
+through the router on its own.
+
+The send scheduler's flood limits are lifted so the numbers measure the bot
+rather than Telegram's rate limits. Results (p50/p95/p99 latency, updates/s)
+are printed and saved as JSON; --compare prints the change against an
+earlier results file. --metrics turns on the Prometheus instrumentation
+(metrics.py) to measure what it costs.
+
+Usage: python benchmarks/bot_benchmark.py [--scale 10k] [--requests 500] [--concurrency 20]
+       [--scenarios menu,search] [--telethon-latency-ms 50] [--metrics] [--output FILE] [--compare FILE]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+import metrics
+from bot import MovieBot, build_application
+from callbacks import encode
+from database import Database, AsyncDatabase
+from i18n import LANGUAGES, get_text
+from send_scheduler import SendScheduler
+from datagen import SCALES, default_path, generate
+from fake_bot_api import FakeBotAPI, make_callback_update, make_text_update
+from fake_telethon import FakeTelegramClient
+from search_benchmark import WORDS
+
+SCENARIOS = ['menu', 'trending', 'browse', 'search', 'open', 'watch', 'later', 'remove', 'preview', 'lang', 'subscription']
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+class Harness:
+    def __init__(self, db_path, telethon_latency):
+        self.api = FakeBotAPI().start()
+        database = Database(db_path)
+        conn = database.get_connection()
+        users = conn.execute('SELECT telegram_id, is_subscribed FROM users').fetchall()
+        self.movie_keys = [row[0] for row in conn.execute('SELECT id FROM movies')]
+        database.release_connection(conn)
+        
+        self.user_ids = [telegram_id for telegram_id, _ in users]
+        self.client = FakeTelegramClient(
+            members=[telegram_id for telegram_id, subscribed in users if subscribed],
+            latency=telethon_latency
+        )
+        self.bot = MovieBot(db=AsyncDatabase(database), client=self.client)
+        self.bot.sender = SendScheduler(1e9, 10 ** 6, 1e9, 10 ** 6, 256, 0)
+        self.bot.broadcasts.sender = self.bot.sender
+        self.application = build_application(self.bot, receive_updates=False, api_url=self.api.url)
+        self.errors = 0
+        self.application.add_error_handler(self.count_error)
+        self.update_ids = iter(range(1, 1 << 62))
+        self.pages = []
+    
+    async def count_error(self, update, context):
+        self.errors += 1
+        if self.errors <= 3:
+            print(f"Handler error: {context.error!r}")
+    
+    async def start(self):
+        await self.application.initialize()
+        self.bot.view_counter.start()
+        # post_init doesn't run here; subscription checks go straight to the Telethon stub
+        self.bot.subscription_state = metrics.UP
+        
+        started = time.perf_counter()
+        rows = await self.bot.trending.refresh()
+        print(f"Trending lists refreshed in {time.perf_counter() - started:.2f}s ({rows} ranked rows)")
+        
+        # Cursors for the first pages of the catalog, for the browse scenario
+        page = await self.bot.db.get_movies_page()
+        while page['next'] and len(self.pages) < 50:
+            self.pages.append(self.bot.page_callback('page', 'movies', page['next']))
+            page = await self.bot.db.get_movies_page(page['next'])
+    
+    async def stop(self):
+        # Same order as Application.run_polling: the application (and its persistence) first
+        await self.application.shutdown()
+        await self.bot.shutdown(self.application)
+        self.api.stop()
+    
+    async def process(self, data):
+        await self.application.process_update(Update.de_json(data, self.application.bot))
+    
+    def text(self, user_id, text):
+        return make_text_update(next(self.update_ids), user_id, text)
+    
+    def callback(self, user_id, data):
+        return make_callback_update(next(self.update_ids), user_id, data)
+    
+    async def run_scenario(self, name, user_id, rng):
+        """Run one iteration of a scenario; returns the measured latency in seconds"""
+        if name == 'search':
+            await self.process(self.text(user_id, get_text('en', 'search')))
+            update = self.text(user_id, rng.choice(WORDS))
+        elif name == 'subscription':
+            if rng.random() < 0.1:
+                self.bot.subscriptions.invalidate(user_id)
+            started = time.perf_counter()
+            user_row = await self.bot.db.get_user(user_id)
+            await self.bot.get_subscription_status(user_id, user_row)
+            return time.perf_counter() - started
+        elif name == 'menu':
+            update = self.text(user_id, get_text('en', 'movies'))
+        elif name == 'trending':
+            update = self.text(user_id, get_text('en', 'trending'))
+        elif name == 'browse':
+            update = self.callback(user_id, rng.choice(self.pages))
+        elif name == 'open':
+            update = self.callback(user_id, encode('open', 'movies', rng.choice(self.movie_keys)))
+        elif name == 'later':
+            update = self.callback(user_id, encode('later', rng.choice(self.movie_keys)))
+        elif name == 'remove':
+            update = self.callback(user_id, encode('remove_later', rng.choice(self.movie_keys)))
+        elif name == 'preview':
+            update = self.callback(user_id, self.bot.page_callback('preview', 'movies'))
+        elif name == 'lang':
+            update = self.callback(user_id, encode('lang', rng.choice(LANGUAGES)))
+        else:
+            update = self.callback(user_id, encode('watch', rng.choice(self.movie_keys)))
+        
+        started = time.perf_counter()
+        await self.process(update)
+        return time.perf_counter() - started
+    
+    async def measure(self, name, requests, concurrency):
+        latencies = []
+        remaining = requests
+        rng = random.Random(name)
+        
+        async def simulated_user(user_id):
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                latencies.append(await self.run_scenario(name, user_id, rng))
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(simulated_user(user_id) for user_id in rng.sample(self.user_ids, concurrency)))
+        elapsed = time.perf_counter() - started
+        return summarize(latencies, elapsed)
+
+
+def summarize(latencies, elapsed):
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'updates_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(cuts[49] * 1000, 2),
+        'p95_ms': round(cuts[94] * 1000, 2),
+        'p99_ms': round(cuts[98] * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2)
+    }
+
+
+def print_comparison(results, previous):
+    print(f"\nChange against {previous['timestamp']} ({previous['scale']}):")
+    for name, current in results['scenarios'].items():
+        before = previous['scenarios'].get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ('updates_per_second', 'p50_ms', 'p95_ms', 'p99_ms'):
+            if before[key]:
+                changes.append(f"{key} {(current[key] - before[key]) / before[key] * 100:+.0f}%")
+        print(f"  {name:13} " + '  '.join(changes))
+
+
+async def run(args, db_path):
+    harness = Harness(db_path, args.telethon_latency_ms / 1000)
+    await harness.start()
+    results = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'scale': args.scale,
+        'users': len(harness.user_ids),
+        'movies': len(harness.movie_keys),
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'telethon_latency_ms': args.telethon_latency_ms,
+        'metrics': metrics.enabled,
+        'python': platform.python_version(),
+        'scenarios': {}
+    }
+    try:
+        for name in args.scenarios.split(','):
+            results['scenarios'][name] = summary = await harness.measure(name, args.requests, args.concurrency)
+            print(
+                f"  {name:13} {summary['updates_per_second']:8.1f} upd/s  p50 {summary['p50_ms']:7.2f} ms  "
+                f"p95 {summary['p95_ms']:7.2f} ms  p99 {summary['p99_ms']:7.2f} ms"
+            )
+    finally:
+        await harness.stop()
+    results['bot_api_calls'] = dict(harness.api.calls)
+    results['telethon_calls'] = harness.client.calls
+    results['handler_errors'] = harness.errors
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--db', help='database to use instead of the generated one for --scale')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--telethon-latency-ms', type=float, default=50)
+    parser.add_argument('--metrics', action='store_true', help='enable the Prometheus instrumentation')
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    args = parser.parse_args()
+    
+    metrics.enabled = args.metrics
+    db_path = args.db or default_path(args.scale)
+    if not os.path.exists(db_path):
+        print(f"Generating {args.scale} dataset at {db_path}...")
+        generate(db_path, SCALES[args.scale])
+    
+    print(f"MovieBot benchmark: {args.scale}, {args.requests} requests per scenario, {args.concurrency} users at once")
+    results = asyncio.run(run(args, db_path))
+    
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bot_{args.scale}_{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+    
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
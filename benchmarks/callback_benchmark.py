@@ -0,0 +1,60 @@
+"""Time CallbackRouter.resolve per action, for current and legacy callback_data.
+
+The router is the bot's own (MovieBot.build_callback_router), so every
+registered action is covered.
+
+Usage: python benchmarks/callback_benchmark.py [runs]
+"""
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import MovieBot
+from callbacks import encode
+from database import Database, AsyncDatabase
+
+EXAMPLES = {
+    'lang': (('uz',), 'lang_uz'),
+    'page': (('later', 1, 1700000000, 87), 'page_later_p_1700000000_87'),
+    'preview': (('movies', 0, 1700000000, 1042), 'preview_movies_n_1700000000_1042'),
+    'open': (('history', 1042), 'open_history_AB12CD34'),
+    'watch': ((1042,), 'watch_AB12CD34'),
+    'later': ((1042,), 'watch_later_AB12CD34'),
+    'remove_later': ((1042,), 'remove_watch_later_AB12CD34')
+}
+
+
+def measure(router, data, runs):
+    """Microseconds per resolve"""
+    start = time.perf_counter()
+    for _ in range(runs):
+        router.resolve(data)
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Telethon is never called while routing
+        bot = MovieBot(db=AsyncDatabase(Database(db_path=os.path.join(tmp, 'bench.db'))), client=mock.Mock())
+        router = bot.callbacks
+        missing = set(router.routes) - set(EXAMPLES)
+        if missing:
+            raise SystemExit(f"No example callback_data for {', '.join(sorted(missing))}")
+        
+        print(f"{'action':14} {'current us':>10} {'legacy us':>10}")
+        for action in sorted(router.routes):
+            args, legacy = EXAMPLES[action]
+            current_us = measure(router, encode(action, *args), runs)
+            legacy_us = measure(router, legacy, runs)
+            print(f"{action:14} {current_us:10.2f} {legacy_us:10.2f}")
+        bot.db.close()
+
+
+if __name__ == '__main__':
+    main()
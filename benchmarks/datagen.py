@@ -0,0 +1,123 @@
+"""Generate a synthetic bot database: users, a movie catalog and watch history.
+
+Scales are named by user count (10k, 100k, 1M); the catalog gets one movie
+per ten users and every user watches a Zipf-distributed handful of movies
+spread over the last 30 days, so popular movies, DAU/WAU and the watch
+lists all look like a real bot's. About 90% of users are channel members.
+
+Usage: python benchmarks/datagen.py [--scale 10k|100k|1M] [--output PATH] [--seed N]
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from i18n import LANGUAGES
+from search_benchmark import GENRES, build_vocabulary
+
+SCALES = {'10k': 10000, '100k': 100000, '1M': 1000000}
+USER_BASE = 100000000
+CHUNK = 50000
+
+
+def default_path(scale):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', f'bench_{scale}.db')
+
+
+def insert_chunks(conn, sql, rows):
+    """Insert an iterable of rows CHUNK at a time, so 1M-user scales stay in memory; returns the row count"""
+    rows = iter(rows)
+    total = 0
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK))
+        if not chunk:
+            return total
+        conn.executemany(sql, chunk)
+        conn.commit()
+        total += len(chunk)
+
+
+def generate(path, users, movies=None, watches_per_user=5, seed=1):
+    """Create a fresh database at path; returns (users, movies, watched rows)"""
+    rng = random.Random(seed)
+    movies = movies or max(100, users // 10)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    
+    db = Database(path)
+    conn = db.get_connection()
+    
+    insert_chunks(conn, '''
+        INSERT INTO users (telegram_id, username, first_name, language, is_subscribed)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (
+        (USER_BASE + i, f'user{i}', f'User {i}', rng.choice(LANGUAGES), int(rng.random() < 0.9))
+        for i in range(users)
+    ))
+    
+    vocabulary = build_vocabulary(rng)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    insert_chunks(conn, '''
+        INSERT INTO movies (movie_id, title, description, genre, year, file_id, file_type, added_by, added_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now', ?))
+    ''', (
+        (f'M{i:07d}', ' '.join(rng.choices(vocabulary, weights, k=rng.randint(1, 4))).title(),
+         ' '.join(rng.choices(vocabulary, weights, k=rng.randint(8, 20))), rng.choice(GENRES),
+         rng.randint(1950, 2024), f'file{i}', rng.choice(('video', 'video', 'document')), 1,
+         f'-{movies - i} minutes')
+        for i in range(movies)
+    ))
+    
+    # Popularity follows a Zipf-like curve over a shuffled catalog
+    order = list(range(movies))
+    rng.shuffle(order)
+    cumulative = list(itertools.accumulate(1 / (rank + 1) ** 0.8 for rank in range(movies)))
+    
+    def picks(count):
+        return set(rng.choices(order, cum_weights=cumulative, k=count))
+    
+    watched = insert_chunks(conn, '''
+        INSERT OR IGNORE INTO watched_movies (user_id, movie_id, watched_at) VALUES (?, ?, datetime('now', ?))
+    ''', (
+        (user_id, f'M{movie:07d}', f'-{rng.randint(0, 30 * 24 * 60)} minutes')
+        for user_id in range(1, users + 1)
+        for movie in picks(rng.randint(0, watches_per_user * 2))
+    ))
+    insert_chunks(conn, 'INSERT OR IGNORE INTO watch_later (user_id, movie_id) VALUES (?, ?)', (
+        (user_id, f'M{movie:07d}')
+        for user_id in range(1, users + 1)
+        for movie in picks(rng.randint(0, 3))
+    ))
+    
+    conn.execute('''
+        UPDATE movies SET views = (SELECT COUNT(*) FROM watched_movies WHERE watched_movies.movie_id = movies.movie_id)
+    ''')
+    conn.commit()
+    conn.execute('ANALYZE')
+    db.release_connection(conn)
+    db.close()
+    return users, movies, watched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--output')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    
+    path = args.output or default_path(args.scale)
+    started = time.perf_counter()
+    users, movies, watched = generate(path, SCALES[args.scale], seed=args.seed)
+    print(f"{path}: {users} users, {movies} movies, {watched} watched rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Compare Database throughput with per-call connections vs the pooled WAL mode.
+
+Usage: python benchmarks/db_pool_benchmark.py [operations]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+
+def seed(db, users, movies):
+    for i in range(users):
+        db.add_user(1000 + i, username=f'user{i}')
+    for i in range(movies):
+        db.add_movie(f'M{i:07d}', f'Movie {i}', 'Description', 'Drama', 2000 + i % 25, f'file{i}', 'video', 1)
+
+
+def run_mix(db, operations, users, movies):
+    """The calls handle_message / handle_callback_query make per update"""
+    start = time.perf_counter()
+    for i in range(operations):
+        telegram_id = 1000 + i % users
+        user = db.get_user(telegram_id)
+        db.update_subscription_status(telegram_id, 1)
+        if i % 4 == 0:
+            db.add_to_watched(user[0], f'M{i % movies:07d}')
+        else:
+            db.get_movie_by_id(f'M{i % movies:07d}')
+    return operations / (time.perf_counter() - start)
+
+
+def main():
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    users, movies = 500, 200
+    results = {}
+    
+    for pooled in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(db_path=os.path.join(tmp, 'bench.db'), pooled=pooled)
+            seed(db, users, movies)
+            results[pooled] = run_mix(db, operations, users, movies)
+            db.close()
+    
+    print(f"per-call connections: {results[False]:10.0f} updates/sec")
+    print(f"pooled WAL mode:      {results[True]:10.0f} updates/sec")
+    print(f"speedup:              {results[True] / results[False]:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""A minimal in-process stand-in for the Telegram Bot API.
+
+Serves /bot<token>/<method> over plain HTTP from a background thread so the
+bot can be pointed at it with BOT_API_URL (or Application.builder().base_url).
+getUpdates long-polls a queue filled with push(); send methods answer with a
+fake message after an optional latency; everything else answers True.
+"""
+import collections
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Movie Bot', 'username': 'movie_test_bot'}
+
+
+def make_text_update(update_id, user_id, text):
+    """A recorded-style private text message update"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}', 'language_code': 'en'}
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+            'from': user,
+            'text': text
+        }
+    }
+
+
+def make_callback_update(update_id, user_id, data, message_id=1):
+    """A callback query from a button under one of the bot's messages"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}', 'language_code': 'en'}
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': user,
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+                'from': BOT_USER,
+                'text': 'Movies'
+            }
+        }
+    }
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+    
+    def handle_error(self, request, client_address):
+        pass  # clients hanging up mid long-poll on shutdown
+
+
+class FakeBotAPI:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.latency = latency
+        self.calls = collections.Counter()
+        self.webhook = None
+        self._updates = collections.deque()
+        self._message_ids = iter(range(1, 1 << 62))
+        self._lock = threading.Condition()
+        self.server = QuietHTTPServer((host, port), self._handler_class())
+        self._thread = None
+    
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def push(self, updates):
+        """Queue updates for getUpdates"""
+        with self._lock:
+            self._updates.extend(updates)
+            self._lock.notify_all()
+    
+    def _get_updates(self, params):
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._updates and self._updates[0]['update_id'] < offset:
+                self._updates.popleft()
+            while not self._updates and time.monotonic() < deadline:
+                self._lock.wait(deadline - time.monotonic())
+            return [self._updates[i] for i in range(min(limit, len(self._updates)))]
+    
+    def call(self, method, params):
+        self.calls[method] += 1
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'getUpdates':
+            return self._get_updates(params)
+        if method == 'setWebhook':
+            self.webhook = params
+            if params.get('drop_pending_updates'):
+                with self._lock:
+                    self._updates.clear()
+            return True
+        if method == 'deleteWebhook':
+            self.webhook = None
+            if params.get('drop_pending_updates'):
+                with self._lock:
+                    self._updates.clear()
+            return True
+        if method.startswith('send') or method.startswith('edit'):
+            if self.latency:
+                time.sleep(self.latency)
+            if method == 'sendMediaGroup':
+                return [self._message(params) for _ in params.get('media') or []]
+            return self._message(params)
+        return True
+    
+    def _message(self, params):
+        return {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(params.get('chat_id') or 0), 'type': 'private'},
+            'from': BOT_USER,
+            'text': params.get('text', '')
+        }
+    
+    def _handler_class(self):
+        api = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+            
+            def log_message(self, *args):
+                pass
+            
+            def _params(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode() if length else ''
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    return json.loads(body or '{}')
+                params = {}
+                for key, values in parse_qs(body).items():
+                    try:
+                        params[key] = json.loads(values[0])
+                    except ValueError:
+                        params[key] = values[0]
+                return params
+            
+            def do_POST(self):
+                method = self.path.rstrip('/').rsplit('/', 1)[-1]
+                payload = json.dumps({'ok': True, 'result': api.call(method, self._params())}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            do_GET = do_POST
+        
+        return Handler
+
+
+if __name__ == '__main__':
+    api = FakeBotAPI(port=8081).start()
+    print(f"Fake Bot API listening on {api.url} (set BOT_API_URL={api.url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        api.stop()
@@ -0,0 +1,71 @@
+"""An offline stand-in for the Telethon TelegramClient used by MovieBot.
+
+It implements just what check_subscription and ChannelMembership call:
+get_entity, get_permissions, iter_participants, the GetFullChannelRequest
+call and the event handler registration. Channel members are a plain set,
+and every network call sleeps for a configurable latency first, so the
+bot's subscription caching can be measured without Telegram.
+"""
+import asyncio
+import types
+
+from telethon.errors import UserNotParticipantError
+from telethon.tl.types import PeerChannel
+
+
+class FakeTelegramClient:
+    def __init__(self, members=(), channel_id=1001234567890, latency=0.05):
+        self.members = set(members)
+        self.channel_id = channel_id
+        self.latency = latency
+        self.handlers = []
+        self.calls = 0
+        self.connected = False
+    
+    def start(self, *args, **kwargs):
+        self.connected = True
+        return self
+    
+    async def connect(self):
+        self.connected = True
+    
+    async def disconnect(self):
+        self.connected = False
+    
+    def is_connected(self):
+        return self.connected
+    
+    async def is_user_authorized(self):
+        return True
+    
+    async def _network(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+    
+    async def get_entity(self, entity):
+        await self._network()
+        return PeerChannel(self.channel_id)
+    
+    async def get_permissions(self, entity, user_id):
+        await self._network()
+        if user_id not in self.members:
+            raise UserNotParticipantError(request=None)
+        return types.SimpleNamespace(is_admin=False, is_banned=False)
+    
+    async def iter_participants(self, entity):
+        await self._network()
+        for user_id in list(self.members):
+            yield types.SimpleNamespace(id=user_id)
+    
+    async def __call__(self, request):
+        await self._network()
+        full_chat = types.SimpleNamespace(participants_count=len(self.members))
+        return types.SimpleNamespace(full_chat=full_chat)
+    
+    def add_event_handler(self, callback, event=None):
+        self.handlers.append(callback)
+    
+    def remove_event_handler(self, callback, event=None):
+        if callback in self.handlers:
+            self.handlers.remove(callback)
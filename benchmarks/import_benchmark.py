@@ -0,0 +1,90 @@
+"""Catalog import throughput: catalog_import against one add_movie call per row.
+
+Writes a synthetic catalog (with a share of duplicate and invalid rows) as
+CSV and JSONL, imports each into a fresh database and reports rows per
+second, then times Database.add_movie, the one-connection-and-commit-per-row
+path, on a sample of the same rows for comparison.
+
+Usage: python benchmarks/import_benchmark.py [rows] [chunk_size]
+"""
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_import import FIELDS, import_catalog
+from database import Database
+from search_benchmark import GENRES, build_vocabulary
+
+BASELINE_ROWS = 2000
+
+
+def catalog_rows(count, seed=1):
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(rng)
+    rows = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.02 and rows:
+            rows.append(dict(rng.choice(rows)))  # duplicate
+            continue
+        row = {
+            'title': ' '.join(rng.choices(vocabulary, k=rng.randint(1, 4))).title() + f' {i}',
+            'description': ' '.join(rng.choices(vocabulary, k=rng.randint(8, 20))),
+            'genre': rng.choice(GENRES),
+            'year': rng.randint(1950, 2024),
+            'file_id': f'file{i}',
+            'file_type': rng.choice(('video', 'document'))
+        }
+        if roll > 0.99:
+            row['year'] = 'unknown'  # invalid
+        rows.append(row)
+    return rows
+
+
+def write_catalog(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            writer = csv.DictWriter(f, FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rows = catalog_rows(count)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{count} catalog rows, {chunk_size} per chunk")
+        for extension in ('csv', 'jsonl'):
+            path = os.path.join(directory, f'catalog.{extension}')
+            write_catalog(path, rows)
+            db = Database(os.path.join(directory, f'{extension}.db'))
+            report = import_catalog(db, path, chunk_size=chunk_size)
+            db.close()
+            print(
+                f"  {extension:5} import: {report['rows_per_second']:9.0f} rows/s  "
+                f"({report['imported']} imported, {report['duplicates']} duplicates, {report['invalid']} invalid)"
+            )
+        
+        db = Database(os.path.join(directory, 'baseline.db'), pooled=False)
+        started = time.perf_counter()
+        for i, row in enumerate(rows[:BASELINE_ROWS]):
+            db.add_movie(f'B{i:07d}', row['title'], row['description'], row['genre'], row['year'],
+                         row['file_id'], row['file_type'], None)
+        elapsed = time.perf_counter() - started
+        db.close()
+        print(f"  add_movie per row: {BASELINE_ROWS / elapsed:6.0f} rows/s  (first {BASELINE_ROWS} rows)")
+
+
+if __name__ == '__main__':
+    main()
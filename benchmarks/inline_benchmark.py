@@ -0,0 +1,107 @@
+"""Inline query latency: the in-memory title index against SQLite full-text search.
+
+Loads the PrefixIndex from a generated database (datagen.py), then answers
+typeahead queries the way a user types them (one, two, three letters,
+whole words, two-word queries) and reports per-query latency percentiles
+for the first page and for a deeper page. Each index answer is checked
+against a brute-force scan of the catalog. Database.search_movies on the
+same queries is timed for comparison.
+
+Usage: python benchmarks/inline_benchmark.py [--scale 10k] [--queries 2000] [--page-size 20]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import AsyncDatabase, Database
+from prefix_index import PrefixIndex, normalize_words
+from datagen import SCALES, default_path, generate
+
+
+def typeahead_queries(index, count, rng):
+    words = [word for movie_id in rng.sample(list(index.movies), min(2000, len(index.movies)))
+             for word in normalize_words(index.movies[movie_id][1])]
+    queries = []
+    for _ in range(count):
+        word = rng.choice(words)
+        kind = rng.random()
+        if kind < 0.5:
+            queries.append(word[:rng.randint(1, 3)])
+        elif kind < 0.8:
+            queries.append(word)
+        else:
+            queries.append(f"{word} {rng.choice(words)[:2]}")
+    return queries
+
+
+def brute_force(index, query):
+    terms = normalize_words(query)
+    return {
+        movie_id for movie_id, words in index._words.items()
+        if all(any(word.startswith(term) for word in words) for term in terms)
+    }
+
+
+def percentiles(latencies):
+    cuts = statistics.quantiles(latencies, n=100)
+    return f"p50 {cuts[49] * 1e6:8.1f} us  p99 {cuts[98] * 1e6:8.1f} us"
+
+
+async def run(args, db_path):
+    database = Database(db_path)
+    db = AsyncDatabase(database)
+    index = PrefixIndex(db, refresh_interval=60)
+    started = time.perf_counter()
+    await index.load()
+    print(f"Index of {len(index)} movies, {len(index._keys)} title words loaded in {time.perf_counter() - started:.2f}s")
+    
+    rng = random.Random(1)
+    queries = typeahead_queries(index, args.queries, rng)
+    for label, offset in (('first page', 0), ('page 5', 4 * args.page_size)):
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, offset, args.page_size)
+            latencies.append(time.perf_counter() - started)
+        print(f"  index, {label:10}  {percentiles(latencies)}")
+    
+    for query in queries[:200]:
+        expected = brute_force(index, query)
+        found, offset = [], 0
+        while offset is not None:
+            page, offset = index.search(query, offset, args.page_size)
+            found.extend(movie[0] for movie in page)
+        assert len(found) == len(set(found)) and set(found) == expected, query
+    print("  index answers match a brute-force scan")
+    
+    latencies = []
+    for query in queries[:500]:
+        started = time.perf_counter()
+        database.search_movies(query, limit=args.page_size)
+        latencies.append(time.perf_counter() - started)
+    print(f"  sqlite fts, first page {percentiles(latencies)}")
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--page-size', type=int, default=20)
+    args = parser.parse_args()
+    
+    db_path = default_path(args.scale)
+    if not os.path.exists(db_path):
+        print(f"Generating {args.scale} dataset at {db_path}...")
+        generate(db_path, SCALES[args.scale])
+    asyncio.run(run(args, db_path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Cost of one persistence run: SQLitePersistence against PicklePersistence.
+
+Both start from the same stored user_data for --users users. Each run marks
+--dirty of them as changed (plus as many untouched ones, which the
+application also hands over) and saves them the way Application does every
+update_interval. PicklePersistence (on_flush=False) rewrites its whole file
+for every changed user, so its cost grows with users times changes;
+SQLitePersistence writes just the changed rows in one transaction. Boot time (loading
+everything vs. nothing) and the cost of lazily loading one user are printed
+too.
+
+Usage: python benchmarks/persistence_benchmark.py [--users 100000] [--dirty 100] [--runs 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import PicklePersistence, PersistenceInput
+from database import Database, AsyncDatabase
+from persistence import SQLitePersistence
+
+STORE = PersistenceInput(bot_data=False, chat_data=False, callback_data=False)
+
+
+def user_data(user_id, run=0):
+    return {'waiting_for_search': bool((user_id + run) % 2), 'waiting_for_movie_id': False}
+
+
+async def persistence_run(persistence, args, run):
+    """One Application.update_persistence: the dirty users changed, as many again untouched"""
+    await asyncio.gather(*(
+        persistence.update_user_data(user_id, user_data(user_id, run if user_id < args.dirty else 0))
+        for user_id in range(args.dirty * 2)
+    ))
+
+
+async def measure(name, persistence, args):
+    started = time.perf_counter()
+    loaded = await persistence.get_user_data()
+    boot = time.perf_counter() - started
+    
+    timings = []
+    for run in range(1, args.runs + 1):
+        started = time.perf_counter()
+        await persistence_run(persistence, args, run)
+        await persistence.flush()
+        timings.append(time.perf_counter() - started)
+    
+    print(
+        f"  {name:8} boot {boot * 1000:8.1f} ms ({len(loaded)} users loaded)  "
+        f"run p50 {statistics.median(timings) * 1000:8.2f} ms  max {max(timings) * 1000:8.2f} ms"
+    )
+
+
+async def run(args, directory):
+    db = AsyncDatabase(Database(os.path.join(directory, 'bench.db')))
+    await db.save_persisted([('user', str(user_id), '{"waiting_for_search":false}') for user_id in range(args.users)])
+    sqlite_persistence = SQLitePersistence(db, store_data=STORE)
+    await measure('sqlite', sqlite_persistence, args)
+    
+    started = time.perf_counter()
+    await sqlite_persistence.refresh_user_data(args.users - 1, {})
+    print(f"  sqlite   lazy load of one user {(time.perf_counter() - started) * 1000:.2f} ms")
+    db.close()
+    
+    path = os.path.join(directory, 'bench.pickle')
+    seed = PicklePersistence(path, store_data=STORE, on_flush=True)
+    await seed.get_user_data()
+    for user_id in range(args.users):
+        await seed.update_user_data(user_id, {'waiting_for_search': False})
+    await seed.flush()
+    await measure('pickle', PicklePersistence(path, store_data=STORE, on_flush=False), args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--dirty', type=int, default=100)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    
+    print(f"{args.users} stored users, {args.dirty} changed per run, {args.runs} runs")
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, directory))
+
+
+if __name__ == '__main__':
+    main()
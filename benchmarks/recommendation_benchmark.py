@@ -0,0 +1,106 @@
+"""Recommendation build and lookup costs on a generated database (datagen.py).
+
+Times, on a copy of the dataset:
+
+  incremental  Recommender's path: watch events folded in batches
+  python       a full rebuild with plain Python counting
+  numpy        a full rebuild as a sparse matrix product (needs numpy and scipy)
+  lookup       get_similar_movies and get_recommendations, the reads the
+               bot makes per movie card and per main menu
+
+checks that all three builds produce the same co-occurrence counts, and
+reports how far the incremental top-k lists are from the rebuilt ones.
+
+Usage: python benchmarks/recommendation_benchmark.py [--scale 10k] [--batch-size 500] [--top-k 10]
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import recommendations
+from database import Database
+from datagen import SCALES, USER_BASE, default_path, generate
+
+
+def similar_lists(path):
+    conn = sqlite3.connect(path)
+    lists = {}
+    for movie_id, similar_id in conn.execute('SELECT movie_id, similar_id FROM movie_similar ORDER BY movie_id, rank'):
+        lists.setdefault(movie_id, []).append(similar_id)
+    conn.close()
+    return lists
+
+
+def cooccurrence(path):
+    conn = sqlite3.connect(path)
+    rows = sorted(conn.execute('SELECT movie_a, movie_b, count FROM movie_cooccurrence'))
+    conn.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+    
+    source = default_path(args.scale)
+    if not os.path.exists(source):
+        print(f"Generating {args.scale} dataset at {source}...")
+        generate(source, SCALES[args.scale])
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'recommendations.db')
+        shutil.copy(source, path)
+        db = Database(path)
+        
+        started = time.perf_counter()
+        events = 0
+        while True:
+            processed = db.apply_watch_events(args.batch_size, args.top_k)
+            if not processed:
+                break
+            events += processed
+        elapsed = time.perf_counter() - started
+        print(f"  incremental {elapsed:7.2f}s  {events / elapsed:8.0f} watch events/s  ({events} events)")
+        counts = cooccurrence(path)
+        incremental = similar_lists(path)
+        
+        builds = [('python', False)] + ([('numpy', True)] if recommendations.np is not None else [])
+        for name, vectorized in builds:
+            started = time.perf_counter()
+            movies, pairs = recommendations.rebuild(db, args.top_k, vectorized)
+            elapsed = time.perf_counter() - started
+            print(f"  {name:11} {elapsed:7.2f}s  ({movies} movies, {pairs} co-watch pairs)")
+            assert cooccurrence(path) == counts, f"{name} rebuild disagrees with the incremental counts"
+        rebuilt = similar_lists(path)
+        overlap = sum(len(set(incremental.get(movie_id, ())) & set(similar)) for movie_id, similar in rebuilt.items())
+        total = sum(len(similar) for similar in rebuilt.values())
+        print(f"  incremental top-k lists share {overlap / total:.0%} of the rebuilt lists' movies")
+        if recommendations.np is None:
+            print("  numpy       skipped, numpy/scipy not installed")
+        
+        rng = random.Random(1)
+        movie_ids = [row[1] for row in db.get_movie_titles()]
+        users = SCALES[args.scale]
+        for name, lookup in (
+            ('similar', lambda: db.get_similar_movies(rng.choice(movie_ids))),
+            ('menu row', lambda: db.get_recommendations(USER_BASE + rng.randrange(users)))
+        ):
+            started = time.perf_counter()
+            for _ in range(2000):
+                lookup()
+            print(f"  lookup {name:9} {(time.perf_counter() - started) / 2000 * 1e6:7.1f} us")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Post recorded update JSON to a running webhook endpoint.
+
+Each line of the input file is one Update object as Telegram would send it.
+Requests carry the X-Telegram-Bot-Api-Secret-Token header, so this is also a
+quick way to check the secret validation (a wrong secret gets 403).
+
+Usage: python benchmarks/replay_updates.py updates.jsonl [--url URL] [--secret S] [--concurrency N]
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+
+
+async def replay(url, secret, updates, concurrency=40):
+    """POST every update to url with at most concurrency requests in flight; returns status counts"""
+    statuses = collections.Counter()
+    queue = collections.deque(updates)
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def worker():
+            while queue:
+                update = queue.popleft()
+                try:
+                    response = await client.post(url, json=update, headers=headers)
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+        
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return statuses
+
+
+def load_updates(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('file')
+    parser.add_argument('--url', default=f"http://127.0.0.1:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+    parser.add_argument('--secret', default=WEBHOOK_SECRET)
+    parser.add_argument('--concurrency', type=int, default=40)
+    args = parser.parse_args()
+    
+    updates = load_updates(args.file)
+    started = time.perf_counter()
+    statuses = asyncio.run(replay(args.url, args.secret, updates, args.concurrency))
+    elapsed = time.perf_counter() - started
+    print(f"Posted {len(updates)} updates in {elapsed:.2f}s ({len(updates) / elapsed:.0f}/s): {dict(statuses)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Compare the old LIKE scan with the FTS5 index on a synthetic catalog.
+
+Usage: python benchmarks/search_benchmark.py [movies] [queries]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+WORDS = [
+    'dark', 'knight', 'love', 'war', 'city', 'night', 'return', 'legend', 'star', 'road',
+    'ночь', 'любовь', 'война', 'город', 'ёлки', 'брат', 'звезда', 'дорога', 'легенда', 'тайна',
+    "o'zbek", 'sevgi', 'yulduz', 'shahar', "g'alaba", 'tun', "qo'shiq", 'yo\'l', 'afsona', 'sir'
+]
+GENRES = ['Drama', 'Comedy', 'Action', 'Драма', 'Комедия', 'Боевик', 'Drama', 'Komediya', 'Jangari']
+SYLLABLES = [
+    ['ka', 'lo', 'mi', 'ren', 'tor', 'sa', 'vel', 'dun', 'ar', 'is'],
+    ['ка', 'ло', 'ми', 'рен', 'тор', 'са', 'вел', 'дун', 'ар', 'ис'],
+    ["o'", 'g\'a', 'sh', 'qi', 'yo', 'zu', 'bek', 'xon', 'lar', 'chi']
+]
+
+
+def build_vocabulary(rng, size=6000):
+    """Seed words plus generated Latin, Cyrillic and Uzbek-looking words"""
+    vocabulary = list(WORDS)
+    while len(vocabulary) < size:
+        syllables = rng.choice(SYLLABLES)
+        vocabulary.append(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return vocabulary
+
+
+def generate_catalog(db, count, vocabulary):
+    rng = random.Random(42)
+    # Zipf-like word frequencies, as in real titles and descriptions
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    rows = []
+    for i in range(count):
+        title = ' '.join(rng.choices(vocabulary, weights, k=rng.randint(1, 4)))
+        description = ' '.join(rng.choices(vocabulary, weights, k=rng.randint(8, 20)))
+        rows.append((f'M{i:07d}', title.title(), description, rng.choice(GENRES),
+                     rng.randint(1950, 2024), f'file{i}', 'video', 1))
+    
+    conn = db.get_connection()
+    conn.executemany('''
+        INSERT INTO movies (movie_id, title, description, genre, year, file_id, file_type, added_by)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    db.release_connection(conn)
+
+
+def like_search(db, query, limit=10):
+    """The search_movies query before the FTS index"""
+    conn = db.get_connection()
+    movies = conn.execute('''
+        SELECT * FROM movies 
+        WHERE title LIKE ? OR description LIKE ? OR genre LIKE ?
+    ''', (f'%{query}%', f'%{query}%', f'%{query}%')).fetchall()
+    db.release_connection(conn)
+    return movies[:limit]
+
+
+def measure(search, queries):
+    start = time.perf_counter()
+    for query in queries:
+        search(query)
+    elapsed = time.perf_counter() - start
+    return len(queries) / elapsed, elapsed / len(queries) * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(7)
+    vocabulary = build_vocabulary(rng)
+    queries = [rng.choice(vocabulary)[:rng.randint(3, 6)] for _ in range(query_count)]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_path=os.path.join(tmp, 'bench.db'))
+        start = time.perf_counter()
+        generate_catalog(db, count, vocabulary)
+        print(f"Generated {count} movies in {time.perf_counter() - start:.1f}s")
+        
+        like_qps, like_ms = measure(lambda q: like_search(db, q), queries)
+        fts_qps, fts_ms = measure(lambda q: db.search_movies(q), queries)
+        db.close()
+    
+    print(f"LIKE scan:  {like_qps:8.1f} queries/sec  {like_ms:8.2f} ms/query")
+    print(f"FTS5 bm25:  {fts_qps:8.1f} queries/sec  {fts_ms:8.2f} ms/query")
+    print(f"speedup:    {fts_qps / like_qps:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
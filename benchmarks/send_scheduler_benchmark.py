@@ -0,0 +1,124 @@
+"""Drive the SendScheduler against a fake Bot API that enforces Telegram's flood limits.
+
+The fake answers 429 (RetryAfter) when more than 30 messages are sent in any
+one-second window, or more than 3 to the same chat. Sends are first fired
+straight at the API, then through the scheduler.
+
+Usage: python benchmarks/send_scheduler_benchmark.py [messages] [chats]
+"""
+import asyncio
+import collections
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.error import RetryAfter
+from config import (
+    SEND_GLOBAL_RATE, SEND_GLOBAL_BURST, SEND_PER_CHAT_RATE, SEND_PER_CHAT_BURST,
+    SEND_MAX_IN_FLIGHT, SEND_MAX_RETRIES
+)
+from send_scheduler import SendScheduler, INTERACTIVE, BULK
+
+
+class FakeBotAPI:
+    def __init__(self, global_limit=30, per_chat_limit=3, window=1.0, latency=0.03):
+        self.global_limit = global_limit
+        self.per_chat_limit = per_chat_limit
+        self.window = window
+        self.latency = latency
+        self.sent = collections.deque()
+        self.sent_per_chat = collections.defaultdict(collections.deque)
+        self.delivered = 0
+        self.rejected = 0
+    
+    def _expire(self, queue, now):
+        while queue and now - queue[0] >= self.window:
+            queue.popleft()
+    
+    async def send_message(self, chat_id, text):
+        await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        chat_queue = self.sent_per_chat[chat_id]
+        self._expire(self.sent, now)
+        self._expire(chat_queue, now)
+        if len(self.sent) >= self.global_limit or len(chat_queue) >= self.per_chat_limit:
+            self.rejected += 1
+            raise RetryAfter(1)
+        self.sent.append(now)
+        chat_queue.append(now)
+        self.delivered += 1
+        return True
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+async def direct(messages):
+    api = FakeBotAPI()
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(api.send_message(chat_id, 'hi') for chat_id, _ in messages),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for result in results if isinstance(result, Exception))
+    return api, elapsed, failed
+
+
+async def scheduled(messages):
+    api = FakeBotAPI()
+    scheduler = SendScheduler(
+        SEND_GLOBAL_RATE, SEND_GLOBAL_BURST, SEND_PER_CHAT_RATE, SEND_PER_CHAT_BURST,
+        SEND_MAX_IN_FLIGHT, SEND_MAX_RETRIES
+    )
+    latencies = {INTERACTIVE: [], BULK: []}
+    
+    async def one(chat_id, priority):
+        queued = time.perf_counter()
+        await scheduler.send(chat_id, api.send_message, chat_id, 'hi', priority=priority)
+        latencies[priority].append(time.perf_counter() - queued)
+    
+    async def interactive_trickle():
+        # Users keep tapping buttons while the bulk backlog drains
+        for chat_id, _ in [m for m in messages if m[1] == INTERACTIVE]:
+            await asyncio.sleep(0.1)
+            asyncio.ensure_future(one(chat_id, INTERACTIVE))
+    
+    start = time.perf_counter()
+    bulk = [one(chat_id, BULK) for chat_id, priority in messages if priority == BULK]
+    await asyncio.gather(interactive_trickle(), *bulk)
+    while sum(len(values) for values in latencies.values()) < len(messages):
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    stats = scheduler.stats()
+    await scheduler.stop()
+    return api, elapsed, latencies, stats
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    chats = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rng = random.Random(1)
+    messages = [
+        (rng.randrange(chats), INTERACTIVE if rng.random() < 0.1 else BULK)
+        for _ in range(total)
+    ]
+    
+    api, elapsed, failed = asyncio.run(direct(messages))
+    print(f"direct:    {api.delivered} of {total} delivered, {failed} failed with 429")
+    
+    api, elapsed, latencies, stats = asyncio.run(scheduled(messages))
+    print(f"scheduled: {api.delivered / elapsed:6.1f} msg/s delivered, {api.rejected} 429 responses, "
+          f"{stats['failed']} failed (limit {SEND_GLOBAL_RATE:.0f} msg/s)")
+    for priority, name in ((INTERACTIVE, 'interactive'), (BULK, 'bulk')):
+        values = latencies[priority]
+        print(f"  {name:12s} p50 {percentile(values, 0.5) * 1000:7.0f} ms   p95 {percentile(values, 0.95) * 1000:7.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
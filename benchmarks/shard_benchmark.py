@@ -0,0 +1,93 @@
+"""Update throughput of the sharded mode as the number of worker processes grows.
+
+A FrontReceiver long-polls the fake Bot API (fake_bot_api.py) and shards the
+updates over N worker processes. Each worker runs a real Application whose
+handler renders a page of movies into a text message with an inline
+keyboard and sends it, which is the bulk of the CPU the bot spends per
+update. Throughput is measured until every update has been answered.
+
+Scaling is bounded by the machine's cores; on a single core the extra
+processes only add IPC overhead.
+
+Usage: python benchmarks/shard_benchmark.py [updates] [users] [max_workers]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import Application, MessageHandler, filters
+from callbacks import encode
+from fake_bot_api import FakeBotAPI, make_text_update
+from i18n import get_text
+from sharding import FrontReceiver
+from update_processor import PerUserUpdateProcessor
+
+API_URL = None
+MOVIES = [(i, f"M{i:07d}", f"Movie {i}", '', 'Drama', 2000 + i % 25) for i in range(10)]
+
+
+async def render_page(update: Update, context):
+    lines = [f"{number}. {movie[2]} ({movie[5]}) · {movie[4]}" for number, movie in enumerate(MOVIES, 1)]
+    keyboard = [
+        [InlineKeyboardButton(str(number), callback_data=encode('open', 'movies', movie[0])) for number, movie in row]
+        for row in (list(enumerate(MOVIES, 1))[:5], list(enumerate(MOVIES, 1))[5:])
+    ]
+    keyboard.append([InlineKeyboardButton('▶️', callback_data=encode('page', 'movies', 0, 0, 0))])
+    text = get_text('en', 'movies') + '\n\n' + '\n'.join(lines)
+    await context.bot.send_message(update.effective_chat.id, text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+
+def build_benchmark_application(index, workers, bus):
+    application = (
+        Application.builder()
+        .token('123456:SHARDS')
+        .base_url(f"{API_URL}/bot")
+        .concurrent_updates(PerUserUpdateProcessor(64))
+        .updater(None)
+        .build()
+    )
+    application.add_handler(MessageHandler(filters.TEXT, render_page))
+    return application
+
+
+async def measure(api, front, total):
+    poller = asyncio.create_task(front.poll(timeout=1))
+    started = time.perf_counter()
+    while api.calls['sendMessage'] < total:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    poller.cancel()
+    return elapsed
+
+
+def main():
+    global API_URL
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    updates = [make_text_update(i + 1, 1000 + i % users, 'movies') for i in range(total)]
+    
+    print(f"{total} updates from {users} users, {os.cpu_count()} CPUs")
+    workers = 1
+    while workers <= max_workers:
+        api = FakeBotAPI().start()
+        API_URL = api.url
+        front = FrontReceiver(workers, build_benchmark_application, '123456:SHARDS', base_url=api.url)
+        front.start()
+        try:
+            time.sleep(1)  # let the workers initialize before the clock starts
+            api.push(updates)
+            elapsed = asyncio.run(measure(api, front, total))
+        finally:
+            front.stop()
+            api.stop()
+        print(f"  {workers} workers: {elapsed:6.2f}s  {total / elapsed:7.0f} updates/s")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Stress the per-user update processor and check that each user's updates stay in order.
+
+Many users each send a numbered burst of text messages, randomly interleaved, into a
+real Application (Bot API calls go to fake_bot_api.py). The handler mimics
+the bot's multi-step flows: it sets a flag in context.user_data, awaits a
+random delay and checks the flag is still its own before clearing it.
+Any overtaking or interleaving within one user is counted as a violation.
+
+The same load is run with PTB's plain concurrent processing for comparison.
+
+Usage: python benchmarks/update_ordering_stress.py [users] [messages_per_user] [concurrency]
+"""
+import asyncio
+import collections
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+from telegram.ext import Application, MessageHandler, SimpleUpdateProcessor, filters
+from fake_bot_api import FakeBotAPI, make_text_update
+from update_processor import PerUserUpdateProcessor
+
+
+async def run(api, processor, updates, concurrency):
+    seen = collections.defaultdict(list)
+    stats = {'raced': 0, 'running': 0, 'peak': 0, 'users_overlapping': 0}
+    active_users = set()
+    done = asyncio.Event()
+    remaining = len(updates)
+    
+    async def handle(update: Update, context):
+        nonlocal remaining
+        user_id = update.effective_user.id
+        stats['running'] += 1
+        stats['peak'] = max(stats['peak'], stats['running'])
+        active_users.add(user_id)
+        stats['users_overlapping'] = max(stats['users_overlapping'], len(active_users))
+        try:
+            seen[user_id].append(int(update.message.text))
+            if context.user_data.get('waiting_for_search'):
+                stats['raced'] += 1
+            context.user_data['waiting_for_search'] = update.message.text
+            await asyncio.sleep(random.uniform(0, 0.01))
+            if context.user_data.get('waiting_for_search') != update.message.text:
+                stats['raced'] += 1
+            context.user_data['waiting_for_search'] = None
+        finally:
+            stats['running'] -= 1
+            active_users.discard(user_id)
+            remaining -= 1
+            if remaining == 0:
+                done.set()
+    
+    application = (
+        Application.builder()
+        .token('123456:STRESS')
+        .base_url(f"{api.url}/bot")
+        .concurrent_updates(processor)
+        .build()
+    )
+    application.add_handler(MessageHandler(filters.TEXT, handle))
+    
+    async with application:
+        await application.start()
+        started = time.perf_counter()
+        for data in updates:
+            await application.update_queue.put(Update.de_json(data, application.bot))
+        await done.wait()
+        elapsed = time.perf_counter() - started
+        await application.stop()
+    
+    out_of_order = sum(1 for numbers in seen.values() if numbers != sorted(numbers))
+    print(
+        f"  {type(processor).__name__:24} {elapsed:5.2f}s  users out of order: {out_of_order:4}  "
+        f"user_data races: {stats['raced']:4}  peak in flight: {stats['peak']}/{concurrency}  "
+        f"peak users in parallel: {stats['users_overlapping']}"
+    )
+    return out_of_order, stats
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    
+    # Randomly interleave the users' bursts, each burst numbered in send order
+    senders = [1000 + user for user in range(users) for _ in range(per_user)]
+    random.shuffle(senders)
+    sent = collections.Counter()
+    updates = []
+    for user_id in senders:
+        updates.append(make_text_update(len(updates) + 1, user_id, str(sent[user_id])))
+        sent[user_id] += 1
+    
+    print(f"{users} users x {per_user} messages, {concurrency} updates in flight")
+    api = FakeBotAPI().start()
+    try:
+        out_of_order, stats = asyncio.run(run(api, PerUserUpdateProcessor(concurrency), updates, concurrency))
+        asyncio.run(run(api, SimpleUpdateProcessor(concurrency), updates, concurrency))
+    finally:
+        api.stop()
+    
+    assert out_of_order == 0 and stats['raced'] == 0, 'per-user ordering violated'
+    assert stats['peak'] <= concurrency, 'in-flight limit exceeded'
+    print("Per-user ordering held")
+
+
+if __name__ == '__main__':
+    main()
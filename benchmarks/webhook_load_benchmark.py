@@ -0,0 +1,122 @@
+"""Compare update throughput of long polling and webhook mode.
+
+Both modes run a real python-telegram-bot Application against the fake Bot
+API in fake_bot_api.py; every update is a text message whose handler answers
+with one sendMessage. In polling mode the updates are queued on the fake API
+and fetched with getUpdates; in webhook mode they are POSTed to the embedded
+webhook server with the secret token, the way Telegram delivers them.
+The fake API and the replay client share the process with the bot, so on a
+small machine the absolute numbers are CPU bound; compare the two modes.
+
+Usage: python benchmarks/webhook_load_benchmark.py [updates] [users] [api_latency_ms]
+"""
+import asyncio
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+from telegram.ext import Application, MessageHandler, filters
+from fake_bot_api import FakeBotAPI, make_text_update
+from replay_updates import replay
+
+SECRET = 'load-test-secret'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def build_app(api, total, done):
+    handled = 0
+    
+    async def answer(update: Update, context):
+        nonlocal handled
+        try:
+            await context.bot.send_message(update.effective_chat.id, 'ok')
+        finally:
+            handled += 1
+            if handled == total:
+                done.set()
+    
+    application = (
+        Application.builder()
+        .token('123456:LOADTEST')
+        .base_url(f"{api.url}/bot")
+        .concurrent_updates(256)
+        .connection_pool_size(64)
+        .build()
+    )
+    application.add_handler(MessageHandler(filters.TEXT, answer))
+    return application
+
+
+async def run_polling(updates, latency):
+    api = FakeBotAPI(latency=latency).start()
+    done = asyncio.Event()
+    application = build_app(api, len(updates), done)
+    await application.initialize()
+    try:
+        api.push(updates)
+        started = time.perf_counter()
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+        await application.start()
+        await done.wait()
+        elapsed = time.perf_counter() - started
+        await application.updater.stop()
+        await application.stop()
+    finally:
+        await application.shutdown()
+        api.stop()
+    return elapsed, api.calls['getUpdates']
+
+
+async def run_webhook(updates, latency):
+    api = FakeBotAPI(latency=latency).start()
+    done = asyncio.Event()
+    application = build_app(api, len(updates), done)
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/telegram"
+    await application.initialize()
+    try:
+        await application.updater.start_webhook(
+            listen='127.0.0.1', port=port, url_path='telegram', webhook_url=url,
+            secret_token=SECRET, max_connections=100, drop_pending_updates=True
+        )
+        await application.start()
+        
+        rejected = await replay(url, 'wrong-secret', updates[:1], concurrency=1)
+        assert set(rejected) == {403}, f"webhook accepted a wrong secret token: {dict(rejected)}"
+        
+        started = time.perf_counter()
+        statuses = await replay(url, SECRET, updates, concurrency=100)
+        await done.wait()
+        elapsed = time.perf_counter() - started
+        await application.updater.stop()
+        await application.stop()
+    finally:
+        await application.shutdown()
+        api.stop()
+    return elapsed, statuses
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 20) / 1000
+    updates = [make_text_update(i + 1, 1000 + i % users, 'hello') for i in range(total)]
+    
+    print(f"{total} updates from {users} users, {latency * 1000:.0f} ms Bot API latency")
+    elapsed, polls = asyncio.run(run_polling(updates, latency))
+    print(f"  polling: {elapsed:6.2f}s  {total / elapsed:7.0f} updates/s  ({polls} getUpdates calls)")
+    elapsed, statuses = asyncio.run(run_webhook(updates, latency))
+    print(f"  webhook: {elapsed:6.2f}s  {total / elapsed:7.0f} updates/s  (HTTP {dict(statuses)})")
+
+
+if __name__ == '__main__':
+    main()
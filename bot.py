@@ -1,253 +1,326 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
+from telegram import (
+    Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton, ChatMember,
+    InputMediaVideo, InputMediaDocument, InlineQueryResultArticle, InputTextMessageContent
+)
+from telegram.ext import (
+    Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler, ChatMemberHandler,
+    InlineQueryHandler
+)
 from telethon import TelegramClient
 from telethon.errors import UserNotParticipantError, ChatAdminRequiredError, PeerIdInvalidError
-from config import API_ID, API_HASH, BOT_TOKEN, CHANNEL_ID, ADMIN_IDS
-from database import Database
+from config import (
+    API_ID, API_HASH, BOT_TOKEN, CHANNEL_ID, ADMIN_IDS,
+    SUBSCRIPTION_POSITIVE_TTL, SUBSCRIPTION_NEGATIVE_TTL, MEMBERSHIP_RECONCILE_INTERVAL,
+    VIEW_FLUSH_INTERVAL, VIEW_FLUSH_THRESHOLD, LIST_RENDER_MODE, MEDIA_GROUP_SIZE,
+    SEND_GLOBAL_RATE, SEND_GLOBAL_BURST, SEND_PER_CHAT_RATE, SEND_PER_CHAT_BURST,
+    SEND_MAX_IN_FLIGHT, SEND_MAX_RETRIES, BROADCAST_RATE, BROADCAST_CONCURRENCY,
+    BROADCAST_CHUNK_SIZE, BROADCAST_PROGRESS_INTERVAL, BOT_MODE, WEBHOOK_URL, WEBHOOK_LISTEN,
+    WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS, DROP_PENDING_UPDATES,
+    BOT_API_URL, UPDATE_CONCURRENCY, SHARD_WORKERS, METRICS_HOST, METRICS_PORT,
+    INLINE_CACHE_TIME, INLINE_PAGE_SIZE, TITLE_INDEX_REFRESH_INTERVAL, RECOMMENDATION_TOP_K,
+    RECOMMENDATION_ROW_SIZE, RECOMMENDATION_REFRESH_INTERVAL, RECOMMENDATION_BATCH_SIZE,
+    TRENDING_REFRESH_INTERVAL, TRENDING_SIZE, TRENDING_BY_LANGUAGE, TELETHON_SESSION, TELETHON_RETRY_MAX_DELAY,
+    TELETHON_AUTH_RECHECK_INTERVAL, BACKGROUND_START_DELAY, PERSISTENCE_ENABLED, PERSISTENCE_UPDATE_INTERVAL
+)
+from database import Database, AsyncDatabase
+from i18n import LANGUAGES, get_text, resolve_button
+from membership import ChannelMembership
+from subscription import SubscriptionCache
+from view_counter import ViewCounter
+from send_scheduler import SendScheduler, INTERACTIVE
+from broadcast import BroadcastEngine
+from update_processor import PerUserUpdateProcessor
+from sharding import FrontReceiver, shard_session
+from catalog_import import EXTENSIONS, import_catalog_async
+from prefix_index import PrefixIndex
+from recommendations import Recommender
+from trending import Trending, PERIODS, DEFAULT_PERIOD
+from callbacks import CallbackRouter, movie_key, encode, action_name
+from startup import StartupReport
+from persistence import SQLitePersistence
+import metrics
 import asyncio
+import os
+import tempfile
+import time
 import re
 import random
 import string
 
 class MovieBot:
-    def __init__(self):
-        self.db = Database()
-        self.client = TelegramClient('session', API_ID, API_HASH)
-        self.setup_client()
+    def __init__(self, session=TELETHON_SESSION, workers=1, primary=True, db=None, client=None, client_factory=None):
+        # With several shard workers each one gets its share of the global send rate,
+        # and only the primary worker runs process-wide jobs
+        self.primary = primary
+        self.bus = None
+        self.metrics_port = METRICS_PORT
+        self._metrics_server = None
+        self._loop_monitor = None
+        self._telethon_task = None
+        # Until Telethon is connected and logged in, subscriptions are taken from the stored status
+        self.subscription_state = metrics.STARTING
+        self.startup = StartupReport()
+        with self.startup.phase('database'):
+            self.db = db or AsyncDatabase()
+        self.view_counter = ViewCounter(self.db, VIEW_FLUSH_INTERVAL, VIEW_FLUSH_THRESHOLD)
+        self.title_index = PrefixIndex(self.db, TITLE_INDEX_REFRESH_INTERVAL)
+        self.recommender = Recommender(
+            self.db, RECOMMENDATION_TOP_K, RECOMMENDATION_REFRESH_INTERVAL, RECOMMENDATION_BATCH_SIZE
+        )
+        self.trending = Trending(self.db, TRENDING_REFRESH_INTERVAL, TRENDING_SIZE, TRENDING_BY_LANGUAGE)
+        self.sender = SendScheduler(
+            SEND_GLOBAL_RATE / workers, max(1, SEND_GLOBAL_BURST // workers), SEND_PER_CHAT_RATE,
+            SEND_PER_CHAT_BURST, SEND_MAX_IN_FLIGHT, SEND_MAX_RETRIES
+        )
+        self.broadcasts = BroadcastEngine(
+            self.db, self.sender, BROADCAST_RATE, BROADCAST_CONCURRENCY,
+            BROADCAST_CHUNK_SIZE, BROADCAST_PROGRESS_INTERVAL
+        )
+        self.subscriptions = SubscriptionCache(SUBSCRIPTION_POSITIVE_TTL, SUBSCRIPTION_NEGATIVE_TTL)
+        self.callbacks = self.build_callback_router()
+        # Called again to pick up a session that was logged in after startup
+        self.client_factory = client_factory or (lambda: TelegramClient(session, API_ID, API_HASH))
+        self.client = client or self.client_factory()
+        channel = CHANNEL_ID if CHANNEL_ID.startswith('@') else f"@{CHANNEL_ID}"
+        self.membership = ChannelMembership(self.client, channel, MEMBERSHIP_RECONCILE_INTERVAL)
+        self.membership.on_change = self.membership_changed
+        self.membership.on_snapshot = self.membership_snapshot
     
-    def setup_client(self):
-        """Setup Telethon client for subscription checking"""
+    async def connect_telethon(self):
+        """Connect the Telethon client for subscription checking, retrying with backoff until it's up.
+        
+        A session that isn't logged in is re-checked every
+        TELETHON_AUTH_RECHECK_INTERVAL with a fresh client, which re-reads the
+        session file, so a `manage.py telethon-login` run meanwhile takes
+        effect without a restart.
+        """
+        started = time.perf_counter()
+        delay = 1
+        while True:
+            try:
+                await self.client.connect()
+                if await self.client.is_user_authorized():
+                    break
+                if self.subscription_state != metrics.UNAVAILABLE:
+                    # Logging in is interactive, so it can't happen here
+                    print(
+                        "Telethon session is not logged in; run `python manage.py telethon-login`, "
+                        f"it is checked again every {TELETHON_AUTH_RECHECK_INTERVAL}s"
+                    )
+                    self.startup.record('telethon', time.perf_counter() - started, False)
+                    self.set_subscription_state(metrics.UNAVAILABLE)
+                await asyncio.sleep(TELETHON_AUTH_RECHECK_INTERVAL)
+                await self.client.disconnect()
+                self.client = self.membership.client = self.client_factory()
+                continue
+            except Exception as e:
+                print(f"Error connecting Telethon client: {e}; retrying in {delay}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, TELETHON_RETRY_MAX_DELAY)
+        if self.subscription_state == metrics.UNAVAILABLE:
+            print("Telethon session is logged in now")
+        self.startup.record('telethon', time.perf_counter() - started)
+        
+        # The primary worker takes the snapshots and follows participant
+        # events; the others get both over the bus but resolve the channel
+        # themselves so they can match chat_member updates
         try:
-            self.client.start()
+            with self.startup.phase('membership snapshot' if self.primary else 'channel'):
+                if self.primary:
+                    await self.membership.start()
+                else:
+                    await self.membership.get_entity()
         except Exception as e:
-            print(f"Error starting Telethon client: {e}")
+            print(f"Error starting channel membership tracking: {e}")
+        self.set_subscription_state(metrics.UP)
+        print(f"Subscription checks available {self.startup.elapsed():.2f}s after start")
+    
+    def set_subscription_state(self, state):
+        self.subscription_state = state
+        metrics.READY.set(state, 'subscriptions')
+    
+    def attach_bus(self, bus):
+        """Share cache invalidations with the other shard workers"""
+        self.bus = bus
+        bus.subscribe('subscription', lambda user_id, status: self.set_subscription(user_id, status, publish=False))
+        bus.subscribe('catalog', lambda: asyncio.ensure_future(self.title_index.refresh()))
+        bus.subscribe('membership', self.membership_received)
+        bus.subscribe('membership_snapshot', self.membership.replace)
+    
+    def set_subscription(self, user_id, is_subscribed, publish=True):
+        self.subscriptions.set(user_id, is_subscribed)
+        if publish and self.bus:
+            self.bus.publish('subscription', user_id, is_subscribed)
+    
+    def membership_changed(self, user_id, is_member):
+        """A join or leave seen by this worker; the other workers' member sets follow"""
+        self.subscriptions.set(user_id, is_member)
+        if self.bus:
+            self.bus.publish('membership', user_id, is_member)
+    
+    def membership_received(self, user_id, is_member):
+        self.membership.apply(user_id, is_member, notify=False)
+        self.subscriptions.set(user_id, is_member)
+    
+    def membership_snapshot(self, members, complete):
+        if self.bus:
+            # A copy: the set keeps changing while the queue's feeder thread pickles it
+            self.bus.publish('membership_snapshot', list(members), complete)
     
     async def check_subscription(self, user_id):
         """Check if user is subscribed to the channel with proper error handling"""
+        started = time.perf_counter()
         try:
-            # Convert channel ID to proper format
-            if CHANNEL_ID.startswith('@'):
-                channel = CHANNEL_ID
-            else:
-                channel = f"@{CHANNEL_ID}"
-            
-            # Try to get participant info
-            entity = await self.client.get_entity(channel)
+            # The channel entity is resolved once and reused
+            entity = await self.membership.get_entity()
             participant = await self.client.get_permissions(entity, user_id)
             
             # If we get here without exception, user is subscribed
+            metrics.TELETHON_CALLS.inc('get_permissions', 'member')
             return True
         except UserNotParticipantError:
             # User is not subscribed
+            metrics.TELETHON_CALLS.inc('get_permissions', 'not_member')
             return False
-        except (ChatAdminRequiredError, ValueError, PeerIdInvalidError):
+        except (ChatAdminRequiredError, ValueError, PeerIdInvalidError) as e:
             # Bot doesn't have admin rights or invalid channel
-            # Alternative method: try to invite user (to check if they're not banned/subscribed)
-            try:
-                entity = await self.client.get_entity(channel)
-                # Try to get full channel info which might reveal subscription status
-                full_channel = await self.client.get_entity(entity)
-                # This is a fallback - in practice, you might want to log this issue
-                # since proper subscription checking requires bot admin rights
-                return False
-            except Exception:
-                return False
+            # Proper subscription checking requires bot admin rights
+            metrics.TELETHON_CALLS.inc('get_permissions', type(e).__name__)
+            return False
         except Exception as e:
+            metrics.TELETHON_CALLS.inc('get_permissions', 'error')
             print(f"Subscription check error: {e}")
             return False
+        finally:
+            metrics.TELETHON_SECONDS.observe(time.perf_counter() - started, 'get_permissions')
+    
+    async def get_subscription_status(self, user_id, user_row=None):
+        """Cached subscription check; the stored status is only rewritten when it changes"""
+        stored_status = user_row[7] if user_row else None
+        
+        # Local membership set first; only fall back to a live check when it can't tell
+        is_subscribed = self.membership.lookup(user_id)
+        metrics.CACHE_REQUESTS.inc('membership', 'miss' if is_subscribed is None else 'hit')
+        if is_subscribed is None:
+            if self.subscription_state != metrics.UP:
+                # Telethon isn't up: go by the stored status, without caching or rewriting it
+                return stored_status == 1
+            self.subscriptions.warm(user_id, stored_status)
+            is_subscribed = await self.subscriptions.resolve(user_id, self.check_subscription)
+        if user_row and stored_status != (1 if is_subscribed else 0):
+            await self.db.update_subscription_status(user_id, 1 if is_subscribed else 0)
+            if self.bus:
+                self.bus.publish('subscription', user_id, is_subscribed)
+        return is_subscribed
+    
+    async def post_init(self, application):
+        """Start background work once the event loop is running.
+        
+        Only what updates need straight away is awaited: Telethon connects in
+        the background, the title index loads on the first inline query and
+        the trending and recommendation jobs first run after
+        BACKGROUND_START_DELAY.
+        """
+        metrics.READY.set(self.subscription_state, 'subscriptions')
+        self.view_counter.start()
+        if metrics.enabled:
+            try:
+                with self.startup.phase('metrics server'):
+                    self._metrics_server = metrics.start_server(METRICS_HOST, self.metrics_port)
+            except OSError as e:
+                print(f"Error starting metrics server: {e}")
+            self._loop_monitor = asyncio.create_task(metrics.monitor_event_loop())
+        self._telethon_task = asyncio.create_task(self.connect_telethon())
+        if self.primary:
+            self.recommender.start(BACKGROUND_START_DELAY)
+            self.trending.start(BACKGROUND_START_DELAY)
+            with self.startup.phase('resume broadcasts'):
+                await self.broadcasts.resume_all(application.bot)
+        print(self.startup.summary('Ready for updates'))
+    
+    async def send(self, chat_id, method, /, *args, priority=INTERACTIVE, **kwargs):
+        """Route a Bot API send through the outbound scheduler"""
+        return await self.sender.send(chat_id, method, *args, priority=priority, **kwargs)
+    
+    async def shutdown(self, application):
+        """Flush pending work and stop the database threads when the application stops"""
+        if self._telethon_task:
+            self._telethon_task.cancel()
+        if self._loop_monitor:
+            self._loop_monitor.cancel()
+        if self._metrics_server:
+            self._metrics_server.shutdown()
+        await self.title_index.stop()
+        await self.recommender.stop()
+        await self.trending.stop()
+        await self.membership.stop()
+        await self.broadcasts.stop()
+        await self.view_counter.stop()
+        await self.sender.stop()
+        if self.client.is_connected():
+            await self.client.disconnect()
+        self.db.close()
+    
+    async def handle_chat_member(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Bot API chat_member updates for the subscription channel"""
+        member_update = update.chat_member
+        if self.membership.peer_id is None or member_update.chat.id != self.membership.peer_id:
+            return
+        
+        new_member = member_update.new_chat_member
+        is_member = new_member.status in (ChatMember.OWNER, ChatMember.ADMINISTRATOR, ChatMember.MEMBER) or (
+            new_member.status == ChatMember.RESTRICTED and new_member.is_member
+        )
+        self.membership.apply(new_member.user.id, is_member)
     
     def generate_movie_id(self):
         """Generate unique movie ID"""
         return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
     
+    def format_movie_caption(self, movie, language):
+        """Movie details caption; views include increments not yet flushed to the database"""
+        views = movie[10] + self.view_counter.pending(movie[1])
+        return self.get_language_text(language, 'movie_details').format(movie[2], movie[4], movie[5], views)
+    
     def get_language_text(self, language, key):
         """Get translated text based on language"""
-        texts = {
-            'en': {
-                'start': '🎬 Welcome to Movie Bot! Please select your language.',
-                'select_language': 'Select Language:',
-                'uzbek': 'Uzbek',
-                'russian': 'Russian',
-                'english': 'English',
-                'main_menu': 'Main Menu',
-                'movies': 'Movies',
-                'watch_later': 'Watch Later',
-                'watched': 'Watched',
-                'search': 'Search Movies',
-                'my_account': 'My Account',
-                'admin_panel': 'Admin Panel',
-                'enter_movie_id': 'Enter movie ID:',
-                'movie_not_found': 'Movie not found!',
-                'movie_added': 'Movie added successfully!',
-                'already_watched': 'You have already watched this movie.',
-                'added_to_watch_later': 'Added to Watch Later!',
-                'removed_from_watch_later': 'Removed from Watch Later!',
-                'watch_later_empty': 'Your Watch Later list is empty.',
-                'watched_empty': 'You haven\'t watched any movies yet.',
-                'search_placeholder': 'Enter movie title or description...',
-                'movie_details': 'Title: {}\nGenre: {}\nYear: {}\nViews: {}',
-                'subscribe_channel': 'Please subscribe to our channel to use this bot!',
-                'check_subscription': '✅ Check Subscription',
-                'not_subscribed': 'You are not subscribed to the channel!',
-                'subscribed': 'Thank you for subscribing! You can now use the bot.',
-                'user_stats': '📊 Your Stats:\nMovies Watched: {}\nMovies in Watch Later: {}',
-                'admin_welcome': 'Admin Panel',
-                'add_movie': 'Add Movie',
-                'manage_users': 'Manage Users',
-                'movie_added_success': 'Movie added successfully!',
-                'enter_movie_title': 'Enter movie title:',
-                'enter_movie_description': 'Enter movie description:',
-                'enter_movie_genre': 'Enter movie genre:',
-                'enter_movie_year': 'Enter movie year:',
-                'send_movie_file': 'Send movie file (video/document):',
-                'movie_title': 'Title:',
-                'movie_description': 'Description:',
-                'movie_genre': 'Genre:',
-                'movie_year': 'Year:',
-                'movie_id': 'ID:',
-                'all_users': 'All Users',
-                'user_info': 'User: {}\nID: {}\nLanguage: {}\nSubscribed: {}',
-                'delete_movie': 'Delete Movie',
-                'enter_movie_id_to_delete': 'Enter movie ID to delete:',
-                'movie_deleted': 'Movie deleted successfully!',
-                'total_users': 'Total Users: {}',
-                'total_movies': 'Total Movies: {}',
-                'back': 'Back',
-                'cancel': 'Cancel'
-            },
-            'ru': {
-                'start': '🎬 Добро пожаловать в Movie Bot! Пожалуйста, выберите язык.',
-                'select_language': 'Выберите язык:',
-                'uzbek': 'Узбекский',
-                'russian': 'Русский',
-                'english': 'Английский',
-                'main_menu': 'Главное меню',
-                'movies': 'Фильмы',
-                'watch_later': 'Смотреть позже',
-                'watched': 'Просмотрено',
-                'search': 'Поиск фильмов',
-                'my_account': 'Мой аккаунт',
-                'admin_panel': 'Панель администратора',
-                'enter_movie_id': 'Введите ID фильма:',
-                'movie_not_found': 'Фильм не найден!',
-                'movie_added': 'Фильм успешно добавлен!',
-                'already_watched': 'Вы уже смотрели этот фильм.',
-                'added_to_watch_later': 'Добавлено в "Смотреть позже"!',
-                'removed_from_watch_later': 'Удалено из "Смотреть позже"!',
-                'watch_later_empty': 'Ваш список "Смотреть позже" пуст.',
-                'watched_empty': 'Вы еще не посмотрели ни одного фильма.',
-                'search_placeholder': 'Введите название фильма или описание...',
-                'movie_details': 'Название: {}\nЖанр: {}\nГод: {}\nПросмотры: {}',
-                'subscribe_channel': 'Пожалуйста, подпишитесь на наш канал, чтобы использовать этого бота!',
-                'check_subscription': '✅ Проверить подписку',
-                'not_subscribed': 'Вы не подписаны на канал!',
-                'subscribed': 'Спасибо за подписку! Теперь вы можете использовать бота.',
-                'user_stats': '📊 Ваши статистики:\nПросмотрено фильмов: {}\nФильмов в списке "Смотреть позже": {}',
-                'admin_welcome': 'Панель администратора',
-                'add_movie': 'Добавить фильм',
-                'manage_users': 'Управление пользователями',
-                'movie_added_success': 'Фильм успешно добавлен!',
-                'enter_movie_title': 'Введите название фильма:',
-                'enter_movie_description': 'Введите описание фильма:',
-                'enter_movie_genre': 'Введите жанр фильма:',
-                'enter_movie_year': 'Введите год фильма:',
-                'send_movie_file': 'Отправьте файл фильма (видео/документ):',
-                'movie_title': 'Название:',
-                'movie_description': 'Описание:',
-                'movie_genre': 'Жанр:',
-                'movie_year': 'Год:',
-                'movie_id': 'ID:',
-                'all_users': 'Все пользователи',
-                'user_info': 'Пользователь: {}\nID: {}\nЯзык: {}\nПодписка: {}',
-                'delete_movie': 'Удалить фильм',
-                'enter_movie_id_to_delete': 'Введите ID фильма для удаления:',
-                'movie_deleted': 'Фильм успешно удален!',
-                'total_users': 'Всего пользователей: {}',
-                'total_movies': 'Всего фильмов: {}',
-                'back': 'Назад',
-                'cancel': 'Отмена'
-            },
-            'uz': {
-                'start': '🎬 Movie Bot ga xush kelibsiz! Iltimos, tilni tanlang.',
-                'select_language': 'Tilni tanlang:',
-                'uzbek': 'O\'zbek',
-                'russian': 'Ruscha',
-                'english': 'Inglizcha',
-                'main_menu': 'Bosh menyu',
-                'movies': 'Filmlar',
-                'watch_later': 'Keyinroq tomosha qilish',
-                'watched': 'Tomashta',
-                'search': 'Filmlarni qidirish',
-                'my_account': 'Mening akkauntim',
-                'admin_panel': 'Admin panel',
-                'enter_movie_id': 'Film ID sini kiriting:',
-                'movie_not_found': 'Film topilmadi!',
-                'movie_added': 'Film muvaffaqiyatli qo\'shildi!',
-                'already_watched': 'Siz allaqachon bu filmni tomosha qilgansiz.',
-                'added_to_watch_later': 'Keyinroq tomosha qilishga qo\'shildi!',
-                'removed_from_watch_later': 'Keyinroq tomosha qilishdan olib tashlandi!',
-                'watch_later_empty': 'Sizning "Keyinroq tomosha qilish" ro\'yxatingiz bo\'sh.',
-                'watched_empty': 'Siz hali hech qanday film tomosha qilmadingiz.',
-                'search_placeholder': 'Film nomini yoki tavsifini kiriting...',
-                'movie_details': 'Nomi: {}\nJanri: {}\nYili: {}\nTomosha qilganlar: {}',
-                'subscribe_channel': 'Botdan foydalanish uchun kanalimizga obuna bo\'ling!',
-                'check_subscription': '✅ Obunani tekshirish',
-                'not_subscribed': 'Siz kanalga obuna bo\'lmadingiz!',
-                'subscribed': 'Obuna bo\'lganingiz uchun tashakkur! Endi botdan foydalanishingiz mumkin.',
-                'user_stats': '📊 Sizning statistikangiz:\nTomashta filmalar: {}\nKeyinroq tomosha qilishda: {}',
-                'admin_welcome': 'Admin panel',
-                'add_movie': 'Film qo\'shish',
-                'manage_users': 'Foydalanuvchilarni boshqarish',
-                'movie_added_success': 'Film muvaffaqiyatli qo\'shildi!',
-                'enter_movie_title': 'Film nomini kiriting:',
-                'enter_movie_description': 'Film tavsifini kiriting:',
-                'enter_movie_genre': 'Film janrini kiriting:',
-                'enter_movie_year': 'Film yilini kiriting:',
-                'send_movie_file': 'Film faylini yuboring (video/hujjat):',
-                'movie_title': 'Nomi:',
-                'movie_description': 'Tavsifi:',
-                'movie_genre': 'Janri:',
-                'movie_year': 'Yili:',
-                'movie_id': 'ID:',
-                'all_users': 'Barcha foydalanuvchilar',
-                'user_info': 'Foydalanuvchi: {}\nID: {}\nTil: {}\nObuna: {}',
-                'delete_movie': 'Filmni o\'chirish',
-                'enter_movie_id_to_delete': 'O\'chirish uchun film ID sini kiriting:',
-                'movie_deleted': 'Film muvaffaqiyatli o\'chirildi!',
-                'total_users': 'Jami foydalanuvchilar: {}',
-                'total_movies': 'Jami filmalar: {}',
-                'back': 'Ortga',
-                'cancel': 'Bekor qilish'
-            }
-        }
-        return texts.get(language, texts['en']).get(key, key)
+        return get_text(language, key)
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
-        self.db.add_user(user.id, username=user.username, first_name=user.first_name, last_name=user.last_name)
+        await self.db.add_user(user.id, username=user.username, first_name=user.first_name, last_name=user.last_name)
+        
+        # Deep link from an inline query result: t.me/<bot>?start=movie_<movie_id>
+        if context.args and context.args[0].startswith('movie_'):
+            user_row = await self.db.get_user(user.id)
+            language = user_row[6] if user_row else 'en'
+            if not await self.get_subscription_status(user.id, user_row):
+                await self.send_subscription_message(user.id, context, language)
+                return
+            await self.show_movie_by_id(update, context, context.args[0][len('movie_'):], language)
+            return
         
         keyboard = [
-            [InlineKeyboardButton("🇺🇿 O'zbek", callback_data='lang_uz')],
-            [InlineKeyboardButton("🇷🇺 Русский", callback_data='lang_ru')],
-            [InlineKeyboardButton("🇬🇧 English", callback_data='lang_en')]
+            [InlineKeyboardButton(self.get_language_text(language, 'language_button'), callback_data=encode('lang', language))]
+            for language in LANGUAGES
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(
+        await self.send(
+            update.message.chat_id, update.message.reply_text,
             self.get_language_text('en', 'start'),
             reply_markup=reply_markup
         )
     
-    async def handle_language_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def handle_language_selection(self, update, context, user_row, current_language, language):
         query = update.callback_query
-        await query.answer()
-        
-        language = query.data.split('_')[1]
-        self.db.update_language(query.from_user.id, language)
+        if language not in LANGUAGES:
+            return
+        await self.db.update_language(query.from_user.id, language)
         
         # Check subscription
-        is_subscribed = await self.check_subscription(query.from_user.id)
-        self.db.update_subscription_status(query.from_user.id, 1 if is_subscribed else 0)
+        user_row = await self.db.get_user(query.from_user.id)
+        is_subscribed = await self.get_subscription_status(query.from_user.id, user_row)
         
         if not is_subscribed:
             await self.send_subscription_message(query.from_user.id, context, language)
@@ -256,13 +329,26 @@ class MovieBot:
         await self.show_main_menu(query.from_user.id, context, language)
     
     async def send_subscription_message(self, user_id, context, language):
+        if self.subscription_state != metrics.UP:
+            # Still connecting, or the Telethon session needs logging in
+            starting = self.subscription_state == metrics.STARTING
+            await self.send(
+                user_id, context.bot.send_message,
+                chat_id=user_id,
+                text=self.get_language_text(
+                    language, 'subscription_check_starting' if starting else 'subscription_check_unavailable'
+                )
+            )
+            return
+        
         keyboard = [[InlineKeyboardButton(
             self.get_language_text(language, 'check_subscription'),
             url=f"https://t.me/{CHANNEL_ID.lstrip('@')}" if CHANNEL_ID.startswith('@') else f"https://t.me/{CHANNEL_ID}"
         )]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await context.bot.send_message(
+        await self.send(
+            user_id, context.bot.send_message,
             chat_id=user_id,
             text=self.get_language_text(language, 'subscribe_channel'),
             reply_markup=reply_markup
@@ -270,7 +356,8 @@ class MovieBot:
     
     async def show_main_menu(self, user_id, context, language):
         keyboard = [
-            [KeyboardButton(self.get_language_text(language, 'movies'))],
+            [KeyboardButton(self.get_language_text(language, 'movies')),
+             KeyboardButton(self.get_language_text(language, 'trending'))],
             [KeyboardButton(self.get_language_text(language, 'search'))],
             [KeyboardButton(self.get_language_text(language, 'watch_later')), 
              KeyboardButton(self.get_language_text(language, 'watched'))],
@@ -282,49 +369,90 @@ class MovieBot:
         
         reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
         
-        await context.bot.send_message(
+        await self.send(
+            user_id, context.bot.send_message,
             chat_id=user_id,
             text="🎬 " + self.get_language_text(language, 'main_menu'),
             reply_markup=reply_markup
         )
+        
+        # "Because you watched ..." row from the latest movie in the user's history
+        title, movies = await self.db.get_recommendations(user_id, RECOMMENDATION_ROW_SIZE)
+        if movies:
+            keyboard = [
+                [InlineKeyboardButton(f"👍 {movie[2]}", callback_data=encode('open', 'movies', movie[0]))] for movie in movies
+            ]
+            await self.send(
+                user_id, context.bot.send_message,
+                chat_id=user_id,
+                text=self.get_language_text(language, 'because_you_watched').format(title),
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         text = update.message.text
-        language = self.db.get_user(user.id)[4] if self.db.get_user(user.id) else 'en'
+        user_row = await self.db.get_user(user.id)
+        language = user_row[6] if user_row else 'en'
         
         # Check subscription first
-        is_subscribed = await self.check_subscription(user.id)
-        self.db.update_subscription_status(user.id, 1 if is_subscribed else 0)
+        is_subscribed = await self.get_subscription_status(user.id, user_row)
         
         if not is_subscribed:
             await self.send_subscription_message(user.id, context, language)
             return
         
-        if text == self.get_language_text(language, 'main_menu'):
+        # One lookup maps a button label to its action
+        button = resolve_button(text)
+        action = button[1] if button else None
+        
+        if action == 'main_menu':
             await self.show_main_menu(user.id, context, language)
         
-        elif text == self.get_language_text(language, 'movies'):
+        elif action == 'movies':
             await self.show_movies(update, context, language)
         
-        elif text == self.get_language_text(language, 'watch_later'):
-            await self.show_watch_later(update, context, language)
+        elif action == 'trending':
+            await self.show_trending(update, context, language)
         
-        elif text == self.get_language_text(language, 'watched'):
-            await self.show_watched(update, context, language)
+        elif action == 'watch_later':
+            await self.show_watch_later(update, context, language, user_row=user_row)
         
-        elif text == self.get_language_text(language, 'search'):
-            await update.message.reply_text(
+        elif action == 'watched':
+            await self.show_watched(update, context, language, user_row=user_row)
+        
+        elif action == 'search':
+            await self.send(
+                update.message.chat_id, update.message.reply_text,
                 self.get_language_text(language, 'search_placeholder')
             )
             context.user_data['waiting_for_search'] = True
         
-        elif text == self.get_language_text(language, 'my_account'):
+        elif action == 'my_account':
             await self.show_user_account(update, context, language)
         
-        elif text == self.get_language_text(language, 'admin_panel') and user.id in ADMIN_IDS:
+        elif action == 'admin_panel' and user.id in ADMIN_IDS:
             await self.show_admin_panel(update, context, language)
         
+        elif action == 'broadcast' and user.id in ADMIN_IDS:
+            await self.send(
+                update.message.chat_id, update.message.reply_text,
+                self.get_language_text(language, 'enter_broadcast_text')
+            )
+            context.user_data['waiting_for_broadcast'] = True
+        
+        elif action == 'back':
+            await self.show_main_menu(user.id, context, language)
+        
+        # Handle broadcast text
+        elif context.user_data.get('waiting_for_broadcast') and user.id in ADMIN_IDS:
+            context.user_data['waiting_for_broadcast'] = False
+            broadcast_id = await self.broadcasts.start(context.bot, user.id, language, text)
+            await self.send(
+                update.message.chat_id, update.message.reply_text,
+                self.get_language_text(language, 'broadcast_started').format(broadcast_id)
+            )
+        
         # Handle search input
         elif context.user_data.get('waiting_for_search'):
             context.user_data['waiting_for_search'] = False
@@ -335,279 +463,594 @@ class MovieBot:
             context.user_data['waiting_for_movie_id'] = False
             await self.show_movie_by_id(update, context, text, language)
     
-    async def show_movies(self, update: Update, context: ContextTypes.DEFAULT_TYPE, language):
-        movies = self.db.get_all_movies()
-        
-        if not movies:
-            await update.message.reply_text(self.get_language_text(language, 'movie_not_found'))
-            return
-        
-        for movie in movies[:10]:  # Show first 10 movies
+    def movie_card_keyboard(self, movie, list_name, similar=()):
+        """Per-movie buttons; which ones depends on the list the movie was opened from"""
+        if list_name == 'later':
             keyboard = [
-                [InlineKeyboardButton("🎬 Watch", callback_data=f'watch_{movie[1]}')],
-                [InlineKeyboardButton("➕ Watch Later", callback_data=f'watch_later_{movie[1]}')]
+                [InlineKeyboardButton("🎬 Watch", callback_data=encode('watch', movie[0]))],
+                [InlineKeyboardButton("❌ Remove", callback_data=encode('remove_later', movie[0]))]
             ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            caption = self.get_language_text(language, 'movie_details').format(
-                movie[2], movie[4], movie[5], movie[8]
-            )
-            
-            if movie[7] == 'video':
-                await update.message.reply_video(
-                    video=movie[6],
-                    caption=caption,
-                    reply_markup=reply_markup
-                )
-            else:
-                await update.message.reply_document(
-                    document=movie[6],
-                    caption=caption,
-                    reply_markup=reply_markup
-                )
-    
-    async def show_movie_by_id(self, update: Update, context: ContextTypes.DEFAULT_TYPE, movie_id, language):
-        movie = self.db.get_movie_by_id(movie_id)
-        
-        if not movie:
-            await update.message.reply_text(self.get_language_text(language, 'movie_not_found'))
-            return
-        
-        keyboard = [
-            [InlineKeyboardButton("🎬 Watch", callback_data=f'watch_{movie[1]}')],
-            [InlineKeyboardButton("➕ Watch Later", callback_data=f'watch_later_{movie[1]}')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        caption = self.get_language_text(language, 'movie_details').format(
-            movie[2], movie[4], movie[5], movie[8]
+        elif list_name == 'watched':
+            keyboard = [[InlineKeyboardButton("🎬 Watch Again", callback_data=encode('watch', movie[0]))]]
+        else:
+            keyboard = [
+                [InlineKeyboardButton("🎬 Watch", callback_data=encode('watch', movie[0]))],
+                [InlineKeyboardButton("➕ Watch Later", callback_data=encode('later', movie[0]))]
+            ]
+        keyboard.extend(
+            [InlineKeyboardButton(f"👍 {other[2]}", callback_data=encode('open', 'movies', other[0]))] for other in similar
         )
+        return InlineKeyboardMarkup(keyboard)
+    
+    async def send_movie_card(self, message, movie, list_name, language):
+        """Send one movie's file with its caption, buttons and movies watched together with it"""
+        similar = await self.db.get_similar_movies(movie[1], RECOMMENDATION_ROW_SIZE)
+        reply_markup = self.movie_card_keyboard(movie, list_name, similar)
+        caption = self.format_movie_caption(movie, language)
+        if similar:
+            caption += '\n\n' + self.get_language_text(language, 'similar_movies')
         
         if movie[7] == 'video':
-            await update.message.reply_video(
+            await self.send(
+                message.chat_id, message.reply_video,
                 video=movie[6],
                 caption=caption,
                 reply_markup=reply_markup
             )
         else:
-            await update.message.reply_document(
+            await self.send(
+                message.chat_id, message.reply_document,
                 document=movie[6],
                 caption=caption,
                 reply_markup=reply_markup
             )
     
-    async def show_watch_later(self, update: Update, context: ContextTypes.DEFAULT_TYPE, language):
-        user = update.effective_user
-        movies = self.db.get_watch_later(user.id)
+    async def send_media_preview(self, message, movies):
+        """Send several movies' files as media groups (videos and documents can't be mixed)"""
+        for file_type, media_class in (('video', InputMediaVideo), ('document', InputMediaDocument)):
+            files = [movie for movie in movies if (movie[7] == 'video') == (file_type == 'video')]
+            for start in range(0, len(files), MEDIA_GROUP_SIZE):
+                chunk = files[start:start + MEDIA_GROUP_SIZE]
+                if len(chunk) == 1:
+                    if file_type == 'video':
+                        await self.send(
+                            message.chat_id, message.reply_video,
+                            video=chunk[0][6],
+                            caption=chunk[0][2]
+                        )
+                    else:
+                        await self.send(
+                            message.chat_id, message.reply_document,
+                            document=chunk[0][6],
+                            caption=chunk[0][2]
+                        )
+                else:
+                    await self.send(
+                        message.chat_id, message.reply_media_group,
+                        [media_class(movie[6], caption=movie[2]) for movie in chunk]
+                    )
+    
+    def page_callback(self, action, list_name, cursor=None, backwards=False):
+        """Callback data for a page ('page' or 'preview'), carrying the keyset cursor that fetches it"""
+        if cursor is None:
+            return encode(action, list_name)
+        return encode(action, list_name, int(backwards), cursor[0], cursor[1])
+    
+    def page_navigation_buttons(self, list_name, page, language, preview_callback=None):
+        buttons = []
+        if page['prev']:
+            buttons.append(InlineKeyboardButton("◀️", callback_data=self.page_callback('page', list_name, page['prev'], True)))
+        if preview_callback:
+            buttons.append(InlineKeyboardButton(self.get_language_text(language, 'send_all'), callback_data=preview_callback))
+        if page['next']:
+            buttons.append(InlineKeyboardButton("▶️", callback_data=self.page_callback('page', list_name, page['next'], False)))
+        return buttons
+    
+    async def send_movie_list(self, update: Update, list_name, page, language, cursor=None, backwards=False):
+        """Render a page of movies.
         
-        if not movies:
-            await update.message.reply_text(self.get_language_text(language, 'watch_later_empty'))
+        In compact mode the whole page is one text message with a numbered
+        keyboard and files are only sent when an item is tapped; media mode
+        sends every movie's file as its own message.
+        """
+        message = update.effective_message
+        movies = page['movies']
+        
+        if LIST_RENDER_MODE == 'media':
+            for movie in movies:
+                await self.send_movie_card(message, movie, list_name, language)
+            buttons = self.page_navigation_buttons(list_name, page, language)
+            if buttons:
+                await self.send(
+                    message.chat_id, message.reply_text,
+                    self.get_language_text(language, 'page_navigation'),
+                    reply_markup=InlineKeyboardMarkup([buttons])
+                )
             return
         
-        for movie in movies:
-            keyboard = [
-                [InlineKeyboardButton("🎬 Watch", callback_data=f'watch_{movie[1]}')],
-                [InlineKeyboardButton("❌ Remove", callback_data=f'remove_watch_later_{movie[1]}')]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            caption = self.get_language_text(language, 'movie_details').format(
-                movie[2], movie[4], movie[5], movie[8]
+        title_key = {
+            'movies': 'movies', 'trending': 'trending', 'later': 'watch_later', 'watched': 'watched', 'search': 'search'
+        }[list_name]
+        lines = [f"🎬 {self.get_language_text(language, title_key)}", '']
+        for number, movie in enumerate(movies, 1):
+            lines.append(f"{number}. {movie[2]} ({movie[5]}) · {movie[4]}")
+        
+        number_buttons = [
+            InlineKeyboardButton(str(number), callback_data=encode('open', list_name, movie[0]))
+            for number, movie in enumerate(movies, 1)
+        ]
+        keyboard = [number_buttons[start:start + 5] for start in range(0, len(number_buttons), 5)]
+        
+        if list_name == 'trending':
+            keyboard.append(self.trending_period_buttons(cursor, language))
+        
+        # Search results aren't addressable by a cursor, so they get no preview/paging row
+        if list_name != 'search':
+            preview_callback = self.page_callback('preview', list_name, cursor, backwards)
+            keyboard.append(self.page_navigation_buttons(list_name, page, language, preview_callback))
+        
+        text = '\n'.join(lines)
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        query = update.callback_query
+        if query and action_name(query.data) == 'page':
+            await self.send(query.message.chat_id, query.edit_message_text, text, reply_markup=reply_markup)
+        else:
+            await self.send(message.chat_id, message.reply_text, text, reply_markup=reply_markup)
+    
+    def trending_period_buttons(self, cursor, language):
+        """One button per trending period; each opens that period's first page"""
+        current = cursor[0] if cursor else list(PERIODS).index(DEFAULT_PERIOD)
+        return [
+            InlineKeyboardButton(
+                ('• ' if index == current else '') + self.get_language_text(language, f'trending_{period}'),
+                callback_data=self.page_callback('page', 'trending', (index, 0))
             )
-            
-            if movie[7] == 'video':
-                await update.message.reply_video(
-                    video=movie[6],
-                    caption=caption,
-                    reply_markup=reply_markup
-                )
-            else:
-                await update.message.reply_document(
-                    document=movie[6],
-                    caption=caption,
-                    reply_markup=reply_markup
-                )
+            for index, period in enumerate(PERIODS)
+        ]
     
-    async def show_watched(self, update: Update, context: ContextTypes.DEFAULT_TYPE, language):
-        user = update.effective_user
-        movies = self.db.get_watched_movies(user.id)
+    async def get_trending_page(self, language, cursor=None):
+        """A page of a trending list; cursors are (period index, start rank)"""
+        periods = list(PERIODS)
+        index, start = cursor or (periods.index(DEFAULT_PERIOD), 0)
+        index = index if 0 <= index < len(periods) else periods.index(DEFAULT_PERIOD)
+        page = await self.db.get_trending_page(periods[index], language, start)
+        return {
+            'movies': page['movies'],
+            'next': (index, page['next']) if page['next'] is not None else None,
+            'prev': (index, page['prev']) if page['prev'] is not None else None
+        }
+    
+    async def get_list_page(self, user_row, list_name, cursor=None, backwards=False):
+        if list_name == 'movies':
+            return await self.db.get_movies_page(cursor, backwards)
+        if list_name == 'trending':
+            return await self.get_trending_page(user_row[6] if user_row else 'en', cursor)
+        if not user_row:
+            return {'movies': [], 'next': None, 'prev': None}
+        if list_name == 'later':
+            return await self.db.get_watch_later_page(user_row[0], cursor, backwards)
+        return await self.db.get_watched_page(user_row[0], cursor, backwards)
+    
+    async def show_movies(self, update: Update, context: ContextTypes.DEFAULT_TYPE, language, cursor=None, backwards=False):
+        page = await self.get_list_page(None, 'movies', cursor, backwards)
         
-        if not movies:
-            await update.message.reply_text(self.get_language_text(language, 'watched_empty'))
+        if not page['movies']:
+            await self.send(
+                update.effective_message.chat_id, update.effective_message.reply_text,
+                self.get_language_text(language, 'movie_not_found')
+            )
             return
         
-        for movie in movies:
-            keyboard = [[InlineKeyboardButton("🎬 Watch Again", callback_data=f'watch_{movie[1]}')]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            caption = self.get_language_text(language, 'movie_details').format(
-                movie[2], movie[4], movie[5], movie[8]
+        await self.send_movie_list(update, 'movies', page, language, cursor, backwards)
+    
+    async def show_trending(self, update: Update, context: ContextTypes.DEFAULT_TYPE, language, cursor=None, backwards=False):
+        page = await self.get_trending_page(language, cursor)
+        
+        if not page['movies'] and not cursor:
+            await self.send(
+                update.effective_message.chat_id, update.effective_message.reply_text,
+                self.get_language_text(language, 'trending_empty')
             )
-            
-            if movie[7] == 'video':
-                await update.message.reply_video(
-                    video=movie[6],
-                    caption=caption,
-                    reply_markup=reply_markup
-                )
-            else:
-                await update.message.reply_document(
-                    document=movie[6],
-                    caption=caption,
-                    reply_markup=reply_markup
-                )
+            return
+        
+        await self.send_movie_list(update, 'trending', page, language, cursor, backwards)
+    
+    async def show_movie_by_id(self, update: Update, context: ContextTypes.DEFAULT_TYPE, movie_id, language):
+        movie = await self.db.get_movie_by_id(movie_id)
+        
+        if not movie:
+            await self.send(
+                update.effective_message.chat_id, update.effective_message.reply_text,
+                self.get_language_text(language, 'movie_not_found')
+            )
+            return
+        
+        await self.send_movie_card(update.effective_message, movie, 'movies', language)
+    
+    async def show_watch_later(self, update: Update, context: ContextTypes.DEFAULT_TYPE, language, cursor=None, backwards=False,
+                       user_row=None):
+        user_row = user_row or await self.db.get_user(update.effective_user.id)
+        page = await self.get_list_page(user_row, 'later', cursor, backwards)
+        
+        if not page['movies']:
+            await self.send(
+                update.effective_message.chat_id, update.effective_message.reply_text,
+                self.get_language_text(language, 'watch_later_empty')
+            )
+            return
+        
+        await self.send_movie_list(update, 'later', page, language, cursor, backwards)
+    
+    async def show_watched(self, update: Update, context: ContextTypes.DEFAULT_TYPE, language, cursor=None, backwards=False,
+                       user_row=None):
+        user_row = user_row or await self.db.get_user(update.effective_user.id)
+        page = await self.get_list_page(user_row, 'watched', cursor, backwards)
+        
+        if not page['movies']:
+            await self.send(
+                update.effective_message.chat_id, update.effective_message.reply_text,
+                self.get_language_text(language, 'watched_empty')
+            )
+            return
+        
+        await self.send_movie_list(update, 'watched', page, language, cursor, backwards)
     
     async def search_movies(self, update: Update, context: ContextTypes.DEFAULT_TYPE, query, language):
-        movies = self.db.search_movies(query)
+        movies = await self.db.search_movies(query, limit=10)
         
         if not movies:
-            await update.message.reply_text(self.get_language_text(language, 'movie_not_found'))
+            await self.send(
+                update.message.chat_id, update.message.reply_text,
+                self.get_language_text(language, 'movie_not_found')
+            )
             return
         
-        for movie in movies[:10]:  # Show first 10 results
-            keyboard = [
-                [InlineKeyboardButton("🎬 Watch", callback_data=f'watch_{movie[1]}')],
-                [InlineKeyboardButton("➕ Watch Later", callback_data=f'watch_later_{movie[1]}')]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            caption = self.get_language_text(language, 'movie_details').format(
-                movie[2], movie[4], movie[5], movie[8]
-            )
-            
-            if movie[7] == 'video':
-                await update.message.reply_video(
-                    video=movie[6],
-                    caption=caption,
-                    reply_markup=reply_markup
-                )
-            else:
-                await update.message.reply_document(
-                    document=movie[6],
-                    caption=caption,
-                    reply_markup=reply_markup
-                )
+        page = {'movies': movies, 'next': None, 'prev': None}
+        await self.send_movie_list(update, 'search', page, language)
+    
+    async def handle_inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Typeahead search from any chat (@bot query), answered from the in-memory title index"""
+        query = update.inline_query
+        offset = int(query.offset) if query.offset.isdigit() else 0
+        await self.title_index.ensure_loaded()
+        movies, next_offset = self.title_index.search(query.query, offset, INLINE_PAGE_SIZE)
+        results = []
+        for movie_id, title, year, genre in movies:
+            heading = f"{title} ({year})" if year else title
+            results.append(InlineQueryResultArticle(
+                id=movie_id,
+                title=heading,
+                description=genre or None,
+                input_message_content=InputTextMessageContent(f"🎬 {heading}\n{genre or ''}".strip()),
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(
+                    "🎬 Watch", url=f"https://t.me/{context.bot.username}?start=movie_{movie_id}"
+                )]])
+            ))
+        
+        await query.answer(
+            results,
+            cache_time=INLINE_CACHE_TIME,
+            next_offset=str(next_offset) if next_offset is not None else ''
+        )
     
     async def show_user_account(self, update: Update, context: ContextTypes.DEFAULT_TYPE, language):
         user = update.effective_user
-        stats = self.db.get_user_stats(user.id)
+        stats = await self.db.get_user_stats(user.id)
         
         message = self.get_language_text(language, 'user_stats').format(
             stats['watched_count'],
             stats['watch_later_count']
         )
         
-        await update.message.reply_text(message)
+        await self.send(update.message.chat_id, update.message.reply_text, message)
     
     async def show_admin_panel(self, update: Update, context: ContextTypes.DEFAULT_TYPE, language):
         keyboard = [
             [KeyboardButton(self.get_language_text(language, 'add_movie'))],
             [KeyboardButton(self.get_language_text(language, 'manage_users'))],
             [KeyboardButton(self.get_language_text(language, 'delete_movie'))],
+            [KeyboardButton(self.get_language_text(language, 'broadcast'))],
             [KeyboardButton(self.get_language_text(language, 'back'))]
         ]
         reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
         
-        stats = {
-            'users': len(self.db.get_all_users()),
-            'movies': self.db.get_movies_count()
-        }
+        stats = await self.db.get_stats()
+        languages = ', '.join(f"{code} {count}" for code, count in sorted(stats['languages'].items()))
         
         message = f"{self.get_language_text(language, 'admin_welcome')}\n\n"
         message += f"{self.get_language_text(language, 'total_users').format(stats['users'])}\n"
-        message += f"{self.get_language_text(language, 'total_movies').format(stats['movies'])}"
+        message += f"{self.get_language_text(language, 'active_users').format(stats['active_users'])}\n"
+        message += f"{self.get_language_text(language, 'subscribed_users').format(stats['subscribed'])}\n"
+        message += f"{self.get_language_text(language, 'activity').format(stats['dau'], stats['wau'])}\n"
+        message += f"{self.get_language_text(language, 'users_by_language').format(languages)}\n"
+        message += f"{self.get_language_text(language, 'total_movies').format(stats['movies'])}\n"
+        if stats['top_movies']:
+            message += f"\n{self.get_language_text(language, 'top_movies')}\n"
+            for number, (movie_id, title, views) in enumerate(stats['top_movies'], 1):
+                message += f"{number}. {title} ({movie_id}) · 👁 {views}\n"
+        message += "\n"
+        
+        queue = self.sender.stats()
+        message += self.get_language_text(language, 'send_queue').format(
+            queue['interactive_queued'], queue['bulk_queued'], queue['delayed'], queue['flood_waits']
+        )
         
-        await update.message.reply_text(message, reply_markup=reply_markup)
+        await self.send(update.message.chat_id, update.message.reply_text, message, reply_markup=reply_markup)
+    
+    def build_callback_router(self):
+        """Inline button actions, each declaring the lookups it needs before it runs"""
+        router = CallbackRouter()
+        router.register('lang', self.handle_language_selection, (str,), needs_user=False, needs_subscription=False)
+        # Paging only re-renders a list; files are sent by the routes that still check the subscription
+        router.register('page', self.handle_page, (str, int, int, int), 1, needs_subscription=False)
+        router.register('preview', self.handle_preview, (str, int, int, int), 1)
+        router.register('open', self.handle_open, (str, movie_key))
+        router.register('watch', self.handle_watch, (movie_key,))
+        router.register('later', self.handle_watch_later, (movie_key,))
+        router.register('remove_later', self.handle_remove_watch_later, (movie_key,), needs_subscription=False)
+        return router
     
     async def handle_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
         
-        user = query.from_user
-        language = self.db.get_user(user.id)[4] if self.db.get_user(user.id) else 'en'
+        route, args = self.callbacks.resolve(query.data)
+        if route is None:
+            return
         
-        # Check subscription
-        is_subscribed = await self.check_subscription(user.id)
-        self.db.update_subscription_status(user.id, 1 if is_subscribed else 0)
+        user = query.from_user
+        user_row = await self.db.get_user(user.id) if route.needs_user else None
+        language = user_row[6] if user_row else 'en'
         
-        if not is_subscribed:
+        if route.needs_subscription and not await self.get_subscription_status(user.id, user_row):
             await self.send_subscription_message(user.id, context, language)
             return
         
-        data = query.data
+        await route.handler(update, context, user_row, language, *args)
+    
+    async def get_callback_movie(self, key):
+        """The movie a button refers to: a row id, or a movie_id from buttons in the old format"""
+        if isinstance(key, int):
+            return await self.db.get_movie_by_key(key)
+        return await self.db.get_movie_by_id(key)
+    
+    async def handle_page(self, update, context, user_row, language, list_name, backwards=0, *cursor):
+        cursor, backwards = tuple(cursor) or None, bool(backwards)
+        if list_name == 'movies':
+            await self.show_movies(update, context, language, cursor, backwards)
+        elif list_name == 'trending':
+            await self.show_trending(update, context, language, cursor, backwards)
+        elif list_name == 'later':
+            await self.show_watch_later(update, context, language, cursor, backwards, user_row)
+        elif list_name == 'watched':
+            await self.show_watched(update, context, language, cursor, backwards, user_row)
+    
+    async def handle_preview(self, update, context, user_row, language, list_name, backwards=0, *cursor):
+        page = await self.get_list_page(user_row, list_name, tuple(cursor) or None, bool(backwards))
+        await self.send_media_preview(update.callback_query.message, page['movies'])
+    
+    async def handle_open(self, update, context, user_row, language, list_name, key):
+        message = update.callback_query.message
+        movie = await self.get_callback_movie(key)
+        if movie:
+            await self.send_movie_card(message, movie, list_name, language)
+        else:
+            await self.send(message.chat_id, message.reply_text, self.get_language_text(language, 'movie_not_found'))
+    
+    async def handle_watch(self, update, context, user_row, language, key):
+        message = update.callback_query.message
+        movie = await self.get_callback_movie(key)
+        if not movie:
+            return
+        
+        # Add to watched
+        if user_row:
+            await self.db.add_to_watched(user_row[0], movie[1], count_view=False)
+        self.view_counter.add(movie[1])
         
-        if data.startswith('watch_'):
-            movie_id = data.split('_')[1]
-            movie = self.db.get_movie_by_id(movie_id)
-            
-            if movie:
-                # Add to watched
-                user_info = self.db.get_user(user.id)
-                if user_info:
-                    self.db.add_to_watched(user_info[0], movie_id)
-                
-                # Send the movie
-                if movie[7] == 'video':
-                    await query.message.reply_video(video=movie[6])
-                else:
-                    await query.message.reply_document(document=movie[6])
-        
-        elif data.startswith('watch_later_'):
-            movie_id = data.split('_')[2]
-            user_info = self.db.get_user(user.id)
-            if user_info:
-                self.db.add_to_watch_later(user_info[0], movie_id)
-                await query.edit_message_text(self.get_language_text(language, 'added_to_watch_later'))
-        
-        elif data.startswith('remove_watch_later_'):
-            movie_id = data.split('_')[2]
-            user_info = self.db.get_user(user.id)
-            if user_info:
-                self.db.remove_from_watch_later(user_info[0], movie_id)
-                await query.edit_message_text(self.get_language_text(language, 'removed_from_watch_later'))
+        # Send the movie
+        if movie[7] == 'video':
+            await self.send(message.chat_id, message.reply_video, video=movie[6])
+        else:
+            await self.send(message.chat_id, message.reply_document, document=movie[6])
+    
+    async def handle_watch_later(self, update, context, user_row, language, key):
+        query = update.callback_query
+        movie = await self.get_callback_movie(key)
+        if movie and user_row:
+            await self.db.add_to_watch_later(user_row[0], movie[1])
+            await self.send(
+                query.message.chat_id, query.edit_message_text,
+                self.get_language_text(language, 'added_to_watch_later')
+            )
+    
+    async def handle_remove_watch_later(self, update, context, user_row, language, key):
+        query = update.callback_query
+        movie = await self.get_callback_movie(key)
+        if movie and user_row:
+            await self.db.remove_from_watch_later(user_row[0], movie[1])
+            await self.send(
+                query.message.chat_id, query.edit_message_text,
+                self.get_language_text(language, 'removed_from_watch_later')
+            )
     
     async def handle_file_upload(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
-        language = self.db.get_user(user.id)[4] if self.db.get_user(user.id) else 'en'
+        user_row = await self.db.get_user(user.id)
+        language = user_row[6] if user_row else 'en'
         
         if user.id not in ADMIN_IDS:
             return
         
-        # This is a simplified version - in a real implementation, you'd need to handle
-        # the multi-step process of adding a movie (title, description, etc.)
-        file = update.message.video or update.message.document
+        document = update.message.document
+        if document and (document.file_name or '').lower().endswith(EXTENSIONS):
+            await self.import_catalog_file(update, context, document, language)
+            return
+        
+        file = update.message.video or document
         if file:
-            file_id = file.file_id
-            file_type = 'video' if update.message.video else 'document'
-            
-            # Generate movie ID
-            movie_id = self.generate_movie_id()
-            
-            # You would need to store this in context.user_data and continue the process
-            await update.message.reply_text(
-                f"Movie file received. ID: {movie_id}. Please continue with /addmovie command."
+            # Single files are added by listing their file_id in a catalog file
+            await self.send(
+                update.message.chat_id, update.message.reply_text,
+                self.get_language_text(language, 'file_received').format(file.file_id)
             )
-
-def main():
-    bot_instance = MovieBot()
     
-    application = Application.builder().token(BOT_TOKEN).build()
+    async def import_catalog_file(self, update, context, document, language):
+        """Download a catalog file sent by an admin and import it"""
+        chat_id = update.message.chat_id
+        await self.send(chat_id, update.message.reply_text, self.get_language_text(language, 'catalog_import_started'))
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, os.path.basename(document.file_name))
+                telegram_file = await context.bot.get_file(document.file_id)
+                await telegram_file.download_to_drive(path)
+                report = await import_catalog_async(self.db, path, update.effective_user.id)
+            await self.title_index.refresh()
+            if self.bus:
+                self.bus.publish('catalog')
+        except Exception as e:
+            print(f"Error importing catalog: {e}")
+            await self.send(
+                chat_id, update.message.reply_text,
+                self.get_language_text(language, 'catalog_import_failed').format(e)
+            )
+            return
+        
+        text = self.get_language_text(language, 'catalog_import_done').format(
+            report['imported'], report['read'], report['duplicates'], report['invalid'], report['rows_per_second']
+        )
+        if report['errors']:
+            text += '\n\n' + '\n'.join(report['errors'])
+        await self.send(chat_id, update.message.reply_text, text)
+
+def handler_branch(update, context):
+    """Metrics label for the path an update takes through its handler"""
+    if update.callback_query:
+        return action_name(update.callback_query.data) or 'other'
+    if update.message and update.message.text:
+        button = resolve_button(update.message.text)
+        if button:
+            return button[1]
+        for flag, branch in (('waiting_for_broadcast', 'broadcast_input'), ('waiting_for_search', 'search_input'),
+                             ('waiting_for_movie_id', 'movie_id_input')):
+            if context.user_data and context.user_data.get(flag):
+                return branch
+    return 'other'
+
+def build_application(bot_instance, receive_updates=True, api_url=BOT_API_URL):
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .post_init(bot_instance.post_init)
+        .post_shutdown(bot_instance.shutdown)
+        .concurrent_updates(PerUserUpdateProcessor(UPDATE_CONCURRENCY))
+    )
+    if PERSISTENCE_ENABLED:
+        builder = builder.persistence(SQLitePersistence(bot_instance.db, PERSISTENCE_UPDATE_INTERVAL))
+    if api_url:
+        builder = builder.base_url(f"{api_url}/bot").base_file_url(f"{api_url}/file/bot")
+    if not receive_updates:
+        builder = builder.updater(None)
+    application = builder.build()
     
     # Command handlers
-    application.add_handler(CommandHandler("start", bot_instance.start_command))
+    application.add_handler(CommandHandler("start", metrics.instrument_handler('start', bot_instance.start_command)))
     
     # Message handlers
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot_instance.handle_message))
-    application.add_handler(MessageHandler(filters.VIDEO | filters.Document.ALL, bot_instance.handle_file_upload))
+    application.add_handler(MessageHandler(
+        filters.TEXT & ~filters.COMMAND, metrics.instrument_handler('message', bot_instance.handle_message, handler_branch)
+    ))
+    application.add_handler(MessageHandler(
+        filters.VIDEO | filters.Document.ALL, metrics.instrument_handler('file_upload', bot_instance.handle_file_upload)
+    ))
     
     # Callback query handlers
-    application.add_handler(CallbackQueryHandler(bot_instance.handle_callback_query))
+    application.add_handler(CallbackQueryHandler(
+        metrics.instrument_handler('callback_query', bot_instance.handle_callback_query, handler_branch)
+    ))
+    
+    # Inline mode typeahead search (inline mode must be enabled with @BotFather's /setinline)
+    application.add_handler(InlineQueryHandler(metrics.instrument_handler('inline_query', bot_instance.handle_inline_query)))
     
-    # Language selection handler
-    application.add_handler(CallbackQueryHandler(bot_instance.handle_language_selection, pattern='^lang_'))
+    # Channel membership updates (the bot must be an admin of the channel)
+    application.add_handler(ChatMemberHandler(
+        metrics.instrument_handler('chat_member', bot_instance.handle_chat_member), ChatMemberHandler.CHAT_MEMBER
+    ))
+    
+    return application
+
+def run_webhook(application):
+    """Serve updates over an embedded HTTP server that Telegram posts to"""
+    if not WEBHOOK_SECRET:
+        print("Warning: WEBHOOK_SECRET is not set, webhook requests are not authenticated")
+    
+    print(f"Bot is starting in webhook mode on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}...")
+    application.run_webhook(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=WEBHOOK_PATH,
+        webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET or None,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=Update.ALL_TYPES,
+        drop_pending_updates=DROP_PENDING_UPDATES
+    )
+
+def build_worker_application(index, workers, bus):
+    """Application for one shard worker; its updates come from the front receiver"""
+    # Each client copies the shared session file again, so a later login reaches every worker
+    bot_instance = MovieBot(
+        workers=workers, primary=index == 0,
+        client_factory=lambda: TelegramClient(shard_session(TELETHON_SESSION, index), API_ID, API_HASH)
+    )
+    bot_instance.attach_bus(bus)
+    bot_instance.metrics_port = METRICS_PORT + index
+    with bot_instance.startup.phase('application'):
+        return build_application(bot_instance, receive_updates=False)
+
+def run_sharded(workers):
+    """One process receives updates and hands each user's to the same one of several workers"""
+    # Apply migrations once before the workers open the database
+    Database().close()
+    
+    front = FrontReceiver(workers, build_worker_application, BOT_TOKEN, BOT_API_URL or 'https://api.telegram.org')
+    front.start()
+    print(f"Bot is starting with {workers} shard workers...")
+    try:
+        if BOT_MODE == 'webhook':
+            asyncio.run(front.serve_webhook(
+                WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH,
+                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET or None,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=DROP_PENDING_UPDATES
+            ))
+        else:
+            asyncio.run(front.poll(allowed_updates=Update.ALL_TYPES, drop_pending_updates=DROP_PENDING_UPDATES))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        front.stop()
+
+def main():
+    # Without it PTB would register its local listen address with Telegram
+    if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+        raise SystemExit("WEBHOOK_URL must be set to the bot's public base URL when BOT_MODE is 'webhook'")
+    
+    if SHARD_WORKERS > 1:
+        run_sharded(SHARD_WORKERS)
+        return
+    
+    bot_instance = MovieBot()
+    with bot_instance.startup.phase('application'):
+        application = build_application(bot_instance)
     
-    print("Bot is starting...")
-    application.run_polling()
+    if BOT_MODE == 'webhook':
+        run_webhook(application)
+    else:
+        print("Bot is starting...")
+        application.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=DROP_PENDING_UPDATES)
 
 if __name__ == '__main__':
     main()
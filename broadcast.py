@@ -0,0 +1,148 @@
+import asyncio
+import time
+from telegram.error import Forbidden
+from i18n import get_text
+from send_scheduler import TokenBucket, BULK, INTERACTIVE
+
+# Outcomes are stored in batches of this many as sends complete
+RESULTS_BATCH_SIZE = 20
+
+
+class BroadcastEngine:
+    """Resumable, throttled admin broadcasts.
+    
+    Recipients are streamed from the users table in chunks and sent to
+    concurrently at a fixed rate on the bulk lane of the send scheduler.
+    Outcomes are stored in broadcast_recipients in small batches as sends
+    complete, and what is done is stored when the bot stops, so a broadcast
+    interrupted by a crash or restart carries on where it stopped, and
+    users who blocked the bot are flagged and skipped from then on.
+    """
+    
+    def __init__(self, db, sender, rate, concurrency, chunk_size, progress_interval):
+        self.db = db
+        self.sender = sender
+        self.rate = rate
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.progress_interval = progress_interval
+        self._tasks = {}
+    
+    async def start(self, bot, admin_id, language, text):
+        """Create a broadcast and send it in the background; returns its id"""
+        broadcast_id = await self.db.create_broadcast(admin_id, language, text)
+        self._spawn(bot, broadcast_id, admin_id, language, text, last_user_id=0)
+        return broadcast_id
+    
+    async def resume_all(self, bot):
+        """Continue broadcasts that were still running when the bot stopped"""
+        for broadcast in await self.db.get_running_broadcasts():
+            broadcast_id, admin_id, language, text, _, last_user_id = broadcast[:6]
+            if broadcast_id not in self._tasks:
+                print(f"Resuming broadcast {broadcast_id} after user {last_user_id}")
+                self._spawn(bot, broadcast_id, admin_id, language, text, last_user_id)
+    
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        # Each one stores the outcomes it already has before it ends
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = {}
+    
+    def _spawn(self, bot, broadcast_id, admin_id, language, text, last_user_id):
+        task = asyncio.create_task(self._run(bot, broadcast_id, admin_id, language, text, last_user_id))
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+    
+    async def _send_one(self, bot, bucket, slots, telegram_id, text):
+        async with slots:
+            wait = bucket.delay(time.monotonic())
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = bucket.delay(time.monotonic())
+            bucket.consume(time.monotonic())
+            try:
+                await self.sender.send(telegram_id, bot.send_message, chat_id=telegram_id, text=text, priority=BULK)
+                return 'sent'
+            except Forbidden:
+                return 'blocked'
+            except Exception as e:
+                print(f"Broadcast send to {telegram_id} failed: {e}")
+                return 'failed'
+    
+    async def _report(self, bot, admin_id, progress_message, text):
+        try:
+            if progress_message is None:
+                return await self.sender.send(
+                    admin_id, bot.send_message,
+                    chat_id=admin_id,
+                    text=text
+                )
+            await self.sender.send(
+                admin_id, bot.edit_message_text,
+                chat_id=admin_id,
+                message_id=progress_message.message_id,
+                text=text,
+                priority=INTERACTIVE
+            )
+        except Exception as e:
+            print(f"Broadcast progress update failed: {e}")
+        return progress_message
+    
+    async def _run(self, bot, broadcast_id, admin_id, language, text, last_user_id):
+        bucket = TokenBucket(self.rate, 1)
+        slots = asyncio.Semaphore(self.concurrency)
+        started = time.monotonic()
+        reported = started
+        sent_this_run = 0
+        progress_message = None
+        # (users.id, status) outcomes not stored yet
+        results = []
+        totals = None
+        
+        async def record(cursor):
+            nonlocal totals
+            batch = results[:]
+            del results[:]
+            totals = await self.db.record_broadcast_results(broadcast_id, batch, cursor)
+        
+        async def send(user_id, telegram_id, cursor):
+            results.append((user_id, await self._send_one(bot, bucket, slots, telegram_id, text)))
+            if len(results) >= RESULTS_BATCH_SIZE:
+                # The cursor stays at the chunk's start until all of it is done;
+                # users already stored are skipped when the broadcast resumes
+                await record(cursor)
+        
+        try:
+            while True:
+                recipients = await self.db.get_broadcast_recipients(broadcast_id, last_user_id, self.chunk_size)
+                if not recipients:
+                    break
+                
+                await asyncio.gather(*(
+                    send(user_id, telegram_id, last_user_id) for user_id, telegram_id in recipients
+                ))
+                last_user_id = recipients[-1][0]
+                await record(last_user_id)
+                sent_this_run += len(recipients)
+                
+                now = time.monotonic()
+                if now - reported >= self.progress_interval:
+                    reported = now
+                    rate = sent_this_run / (now - started)
+                    progress_message = await self._report(
+                        bot, admin_id, progress_message,
+                        get_text(language, 'broadcast_progress').format(broadcast_id, *totals, rate)
+                    )
+        except asyncio.CancelledError:
+            # Stopping: keep what was already sent so resuming doesn't send it again
+            if results:
+                await record(last_user_id)
+            raise
+        
+        totals = await self.db.finish_broadcast(broadcast_id)
+        await self._report(
+            bot, admin_id, progress_message,
+            get_text(language, 'broadcast_finished').format(broadcast_id, *totals)
+        )
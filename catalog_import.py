@@ -0,0 +1,170 @@
+"""Streaming movie catalog import from CSV or JSON Lines files.
+
+Each record carries title, description, genre, year, file_id and file_type
+(CSV files need a header row; JSONL files have one object per line).
+Records are validated, de-duplicated against the catalog and against each
+other by file_id and by title + year, and handed to Database.add_movies in
+chunks, each chunk one transaction with a bulk search index update. The
+file is read as a stream, so catalog size is bounded by the disk rather
+than by memory.
+"""
+import asyncio
+import csv
+import datetime
+import json
+import os
+import random
+import string
+import time
+from config import CATALOG_IMPORT_CHUNK_SIZE
+
+FIELDS = ('title', 'description', 'genre', 'year', 'file_id', 'file_type')
+FILE_TYPES = ('video', 'document')
+EXTENSIONS = ('.csv', '.jsonl', '.ndjson')
+MAX_ERRORS = 10
+
+
+def read_records(path):
+    """Yield (line number, record dict) from a CSV or JSONL file"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError(f"unsupported catalog format '{extension}', expected one of {', '.join(EXTENSIONS)}")
+    
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if extension == '.csv':
+            reader = csv.DictReader(f)
+            missing = {'title', 'file_id'} - set(reader.fieldnames or ())
+            if missing:
+                raise ValueError(f"CSV header is missing {', '.join(sorted(missing))}")
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, ValueError(f"invalid JSON: {e.msg}")
+                    continue
+                yield line_number, record
+
+
+def validate(record):
+    """Normalize a record to (title, description, genre, year, file_id, file_type); ValueError if unusable"""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError('record is not an object')
+    
+    values = {field: record.get(field) for field in FIELDS}
+    for field, value in values.items():
+        values[field] = '' if value is None else str(value).strip()
+    
+    if not values['title']:
+        raise ValueError('title is empty')
+    if not values['file_id']:
+        raise ValueError('file_id is empty')
+    
+    file_type = values['file_type'].lower() or 'video'
+    if file_type not in FILE_TYPES:
+        raise ValueError(f"file_type '{values['file_type']}' is not one of {', '.join(FILE_TYPES)}")
+    
+    year = None
+    if values['year']:
+        try:
+            year = int(values['year'])
+        except ValueError:
+            raise ValueError(f"year '{values['year']}' is not a number")
+        if not 1888 <= year <= datetime.date.today().year + 5:
+            raise ValueError(f"year {year} is out of range")
+    
+    return values['title'], values['description'], values['genre'], year, values['file_id'], file_type
+
+
+class CatalogImport:
+    """One import run: yields chunks of new movies and keeps the counts for the report"""
+    
+    def __init__(self, path, existing, chunk_size=CATALOG_IMPORT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.movie_ids, self.file_ids, self.titles = existing
+        self.read = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+        self.started = time.perf_counter()
+    
+    def new_movie_id(self):
+        """Random ID in the bot's format that isn't taken yet"""
+        while True:
+            movie_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+            if movie_id not in self.movie_ids:
+                self.movie_ids.add(movie_id)
+                return movie_id
+    
+    def chunks(self):
+        """Yield lists of (movie_id, title, description, genre, year, file_id, file_type) ready to insert"""
+        chunk = []
+        for line_number, record in read_records(self.path):
+            self.read += 1
+            try:
+                title, description, genre, year, file_id, file_type = validate(record)
+            except ValueError as e:
+                self.invalid += 1
+                if len(self.errors) < MAX_ERRORS:
+                    self.errors.append(f"line {line_number}: {e}")
+                continue
+            
+            title_key = (title.casefold(), year)
+            if file_id in self.file_ids or title_key in self.titles:
+                self.duplicates += 1
+                continue
+            self.file_ids.add(file_id)
+            self.titles.add(title_key)
+            
+            chunk.append((self.new_movie_id(), title, description, genre, year, file_id, file_type))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'read': self.read,
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'errors': self.errors,
+            'seconds': round(elapsed, 2),
+            'rows_per_second': round(self.read / elapsed, 1) if elapsed else 0.0
+        }
+
+
+def import_catalog(db, path, added_by=None, chunk_size=CATALOG_IMPORT_CHUNK_SIZE, dry_run=False):
+    """Import a catalog file into a Database; returns the report dict"""
+    job = CatalogImport(path, db.get_catalog_keys(), chunk_size)
+    for chunk in job.chunks():
+        job.imported += len(chunk) if dry_run else db.add_movies(chunk, added_by)
+    return job.report()
+
+
+async def import_catalog_async(db, path, added_by=None, chunk_size=CATALOG_IMPORT_CHUNK_SIZE):
+    """import_catalog for an AsyncDatabase; other writes get their turn between chunks.
+    
+    Reading, validating and de-duplicating run in an executor, so the event
+    loop stays free even across long stretches of the file that yield no
+    new movies.
+    """
+    loop = asyncio.get_running_loop()
+    job = CatalogImport(path, await db.get_catalog_keys(), chunk_size)
+    chunks = job.chunks()
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks, None)
+        if chunk is None:
+            break
+        job.imported += await db.add_movies(chunk, added_by)
+    return job.report()
@@ -17,3 +17,95 @@ ADMIN_IDS = [int(x) for x in os.getenv('ADMIN_IDS', '123456789').split(',')]
 
 # Database path
 DB_PATH = 'movie_bot.db'
+
+# Database connection pool: long-lived per-thread connections in WAL mode
+DB_POOLED = os.getenv('DB_POOLED', '1') == '1'
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+DB_STATEMENT_CACHE = int(os.getenv('DB_STATEMENT_CACHE', '256'))
+DB_READER_THREADS = int(os.getenv('DB_READER_THREADS', '4'))
+
+# Subscription check cache (seconds)
+SUBSCRIPTION_POSITIVE_TTL = int(os.getenv('SUBSCRIPTION_POSITIVE_TTL', '600'))
+SUBSCRIPTION_NEGATIVE_TTL = int(os.getenv('SUBSCRIPTION_NEGATIVE_TTL', '30'))
+
+# Channel membership snapshot reconciliation interval (seconds)
+MEMBERSHIP_RECONCILE_INTERVAL = int(os.getenv('MEMBERSHIP_RECONCILE_INTERVAL', '3600'))
+
+# Movie view counters are flushed to the database in batches
+VIEW_FLUSH_INTERVAL = int(os.getenv('VIEW_FLUSH_INTERVAL', '10'))
+VIEW_FLUSH_THRESHOLD = int(os.getenv('VIEW_FLUSH_THRESHOLD', '500'))
+
+# Movie lists: 'compact' sends one text message per page, 'media' one message per movie
+LIST_RENDER_MODE = os.getenv('LIST_RENDER_MODE', 'compact')
+MEDIA_GROUP_SIZE = 10
+
+# Outbound send scheduler (Telegram allows ~30 messages/s overall and ~1/s per chat)
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', '28'))
+SEND_GLOBAL_BURST = int(os.getenv('SEND_GLOBAL_BURST', '2'))
+SEND_PER_CHAT_RATE = float(os.getenv('SEND_PER_CHAT_RATE', '1'))
+SEND_PER_CHAT_BURST = int(os.getenv('SEND_PER_CHAT_BURST', '3'))
+SEND_MAX_IN_FLIGHT = int(os.getenv('SEND_MAX_IN_FLIGHT', '32'))
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '5'))
+
+# Admin broadcasts
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '20'))
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '10'))
+BROADCAST_CHUNK_SIZE = int(os.getenv('BROADCAST_CHUNK_SIZE', '200'))
+BROADCAST_PROGRESS_INTERVAL = int(os.getenv('BROADCAST_PROGRESS_INTERVAL', '5'))
+
+# Catalog imports (manage.py import-catalog, or a .csv/.jsonl file sent by an admin)
+CATALOG_IMPORT_CHUNK_SIZE = int(os.getenv('CATALOG_IMPORT_CHUNK_SIZE', '2000'))
+
+# Inline mode (@bot query) typeahead search from an in-memory title index
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', '300'))  # Seconds Telegram may cache an answer
+INLINE_PAGE_SIZE = int(os.getenv('INLINE_PAGE_SIZE', '20'))  # Results per answer, 50 at most
+TITLE_INDEX_REFRESH_INTERVAL = int(os.getenv('TITLE_INDEX_REFRESH_INTERVAL', '60'))  # Seconds between catalog syncs
+
+# "Because you watched" recommendations from co-watch counts
+RECOMMENDATION_TOP_K = int(os.getenv('RECOMMENDATION_TOP_K', '10'))  # Similar movies stored per movie
+RECOMMENDATION_ROW_SIZE = int(os.getenv('RECOMMENDATION_ROW_SIZE', '3'))  # Shown under a movie or the menu
+RECOMMENDATION_REFRESH_INTERVAL = int(os.getenv('RECOMMENDATION_REFRESH_INTERVAL', '60'))
+RECOMMENDATION_BATCH_SIZE = int(os.getenv('RECOMMENDATION_BATCH_SIZE', '500'))  # Watch events per transaction
+
+# Trending lists (time-decayed watch counts), refreshed in the background
+TRENDING_REFRESH_INTERVAL = int(os.getenv('TRENDING_REFRESH_INTERVAL', '300'))
+TRENDING_SIZE = int(os.getenv('TRENDING_SIZE', '100'))  # Ranked movies kept per list
+TRENDING_BY_LANGUAGE = os.getenv('TRENDING_BY_LANGUAGE', '1') == '1'  # Separate lists per watcher language
+
+# How updates are received: 'polling' (getUpdates) or 'webhook' (embedded HTTP server)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # Public base URL, e.g. https://bot.example.com
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+# Discard updates sent while the bot was down instead of handling them on start
+DROP_PENDING_UPDATES = os.getenv('DROP_PENDING_UPDATES', '0') == '1'
+
+# Bot API server (override to use a local Bot API server or a test double)
+BOT_API_URL = os.getenv('BOT_API_URL', '')
+
+# Updates handled at once; each user's updates are still processed in order
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '64'))
+
+# Worker processes; above 1 a front process receives updates and shards them by user
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '1'))
+
+# Prometheus metrics on a local HTTP port (shard workers use METRICS_PORT + worker index)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '0') == '1'
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+
+# Startup: Telethon connects in the background, retrying with backoff up to this delay (seconds),
+# a session that isn't logged in is re-checked this often (seconds),
+# and the heavy background jobs (trending, recommendations) wait this long before their first run
+TELETHON_SESSION = os.getenv('TELETHON_SESSION', 'session')
+TELETHON_RETRY_MAX_DELAY = int(os.getenv('TELETHON_RETRY_MAX_DELAY', '60'))
+TELETHON_AUTH_RECHECK_INTERVAL = int(os.getenv('TELETHON_AUTH_RECHECK_INTERVAL', '60'))
+BACKGROUND_START_DELAY = int(os.getenv('BACKGROUND_START_DELAY', '30'))
+
+# Conversation state (context.user_data) persisted in the database; dirty entries are written every interval (seconds)
+PERSISTENCE_ENABLED = os.getenv('PERSISTENCE_ENABLED', '1') == '1'
+PERSISTENCE_UPDATE_INTERVAL = int(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '15'))
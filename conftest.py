@@ -0,0 +1 @@
+# Lets tests/ import the bot's top-level modules when pytest is run from the repository root
@@ -1,128 +1,238 @@
 import sqlite3
 import os
-from config import DB_PATH
+import re
+import asyncio
+import functools
+import heapq
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from migrations import run_migrations, fill_stats
+from config import DB_PATH, DB_POOLED, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_STATEMENT_CACHE, DB_READER_THREADS
+
+# Full-text index over movies. unicode61 folds case for Latin and Cyrillic;
+# the Uzbek apostrophe letters (U+02BB/U+02BC) are made separators so
+# "oʻzbek" and "o'zbek" tokenize the same way, and ё is folded to е in SQL
+# because unicode61 doesn't treat it as a diacritic.
+FTS_TOKENIZE = "unicode61 remove_diacritics 2 separators ''\u02bb\u02bc''"
+
+
+def _fts_text(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+FTS_INSERT_TRIGGER = f'''
+        CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN
+            INSERT INTO movies_fts (rowid, title, description, genre)
+            VALUES (new.id, {_fts_text('new.title')}, {_fts_text('new.description')}, {_fts_text('new.genre')});
+        END
+    '''
+
+FTS_SCHEMA = [
+    f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+            title, description, genre,
+            content='movies', content_rowid='id',
+            tokenize='{FTS_TOKENIZE}',
+            prefix='2 3'
+        )
+    ''',
+    FTS_INSERT_TRIGGER,
+    f'''
+        CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN
+            INSERT INTO movies_fts (movies_fts, rowid, title, description, genre)
+            VALUES ('delete', old.id, {_fts_text('old.title')}, {_fts_text('old.description')}, {_fts_text('old.genre')});
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF title, description, genre ON movies BEGIN
+            INSERT INTO movies_fts (movies_fts, rowid, title, description, genre)
+            VALUES ('delete', old.id, {_fts_text('old.title')}, {_fts_text('old.description')}, {_fts_text('old.genre')});
+            INSERT INTO movies_fts (rowid, title, description, genre)
+            VALUES (new.id, {_fts_text('new.title')}, {_fts_text('new.description')}, {_fts_text('new.genre')});
+        END
+    '''
+]
+
+FTS_OBJECTS = ('movies_fts', 'movies_fts_insert', 'movies_fts_delete', 'movies_fts_update')
+
+# bm25 column weights: title, description, genre
+FTS_RANK = 'bm25(10.0, 1.0, 3.0)'
+
+
+def build_fts_query(query):
+    """Turn free user input into an FTS5 query: every word must match, the last ones as prefixes"""
+    query = query.replace('ё', 'е').replace('Ё', 'Е')
+    terms = [term.replace('"', '""') for term in query.split() if re.search(r'\w', term)]
+    return ' '.join(f'"{term}"*' for term in terms)
+
 
 class Database:
-    def __init__(self):
-        self.db_path = DB_PATH
+    def __init__(self, db_path=None, pooled=None):
+        self.db_path = db_path or DB_PATH
+        self.pooled = DB_POOLED if pooled is None else pooled
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
         self.init_db()
     
+    def _connect(self):
+        """Open a connection with the pragmas used by the pooled mode"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE
+        )
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute('PRAGMA busy_timeout = 5000')
+        return conn
+    
+    def get_connection(self):
+        """Return a connection: a long-lived per-thread one in pooled mode, a fresh one otherwise"""
+        if not self.pooled:
+            return sqlite3.connect(self.db_path)
+        
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def release_connection(self, conn):
+        """Hand a connection back after use"""
+        if not self.pooled:
+            conn.close()
+        elif conn.in_transaction:
+            # A method failed half-way; don't keep the write lock on a pooled connection
+            conn.rollback()
+    
+    def close(self):
+        """Close every pooled connection"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        self._local = threading.local()
+    
     def init_db(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY,
-                telegram_id INTEGER UNIQUE,
-                phone_number TEXT,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                language TEXT DEFAULT 'en',
-                is_subscribed INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # Tables and indexes
+        run_migrations(conn)
         
-        # Movies table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS movies (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                movie_id TEXT UNIQUE,
-                title TEXT,
-                description TEXT,
-                genre TEXT,
-                year INTEGER,
-                file_id TEXT,
-                file_type TEXT,
-                added_by INTEGER,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                views INTEGER DEFAULT 0
-            )
-        ''')
+        # Full-text search index
+        self.fts_enabled = self.init_search_index(cursor)
         
-        # Watched movies table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS watched_movies (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                movie_id TEXT,
-                watched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (movie_id) REFERENCES movies (movie_id)
-            )
-        ''')
+        conn.commit()
+        self.release_connection(conn)
+    
+    def init_search_index(self, cursor):
+        """Create the FTS5 index and its sync triggers; False when SQLite lacks FTS5"""
+        cursor.execute(
+            f"SELECT name FROM sqlite_master WHERE name IN ({', '.join('?' * len(FTS_OBJECTS))})", FTS_OBJECTS
+        )
+        found = {row[0] for row in cursor.fetchall()}
+        if len(found) == len(FTS_OBJECTS):
+            # Set up on an earlier start: nothing to create
+            return True
+        exists = 'movies_fts' in found
         
-        # Watch later table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS watch_later (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                movie_id TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (movie_id) REFERENCES movies (movie_id)
-            )
-        ''')
+        try:
+            for statement in FTS_SCHEMA:
+                cursor.execute(statement)
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search unavailable, falling back to LIKE: {e}")
+            return False
         
-        # User subscriptions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_subscriptions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                subscribed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
+        if not exists:
+            # Existing databases get their current movies indexed once
+            cursor.execute("INSERT INTO movies_fts (movies_fts, rank) VALUES ('rank', ?)", (FTS_RANK,))
+            self._fill_search_index(cursor)
+        return True
+    
+    def _fill_search_index(self, cursor):
+        cursor.execute("INSERT INTO movies_fts (movies_fts) VALUES ('delete-all')")
+        cursor.execute(f'''
+            INSERT INTO movies_fts (rowid, title, description, genre)
+            SELECT id, {_fts_text('title')}, {_fts_text('description')}, {_fts_text('genre')} FROM movies
         ''')
+    
+    def rebuild_search_index(self):
+        """Re-index every movie from scratch; returns the number of indexed movies"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
+        self._fill_search_index(cursor)
+        cursor.execute("INSERT INTO movies_fts (movies_fts) VALUES ('optimize')")
         conn.commit()
-        conn.close()
+        
+        cursor.execute('SELECT COUNT(*) FROM movies')
+        count = cursor.fetchone()[0]
+        self.release_connection(conn)
+        return count
     
     def add_user(self, telegram_id, phone_number=None, username=None, first_name=None, last_name=None):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
+            # Upsert so an existing user keeps their id, language and subscription status
             cursor.execute('''
-                INSERT OR REPLACE INTO users 
+                INSERT INTO users 
                 (telegram_id, phone_number, username, first_name, last_name)
                 VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (telegram_id) DO UPDATE SET
+                    phone_number = COALESCE(excluded.phone_number, phone_number),
+                    username = excluded.username,
+                    first_name = excluded.first_name,
+                    last_name = excluded.last_name,
+                    is_blocked = 0
             ''', (telegram_id, phone_number, username, first_name, last_name))
             conn.commit()
         except Exception as e:
             print(f"Error adding user: {e}")
         finally:
-            conn.close()
+            self.release_connection(conn)
     
     def get_user(self, telegram_id):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM users WHERE telegram_id = ?', (telegram_id,))
         user = cursor.fetchone()
-        conn.close()
+        self.release_connection(conn)
         return user
     
     def update_language(self, telegram_id, language):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('UPDATE users SET language = ? WHERE telegram_id = ?', (language, telegram_id))
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
     
     def update_subscription_status(self, telegram_id, status):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('UPDATE users SET is_subscribed = ? WHERE telegram_id = ?', (status, telegram_id))
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
     
     def add_movie(self, movie_id, title, description, genre, year, file_id, file_type, added_by):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
@@ -136,86 +246,226 @@ class Database:
             print(f"Error adding movie: {e}")
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
+    
+    def add_movies(self, movies, added_by=None):
+        """Insert a chunk of (movie_id, title, description, genre, year, file_id, file_type) in one transaction.
+        
+        The per-row search index trigger is dropped for the chunk and the new
+        rows are indexed with a single INSERT ... SELECT instead; DDL is
+        transactional in SQLite, so other connections never see the trigger
+        missing. Returns the number of movies added.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            if self.fts_enabled:
+                cursor.execute('SELECT COALESCE(MAX(id), 0) FROM movies')
+                last_id = cursor.fetchone()[0]
+                cursor.execute('DROP TRIGGER IF EXISTS movies_fts_insert')
+            cursor.executemany('''
+                INSERT INTO movies (movie_id, title, description, genre, year, file_id, file_type, added_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [movie + (added_by,) for movie in movies])
+            if self.fts_enabled:
+                cursor.execute(f'''
+                    INSERT INTO movies_fts (rowid, title, description, genre)
+                    SELECT id, {_fts_text('title')}, {_fts_text('description')}, {_fts_text('genre')}
+                    FROM movies WHERE id > ?
+                ''', (last_id,))
+                cursor.execute(FTS_INSERT_TRIGGER)
+            conn.commit()
+            return len(movies)
+        finally:
+            self.release_connection(conn)
+    
+    def get_catalog_keys(self):
+        """Sets of existing movie IDs, file IDs and (title, year) pairs, for de-duplicating imports"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        movie_ids, file_ids, titles = set(), set(), set()
+        cursor.execute('SELECT movie_id, file_id, title, year FROM movies')
+        for movie_id, file_id, title, year in cursor:
+            movie_ids.add(movie_id)
+            file_ids.add(file_id)
+            titles.add(((title or '').strip().casefold(), year))
+        self.release_connection(conn)
+        return movie_ids, file_ids, titles
     
     def get_movie_by_id(self, movie_id):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM movies WHERE movie_id = ?', (movie_id,))
         movie = cursor.fetchone()
-        conn.close()
+        self.release_connection(conn)
+        return movie
+    
+    def get_movie_by_key(self, key):
+        """A movie by its row id, the compact key inline buttons carry"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM movies WHERE id = ?', (key,))
+        movie = cursor.fetchone()
+        self.release_connection(conn)
         return movie
     
     def get_all_movies(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM movies ORDER BY added_at DESC')
         movies = cursor.fetchall()
-        conn.close()
+        self.release_connection(conn)
         return movies
     
-    def search_movies(self, query):
-        conn = sqlite3.connect(self.db_path)
+    def _fetch_page(self, base_query, params, sort_column, id_column, cursor, backwards, limit):
+        """Keyset pagination over (sort_column, id_column), newest first.
+        
+        cursor is (unix_time, id) from a previous page's 'next'/'prev'; rows
+        come back without OFFSET scans. Returns the page's movies plus the
+        cursors for the following (older) and preceding (newer) pages.
+        """
+        conn = self.get_connection()
+        cursor_obj = conn.cursor()
+        
+        query = f'''
+            SELECT m.*, CAST(strftime('%s', {sort_column}) AS INTEGER), {id_column}
+            {base_query}
+        '''
+        query_params = list(params)
+        if cursor is not None:
+            operator = '>' if backwards else '<'
+            query += f" AND ({sort_column}, {id_column}) {operator} (datetime(?, 'unixepoch'), ?)"
+            query_params.extend(cursor)
+        order = 'ASC' if backwards else 'DESC'
+        query += f' ORDER BY {sort_column} {order}, {id_column} {order} LIMIT ?'
+        query_params.append(limit + 1)
+        
+        cursor_obj.execute(query, query_params)
+        rows = cursor_obj.fetchall()
+        self.release_connection(conn)
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+        
+        first = (rows[0][-2], rows[0][-1]) if rows else None
+        last = (rows[-1][-2], rows[-1][-1]) if rows else None
+        if backwards:
+            prev_cursor, next_cursor = (first if has_more else None), last
+        else:
+            prev_cursor, next_cursor = (first if cursor is not None else None), (last if has_more else None)
+        
+        return {
+            'movies': [row[:-2] for row in rows],
+            'next': next_cursor,
+            'prev': prev_cursor
+        }
+    
+    def get_movies_page(self, cursor=None, backwards=False, limit=10):
+        return self._fetch_page(
+            'FROM movies m WHERE 1 = 1', (),
+            'm.added_at', 'm.id', cursor, backwards, limit
+        )
+    
+    def get_watch_later_page(self, user_id, cursor=None, backwards=False, limit=10):
+        return self._fetch_page('''
+            FROM movies m
+            JOIN watch_later wl ON m.movie_id = wl.movie_id
+            WHERE wl.user_id = ?
+        ''', (user_id,), 'wl.added_at', 'wl.id', cursor, backwards, limit)
+    
+    def get_watched_page(self, user_id, cursor=None, backwards=False, limit=10):
+        return self._fetch_page('''
+            FROM movies m
+            JOIN watched_movies wm ON m.movie_id = wm.movie_id
+            WHERE wm.user_id = ?
+        ''', (user_id,), 'wm.watched_at', 'wm.id', cursor, backwards, limit)
+    
+    def search_movies(self, query, limit=10):
+        conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT * FROM movies 
-            WHERE title LIKE ? OR description LIKE ? OR genre LIKE ?
-        ''', (f'%{query}%', f'%{query}%', f'%{query}%'))
+        if self.fts_enabled:
+            fts_query = build_fts_query(query)
+            if not fts_query:
+                self.release_connection(conn)
+                return []
+            cursor.execute('''
+                SELECT m.* FROM movies_fts
+                JOIN movies m ON m.id = movies_fts.rowid
+                WHERE movies_fts MATCH ?
+                ORDER BY movies_fts.rank
+                LIMIT ?
+            ''', (fts_query, limit))
+        else:
+            cursor.execute('''
+                SELECT * FROM movies 
+                WHERE title LIKE ? OR description LIKE ? OR genre LIKE ?
+                LIMIT ?
+            ''', (f'%{query}%', f'%{query}%', f'%{query}%', limit))
         movies = cursor.fetchall()
-        conn.close()
+        self.release_connection(conn)
         return movies
     
-    def add_to_watched(self, user_id, movie_id):
-        conn = sqlite3.connect(self.db_path)
+    def add_to_watched(self, user_id, movie_id, count_view=True):
+        conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Check if already watched
         cursor.execute('''
-            SELECT id FROM watched_movies WHERE user_id = ? AND movie_id = ?
+            INSERT INTO watched_movies (user_id, movie_id)
+            VALUES (?, ?)
+            ON CONFLICT (user_id, movie_id) DO NOTHING
         ''', (user_id, movie_id))
-        if not cursor.fetchone():
-            cursor.execute('''
-                INSERT INTO watched_movies (user_id, movie_id)
-                VALUES (?, ?)
-            ''', (user_id, movie_id))
-            conn.commit()
         
-        # Update movie views
-        cursor.execute('UPDATE movies SET views = views + 1 WHERE movie_id = ?', (movie_id,))
+        # Update movie views, unless the caller aggregates them (see ViewCounter)
+        if count_view:
+            cursor.execute('UPDATE movies SET views = views + 1 WHERE movie_id = ?', (movie_id,))
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
+    
+    def add_views(self, counts):
+        """Apply a {movie_id: views} batch of increments in one transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany(
+            'UPDATE movies SET views = views + ? WHERE movie_id = ?',
+            [(count, movie_id) for movie_id, count in counts.items()]
+        )
+        conn.commit()
+        self.release_connection(conn)
     
     def add_to_watch_later(self, user_id, movie_id):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Check if already in watch later
         cursor.execute('''
-            SELECT id FROM watch_later WHERE user_id = ? AND movie_id = ?
+            INSERT INTO watch_later (user_id, movie_id)
+            VALUES (?, ?)
+            ON CONFLICT (user_id, movie_id) DO NOTHING
         ''', (user_id, movie_id))
-        if not cursor.fetchone():
-            cursor.execute('''
-                INSERT INTO watch_later (user_id, movie_id)
-                VALUES (?, ?)
-            ''', (user_id, movie_id))
-            conn.commit()
-        conn.close()
+        conn.commit()
+        self.release_connection(conn)
     
     def remove_from_watch_later(self, user_id, movie_id):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
             DELETE FROM watch_later WHERE user_id = ? AND movie_id = ?
         ''', (user_id, movie_id))
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
     
     def get_watch_later(self, user_id):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -225,11 +475,11 @@ class Database:
             ORDER BY wl.added_at DESC
         ''', (user_id,))
         movies = cursor.fetchall()
-        conn.close()
+        self.release_connection(conn)
         return movies
     
     def get_watched_movies(self, user_id):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -239,11 +489,11 @@ class Database:
             ORDER BY wm.watched_at DESC
         ''', (user_id,))
         movies = cursor.fetchall()
-        conn.close()
+        self.release_connection(conn)
         return movies
     
     def get_user_stats(self, telegram_id):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Get user info
@@ -257,7 +507,7 @@ class Database:
         cursor.execute('SELECT COUNT(*) FROM watch_later WHERE user_id = ?', (user[0],))
         watch_later_count = cursor.fetchone()[0]
         
-        conn.close()
+        self.release_connection(conn)
         return {
             'user': user,
             'watched_count': watched_count,
@@ -265,27 +515,533 @@ class Database:
         }
     
     def get_all_users(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM users')
         users = cursor.fetchall()
-        conn.close()
+        self.release_connection(conn)
         return users
     
+    def create_broadcast(self, admin_id, language, text):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO broadcasts (admin_id, language, text) VALUES (?, ?, ?)
+        ''', (admin_id, language, text))
+        broadcast_id = cursor.lastrowid
+        conn.commit()
+        self.release_connection(conn)
+        return broadcast_id
+    
+    def get_running_broadcasts(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM broadcasts WHERE status = 'running' ORDER BY id")
+        broadcasts = cursor.fetchall()
+        self.release_connection(conn)
+        return broadcasts
+    
+    def get_broadcast_recipients(self, broadcast_id, after_user_id, limit):
+        """Next chunk of (users.id, telegram_id) not yet handled by this broadcast, skipping blocked users"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT u.id, u.telegram_id FROM users u
+            WHERE u.id > ? AND u.is_blocked = 0
+            AND NOT EXISTS (
+                SELECT 1 FROM broadcast_recipients r
+                WHERE r.broadcast_id = ? AND r.user_id = u.id
+            )
+            ORDER BY u.id
+            LIMIT ?
+        ''', (after_user_id, broadcast_id, limit))
+        recipients = cursor.fetchall()
+        self.release_connection(conn)
+        return recipients
+    
+    def record_broadcast_results(self, broadcast_id, results, last_user_id):
+        """Store a chunk's [(users.id, status)] outcomes and advance the broadcast's cursor"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO broadcast_recipients (broadcast_id, user_id, status) VALUES (?, ?, ?)
+            ON CONFLICT (broadcast_id, user_id) DO NOTHING
+        ''', [(broadcast_id, user_id, status) for user_id, status in results])
+        cursor.executemany(
+            'UPDATE users SET is_blocked = 1 WHERE id = ?',
+            [(user_id,) for user_id, status in results if status == 'blocked']
+        )
+        cursor.execute('''
+            UPDATE broadcasts SET
+                last_user_id = MAX(last_user_id, ?),
+                sent = sent + ?,
+                failed = failed + ?,
+                blocked = blocked + ?
+            WHERE id = ?
+        ''', (
+            last_user_id,
+            sum(1 for _, status in results if status == 'sent'),
+            sum(1 for _, status in results if status == 'failed'),
+            sum(1 for _, status in results if status == 'blocked'),
+            broadcast_id
+        ))
+        conn.commit()
+        
+        cursor.execute('SELECT sent, failed, blocked FROM broadcasts WHERE id = ?', (broadcast_id,))
+        totals = cursor.fetchone()
+        self.release_connection(conn)
+        return totals
+    
+    def finish_broadcast(self, broadcast_id, status='finished'):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE broadcasts SET status = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?
+        ''', (status, broadcast_id))
+        conn.commit()
+        
+        cursor.execute('SELECT sent, failed, blocked FROM broadcasts WHERE id = ?', (broadcast_id,))
+        totals = cursor.fetchone()
+        self.release_connection(conn)
+        return totals
+    
+    def get_movie_titles(self, after_id=0):
+        """(id, movie_id, title, year, genre) of movies added after a row id, oldest first"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id, movie_id, title, year, genre FROM movies WHERE id > ? ORDER BY id', (after_id,))
+        movies = cursor.fetchall()
+        self.release_connection(conn)
+        return movies
+    
     def get_movies_count(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('SELECT COUNT(*) FROM movies')
         count = cursor.fetchone()[0]
-        conn.close()
+        self.release_connection(conn)
         return count
     
+    def get_movie_ids_checksum(self):
+        """(count, sum) of movie row ids; ids are never reused, so any deletion changes it"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT COUNT(*), COALESCE(SUM(id), 0) FROM movies')
+        checksum = cursor.fetchone()
+        self.release_connection(conn)
+        return checksum
+    
+    def get_stats(self, top_limit=5):
+        """Admin panel statistics from the trigger-maintained counters"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT name, value FROM stats_counters
+            WHERE name IN ('users', 'subscribed', 'blocked', 'movies',
+                           'active:d:' || date('now'), 'active:w:' || strftime('%Y-%W', 'now'))
+               OR (name >= 'language:' AND name < 'language;')
+        ''')
+        counters = dict(cursor.fetchall())
+        
+        cursor.execute('SELECT movie_id, title, views FROM movies ORDER BY views DESC LIMIT ?', (top_limit,))
+        top_movies = cursor.fetchall()
+        self.release_connection(conn)
+        
+        users = counters.get('users', 0)
+        return {
+            'users': users,
+            'active_users': users - counters.get('blocked', 0),
+            'subscribed': counters.get('subscribed', 0),
+            'blocked': counters.get('blocked', 0),
+            'movies': counters.get('movies', 0),
+            'dau': next((value for name, value in counters.items() if name.startswith('active:d:')), 0),
+            'wau': next((value for name, value in counters.items() if name.startswith('active:w:')), 0),
+            'languages': {
+                name.split(':', 1)[1]: value for name, value in counters.items()
+                if name.startswith('language:') and value
+            },
+            'top_movies': top_movies
+        }
+    
+    def rebuild_stats(self):
+        """Recompute the stats counters from scratch; returns the counters that were wrong"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT name, value FROM stats_counters')
+        before = dict(cursor.fetchall())
+        cursor.execute('BEGIN')
+        try:
+            fill_stats(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        cursor.execute('SELECT name, value FROM stats_counters')
+        after = dict(cursor.fetchall())
+        self.release_connection(conn)
+        
+        return {
+            name: (before.get(name, 0), after.get(name, 0))
+            for name in set(before) | set(after)
+            if before.get(name, 0) != after.get(name, 0)
+        }
+    
+    def apply_watch_events(self, limit, top_k):
+        """Fold up to limit new watched_movies rows into the co-occurrence counts and the top-k lists.
+        
+        Each new row pairs with the same user's earlier rows, so every pair is
+        counted once however the rows are batched. The pairs' scores are
+        merged into both movies' stored top k, re-scoring the entries already
+        there, which keeps the cost per pair at O(k) instead of re-ranking
+        whole neighbour lists. Returns the
+        number of rows processed; 0 means the recommendations are up to date.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute("SELECT value FROM recommendation_state WHERE name = 'last_watch_id'")
+            row = cursor.fetchone()
+            last_id = row[0] if row else 0
+            cursor.execute(
+                'SELECT MAX(id), COUNT(*) FROM (SELECT id FROM watched_movies WHERE id > ? ORDER BY id LIMIT ?)',
+                (last_id, limit)
+            )
+            end_id, events = cursor.fetchone()
+            if not events:
+                conn.rollback()
+                return 0
+            bounds = {'last': last_id, 'end': end_id}
+            
+            cursor.execute('''
+                INSERT INTO movie_cooccurrence (movie_a, movie_b, count)
+                SELECT movie_a, movie_b, COUNT(*) FROM (
+                    SELECT n.movie_id AS movie_a, o.movie_id AS movie_b
+                    FROM watched_movies n JOIN watched_movies o ON o.user_id = n.user_id AND o.id < n.id
+                    WHERE n.id > :last AND n.id <= :end
+                    UNION ALL
+                    SELECT o.movie_id, n.movie_id
+                    FROM watched_movies n JOIN watched_movies o ON o.user_id = n.user_id AND o.id < n.id
+                    WHERE n.id > :last AND n.id <= :end
+                    UNION ALL
+                    SELECT movie_id, movie_id FROM watched_movies WHERE id > :last AND id <= :end
+                )
+                GROUP BY movie_a, movie_b
+                ON CONFLICT (movie_a, movie_b) DO UPDATE SET count = count + excluded.count
+            ''', bounds)
+            
+            # Current cosine scores of the pairs these rows formed, in both directions
+            cursor.execute('''
+                SELECT c.movie_a, c.movie_b, c.count, wa.count, wb.count
+                FROM (
+                    SELECT n.movie_id AS movie_a, o.movie_id AS movie_b
+                    FROM watched_movies n JOIN watched_movies o ON o.user_id = n.user_id AND o.id < n.id
+                    WHERE n.id > :last AND n.id <= :end AND o.movie_id != n.movie_id
+                    UNION
+                    SELECT o.movie_id, n.movie_id
+                    FROM watched_movies n JOIN watched_movies o ON o.user_id = n.user_id AND o.id < n.id
+                    WHERE n.id > :last AND n.id <= :end AND o.movie_id != n.movie_id
+                ) p
+                JOIN movie_cooccurrence c ON c.movie_a = p.movie_a AND c.movie_b = p.movie_b
+                JOIN movie_cooccurrence wa ON wa.movie_a = p.movie_a AND wa.movie_b = p.movie_a
+                JOIN movie_cooccurrence wb ON wb.movie_a = p.movie_b AND wb.movie_b = p.movie_b
+            ''', bounds)
+            candidates = {}
+            for movie_a, movie_b, count, watchers_a, watchers_b in cursor.fetchall():
+                watchers, scores = candidates.setdefault(movie_a, (watchers_a, {}))
+                scores[movie_b] = count / math.sqrt(watchers_a * watchers_b)
+            
+            for movie_id, (watchers, scores) in candidates.items():
+                # The movies already in the list are re-scored with the current counts too
+                cursor.execute('''
+                    SELECT s.similar_id, c.count, w.count FROM movie_similar s
+                    JOIN movie_cooccurrence c ON c.movie_a = s.movie_id AND c.movie_b = s.similar_id
+                    JOIN movie_cooccurrence w ON w.movie_a = s.similar_id AND w.movie_b = s.similar_id
+                    WHERE s.movie_id = ?
+                ''', (movie_id,))
+                merged = {
+                    similar_id: count / math.sqrt(watchers * other_watchers)
+                    for similar_id, count, other_watchers in cursor.fetchall()
+                }
+                merged.update(scores)
+                top = heapq.nlargest(top_k, ((score, similar_id) for similar_id, score in merged.items()))
+                cursor.execute('DELETE FROM movie_similar WHERE movie_id = ?', (movie_id,))
+                cursor.executemany(
+                    'INSERT INTO movie_similar (movie_id, rank, similar_id, score) VALUES (?, ?, ?, ?)',
+                    [(movie_id, rank, similar_id, score) for rank, (score, similar_id) in enumerate(top)]
+                )
+            
+            cursor.execute('''
+                INSERT INTO recommendation_state (name, value) VALUES ('last_watch_id', ?)
+                ON CONFLICT (name) DO UPDATE SET value = excluded.value
+            ''', (end_id,))
+            conn.commit()
+            return events
+        finally:
+            self.release_connection(conn)
+    
+    def get_watch_pairs(self):
+        """(last watched_movies id, [(user_id, movie_id), ...]) for a full recommendation rebuild"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM watched_movies')
+        last_id = cursor.fetchone()[0]
+        cursor.execute('SELECT user_id, movie_id FROM watched_movies WHERE id <= ?', (last_id,))
+        pairs = cursor.fetchall()
+        self.release_connection(conn)
+        return last_id, pairs
+    
+    def replace_recommendations(self, cooccurrence, similar, last_id):
+        """Swap in fully rebuilt (movie_a, movie_b, count) and (movie_id, rank, similar_id, score) rows"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('DELETE FROM movie_cooccurrence')
+            cursor.execute('DELETE FROM movie_similar')
+            cursor.executemany('INSERT INTO movie_cooccurrence (movie_a, movie_b, count) VALUES (?, ?, ?)', cooccurrence)
+            cursor.executemany(
+                'INSERT INTO movie_similar (movie_id, rank, similar_id, score) VALUES (?, ?, ?, ?)', similar
+            )
+            # Rows watched during the rebuild are left to the incremental update
+            cursor.execute('''
+                INSERT INTO recommendation_state (name, value) VALUES ('last_watch_id', ?)
+                ON CONFLICT (name) DO UPDATE SET value = excluded.value
+            ''', (last_id,))
+            conn.commit()
+        finally:
+            self.release_connection(conn)
+    
+    def get_similar_movies(self, movie_id, limit=3):
+        """Movies most often watched together with movie_id, best first"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT m.* FROM movie_similar s
+            JOIN movies m ON m.movie_id = s.similar_id
+            WHERE s.movie_id = ?
+            ORDER BY s.rank
+            LIMIT ?
+        ''', (movie_id, limit))
+        movies = cursor.fetchall()
+        self.release_connection(conn)
+        return movies
+    
+    def get_recommendations(self, telegram_id, limit=3):
+        """(title of the user's latest watched movie, unwatched movies similar to it)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            WITH latest AS (
+                SELECT w.user_id, w.movie_id FROM watched_movies w
+                JOIN users u ON u.id = w.user_id
+                WHERE u.telegram_id = ?
+                ORDER BY w.watched_at DESC, w.id DESC
+                LIMIT 1
+            )
+            SELECT watched.title, m.* FROM latest
+            JOIN movies watched ON watched.movie_id = latest.movie_id
+            JOIN movie_similar s ON s.movie_id = latest.movie_id
+            JOIN movies m ON m.movie_id = s.similar_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM watched_movies w WHERE w.user_id = latest.user_id AND w.movie_id = s.similar_id
+            )
+            ORDER BY s.rank
+            LIMIT ?
+        ''', (telegram_id, limit))
+        rows = cursor.fetchall()
+        self.release_connection(conn)
+        if not rows:
+            return None, []
+        return rows[0][0], [row[1:] for row in rows]
+    
+    def get_recent_watches(self, hours):
+        """(movie_id, watcher language, age in whole hours, events) for the last hours of watch history"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT w.movie_id, COALESCE(u.language, ''),
+                   CAST((julianday('now') - julianday(w.watched_at)) * 24 AS INTEGER) AS age, COUNT(*)
+            FROM watched_movies w
+            LEFT JOIN users u ON u.id = w.user_id
+            WHERE w.watched_at >= datetime('now', ?)
+            GROUP BY 1, 2, 3
+        ''', (f'-{hours} hours',))
+        rows = cursor.fetchall()
+        self.release_connection(conn)
+        return rows
+    
+    def get_watch_totals(self):
+        """(movie_id, watcher language, watchers) over the whole watch history"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT w.movie_id, COALESCE(u.language, ''), COUNT(*)
+            FROM watched_movies w
+            LEFT JOIN users u ON u.id = w.user_id
+            GROUP BY 1, 2
+        ''')
+        rows = cursor.fetchall()
+        self.release_connection(conn)
+        return rows
+    
+    def replace_trending(self, rows):
+        """Swap in freshly ranked (period, language, rank, movie_id, score) rows"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('DELETE FROM trending_scores')
+            cursor.executemany(
+                'INSERT INTO trending_scores (period, language, rank, movie_id, score) VALUES (?, ?, ?, ?, ?)', rows
+            )
+            conn.commit()
+        finally:
+            self.release_connection(conn)
+    
+    def get_trending_page(self, period, language, start=0, limit=10):
+        """Movies ranked from start in a trending list, with the 'next'/'prev' start ranks (None at the ends)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # The language's own list when its watchers have one, otherwise everyone's
+        cursor.execute(
+            'SELECT 1 FROM trending_scores WHERE period = ? AND language = ? AND rank = 0', (period, language)
+        )
+        list_language = language if cursor.fetchone() else ''
+        cursor.execute('''
+            SELECT m.* FROM trending_scores t
+            JOIN movies m ON m.movie_id = t.movie_id
+            WHERE t.period = ? AND t.language = ? AND t.rank >= ? AND t.rank <= ?
+            ORDER BY t.rank
+        ''', (period, list_language, start, start + limit))
+        rows = cursor.fetchall()
+        self.release_connection(conn)
+        
+        return {
+            'movies': rows[:limit],
+            'next': start + limit if len(rows) > limit else None,
+            'prev': max(0, start - limit) if start > 0 else None
+        }
+    
+    def get_persisted(self, kind, key):
+        """One persisted JSON document, or None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT data FROM persistence WHERE kind = ? AND key = ?', (kind, key))
+        row = cursor.fetchone()
+        self.release_connection(conn)
+        return row[0] if row else None
+    
+    def get_all_persisted(self, kind):
+        """Every (key, data) row of one kind"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT key, data FROM persistence WHERE kind = ?', (kind,))
+        rows = cursor.fetchall()
+        self.release_connection(conn)
+        return rows
+    
+    def save_persisted(self, rows):
+        """Upsert (kind, key, data) rows in one transaction; rows with data None are deleted"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.executemany('''
+                INSERT INTO persistence (kind, key, data) VALUES (?, ?, ?)
+                ON CONFLICT (kind, key) DO UPDATE SET data = excluded.data, updated_at = CURRENT_TIMESTAMP
+            ''', [row for row in rows if row[2] is not None])
+            cursor.executemany(
+                'DELETE FROM persistence WHERE kind = ? AND key = ?',
+                [(kind, key) for kind, key, data in rows if data is None]
+            )
+            conn.commit()
+        finally:
+            self.release_connection(conn)
+    
     def delete_movie(self, movie_id):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM movies WHERE movie_id = ?', (movie_id,))
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
+
+
+class AsyncDatabase:
+    """Awaitable wrapper around Database for the bot handlers.
+    
+    Writes are queued on a single writer thread so they never contend for the
+    SQLite write lock; reads run concurrently on a small pool of reader threads.
+    Each thread keeps its own pooled connection.
+    """
+    
+    READ_METHODS = {
+        'get_user', 'get_movie_by_id', 'get_movie_by_key', 'get_all_movies', 'search_movies',
+        'get_watch_later', 'get_watched_movies', 'get_user_stats',
+        'get_all_users', 'get_movies_count', 'get_movies_page',
+        'get_watch_later_page', 'get_watched_page', 'get_running_broadcasts',
+        'get_broadcast_recipients', 'get_stats', 'get_catalog_keys', 'get_movie_titles',
+        'get_watch_pairs', 'get_similar_movies', 'get_recommendations',
+        'get_recent_watches', 'get_watch_totals', 'get_trending_page', 'get_persisted',
+        'get_all_persisted', 'get_movie_ids_checksum'
+    }
+    
+    def __init__(self, db=None, readers=None):
+        self.db = db or Database()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._readers = ThreadPoolExecutor(
+            max_workers=readers or DB_READER_THREADS,
+            thread_name_prefix='db-reader'
+        )
+    
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+        if not callable(method):
+            return method
+        executor = self._readers if name in self.READ_METHODS else self._writer
+        
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            if not metrics.enabled:
+                return await loop.run_in_executor(executor, functools.partial(method, *args, **kwargs))
+            started = time.perf_counter()
+            try:
+                return await loop.run_in_executor(executor, functools.partial(method, *args, **kwargs))
+            except Exception:
+                metrics.DB_ERRORS.inc(name)
+                raise
+            finally:
+                metrics.DB_SECONDS.observe(time.perf_counter() - started, name)
+        
+        call.__name__ = name
+        return call
+    
+    def close(self):
+        """Wait for queued queries, then close the threads and connections"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.db.close()
@@ -0,0 +1,50 @@
+import json
+import os
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locales')
+DEFAULT_LANGUAGE = 'en'
+
+# Reply keyboard buttons that handle_message routes on
+MENU_ACTIONS = (
+    'main_menu', 'movies', 'trending', 'watch_later', 'watched', 'search', 'my_account', 'admin_panel',
+    'broadcast', 'back'
+)
+
+
+def load_catalog(directory=LOCALES_DIR):
+    """Load every <language>.json file; keys missing from a language fall back to English"""
+    catalog = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name), encoding='utf-8') as fh:
+                catalog[name[:-len('.json')]] = json.load(fh)
+    
+    default = catalog.get(DEFAULT_LANGUAGE, {})
+    for texts in catalog.values():
+        for key, value in default.items():
+            texts.setdefault(key, value)
+    return catalog
+
+
+def build_button_index(catalog, actions=MENU_ACTIONS):
+    """Map each button label to (language, action)"""
+    index = {}
+    for language, texts in catalog.items():
+        for action in actions:
+            index.setdefault(texts[action], (language, action))
+    return index
+
+
+CATALOG = load_catalog()
+LANGUAGES = tuple(CATALOG)
+BUTTON_INDEX = build_button_index(CATALOG)
+
+
+def get_text(language, key):
+    """Get translated text based on language"""
+    return CATALOG.get(language, CATALOG[DEFAULT_LANGUAGE]).get(key, key)
+
+
+def resolve_button(text):
+    """Return (language, action) for a menu button label, or None for free text"""
+    return BUTTON_INDEX.get(text)
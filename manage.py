@@ -0,0 +1,102 @@
+"""Maintenance commands for the bot's database.
+
+Usage: python manage.py <command> [options]
+"""
+import argparse
+import asyncio
+from telethon import TelegramClient
+from config import API_ID, API_HASH, CATALOG_IMPORT_CHUNK_SIZE, RECOMMENDATION_TOP_K, TELETHON_SESSION
+from database import Database
+from catalog_import import import_catalog as run_catalog_import
+import recommendations
+
+
+def rebuild_search_index(args):
+    db = Database()
+    count = db.rebuild_search_index()
+    db.close()
+    print(f"Search index rebuilt: {count} movies")
+
+
+def rebuild_stats(args):
+    db = Database()
+    drift = db.rebuild_stats()
+    db.close()
+    for name, (before, after) in sorted(drift.items()):
+        print(f"  {name}: {before} -> {after}")
+    print(f"Stats rebuilt: {len(drift)} counters corrected")
+
+
+def import_catalog(args):
+    db = Database()
+    try:
+        report = run_catalog_import(db, args.path, args.added_by, args.chunk_size, args.dry_run)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Catalog import failed: {e}")
+    finally:
+        db.close()
+    for error in report['errors']:
+        print(f"  skipped {error}")
+    print(
+        f"{'Would import' if args.dry_run else 'Imported'} {report['imported']} of {report['read']} rows "
+        f"({report['duplicates']} duplicates, {report['invalid']} invalid) in {report['seconds']}s, "
+        f"{report['rows_per_second']} rows/s"
+    )
+
+
+def rebuild_recommendations(args):
+    db = Database()
+    movies, pairs = recommendations.rebuild(db, args.top_k)
+    db.close()
+    engine = 'numpy/scipy' if recommendations.np is not None else 'pure Python'
+    print(f"Recommendations rebuilt with {engine}: {movies} movies, {pairs} co-watch pairs")
+
+
+def telethon_login(args):
+    async def log_in():
+        # Prompts for the phone number, login code and 2FA password on the terminal
+        client = TelegramClient(args.session, API_ID, API_HASH)
+        await client.start()
+        me = await client.get_me()
+        await client.disconnect()
+        return me
+    
+    me = asyncio.run(log_in())
+    print(f"Telethon session {args.session}.session logged in as {me.username or me.id}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Movie Bot maintenance commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    rebuild = commands.add_parser('rebuild-search-index', help='Re-index all movies for full-text search')
+    rebuild.set_defaults(func=rebuild_search_index)
+    
+    stats = commands.add_parser('rebuild-stats', help='Recompute the admin statistics counters and report drift')
+    stats.set_defaults(func=rebuild_stats)
+    
+    catalog = commands.add_parser('import-catalog', help='Bulk import movies from a CSV or JSONL catalog')
+    catalog.add_argument('path', help='.csv with a header row, or .jsonl with one movie per line')
+    catalog.add_argument('--added-by', type=int, help='Telegram ID recorded as the movies\' uploader')
+    catalog.add_argument('--chunk-size', type=int, default=CATALOG_IMPORT_CHUNK_SIZE, help='rows per transaction')
+    catalog.add_argument('--dry-run', action='store_true', help='validate and de-duplicate without writing')
+    catalog.set_defaults(func=import_catalog)
+    
+    similar = commands.add_parser(
+        'rebuild-recommendations', help='Recompute co-watch counts and similar movies from the whole watch history'
+    )
+    similar.add_argument('--top-k', type=int, default=RECOMMENDATION_TOP_K, help='similar movies kept per movie')
+    similar.set_defaults(func=rebuild_recommendations)
+    
+    login = commands.add_parser(
+        'telethon-login', help='Log the Telethon session used for subscription checks in (interactive)'
+    )
+    login.add_argument('--session', default=TELETHON_SESSION, help='session name, without .session')
+    login.set_defaults(func=telethon_login)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
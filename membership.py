@@ -0,0 +1,122 @@
+import asyncio
+import metrics
+from telethon import events, utils
+from telethon.tl.functions.channels import GetFullChannelRequest
+from telethon.tl.types import UpdateChannelParticipant, ChannelParticipantBanned, ChannelParticipantLeft
+
+
+class ChannelMembership:
+    """Local copy of the channel's member list.
+    
+    A bulk snapshot is taken with iter_participants, kept current from
+    participant update events and periodically reconciled against Telegram,
+    so subscription checks become a set lookup instead of a network call.
+    """
+    
+    def __init__(self, client, channel, reconcile_interval):
+        self.client = client
+        self.channel = channel
+        self.reconcile_interval = reconcile_interval
+        self.entity = None
+        self.peer_id = None
+        self.members = set()
+        self.ready = False
+        self.complete = False
+        self.on_change = None
+        self.on_snapshot = None
+        self._loading = False
+        self._changes_during_load = []
+        self._task = None
+    
+    async def get_entity(self):
+        """Resolve the channel once and reuse it afterwards"""
+        if self.entity is None:
+            self.entity = await self.client.get_entity(self.channel)
+            self.peer_id = utils.get_peer_id(self.entity)
+        return self.entity
+    
+    async def start(self):
+        """Resolve the channel, subscribe to participant events and start the snapshot loop"""
+        await self.get_entity()
+        self.client.add_event_handler(self.handle_participant_update, events.Raw(UpdateChannelParticipant))
+        self._task = asyncio.create_task(self._reconcile_loop())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.client.remove_event_handler(self.handle_participant_update)
+    
+    async def load_snapshot(self):
+        """Replace the member set with a fresh bulk listing of the channel"""
+        entity = await self.get_entity()
+        self._loading = True
+        self._changes_during_load = []
+        try:
+            full = await self.client(GetFullChannelRequest(entity))
+            members = set()
+            async for user in self.client.iter_participants(entity):
+                members.add(user.id)
+        finally:
+            self._loading = False
+        
+        # Joins/leaves seen while the listing was in progress are newer than the listing
+        for user_id, is_member in self._changes_during_load:
+            if is_member:
+                members.add(user_id)
+            else:
+                members.discard(user_id)
+        self._changes_during_load = []
+        
+        # Telegram caps participant listings of big channels; an incomplete
+        # snapshot can confirm members but not rule anyone out
+        self.replace(members, len(members) >= (full.full_chat.participants_count or 0))
+    
+    def replace(self, members, complete):
+        """Install a full member set, from load_snapshot or another worker's snapshot"""
+        self.members = set(members)
+        self.complete = complete
+        self.ready = True
+    
+    def lookup(self, user_id):
+        """True/False when known locally, None when a live check is needed"""
+        if not self.ready:
+            return None
+        if user_id in self.members:
+            return True
+        return False if self.complete else None
+    
+    def apply(self, user_id, is_member, notify=True):
+        """Record a join or leave; notify=False for ones already announced elsewhere"""
+        if self._loading:
+            self._changes_during_load.append((user_id, is_member))
+        if is_member:
+            self.members.add(user_id)
+        else:
+            self.members.discard(user_id)
+        if notify and self.on_change:
+            self.on_change(user_id, is_member)
+    
+    async def handle_participant_update(self, update):
+        """Telethon UpdateChannelParticipant events"""
+        if self.entity is None or update.channel_id != self.entity.id:
+            return
+        left = update.new_participant is None or isinstance(
+            update.new_participant, (ChannelParticipantBanned, ChannelParticipantLeft)
+        )
+        self.apply(update.user_id, not left)
+    
+    async def _reconcile_loop(self):
+        while True:
+            try:
+                await self.load_snapshot()
+                metrics.TELETHON_CALLS.inc('membership_snapshot', 'ok')
+                if self.on_snapshot:
+                    self.on_snapshot(self.members, self.complete)
+                print(f"Channel membership snapshot loaded: {len(self.members)} members")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.TELETHON_CALLS.inc('membership_snapshot', 'error')
+                print(f"Channel membership snapshot error: {e}")
+            await asyncio.sleep(self.reconcile_interval)
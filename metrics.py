@@ -0,0 +1,176 @@
+"""Prometheus metrics for the bot, served as text on a local HTTP port.
+
+Instruments are module-level objects updated from the hot paths. While
+metrics are disabled every update returns on its first line and
+instrument_handler() hands handlers back unwrapped, so the cost when off is
+one global lookup per call.
+"""
+import asyncio
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import METRICS_ENABLED
+
+enabled = METRICS_ENABLED
+
+REGISTRY = []
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+    
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        REGISTRY.append(self)
+    
+    def inc(self, *labels, amount=1):
+        if not enabled:
+            return
+        self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def samples(self):
+        for labels, value in list(self.values.items()):
+            yield self.name, _format_labels(self.labels, labels), value
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+    
+    def set(self, value, *labels):
+        if not enabled:
+            return
+        self.values[labels] = value
+
+
+class Histogram:
+    kind = 'histogram'
+    
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self.values = {}
+        REGISTRY.append(self)
+    
+    def observe(self, value, *labels):
+        if not enabled:
+            return
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+    
+    def samples(self):
+        for labels, (counts, total, count) in list(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), list(counts)):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket', _format_labels(self.labels, labels, [('le', le)]), cumulative
+            yield f'{self.name}_sum', _format_labels(self.labels, labels), total
+            yield f'{self.name}_count', _format_labels(self.labels, labels), count
+
+
+HANDLER_SECONDS = Histogram('bot_handler_seconds', 'Update handler latency', ('handler', 'branch'))
+HANDLER_ERRORS = Counter('bot_handler_errors_total', 'Update handlers that raised', ('handler', 'branch'))
+DB_SECONDS = Histogram('bot_db_seconds', 'Database method latency including executor wait', ('method',))
+DB_ERRORS = Counter('bot_db_errors_total', 'Database methods that raised', ('method',))
+TELETHON_CALLS = Counter('bot_telethon_calls_total', 'Telethon calls by outcome', ('call', 'outcome'))
+TELETHON_SECONDS = Histogram('bot_telethon_seconds', 'Telethon call latency', ('call',))
+API_SECONDS = Histogram('bot_api_send_seconds', 'Bot API call latency', ('method',))
+API_WAIT_SECONDS = Histogram('bot_api_queue_wait_seconds', 'Time sends waited in the scheduler', ('priority',))
+API_CALLS = Counter('bot_api_calls_total', 'Bot API calls by outcome', ('method', 'outcome'))
+CACHE_REQUESTS = Counter('bot_cache_requests_total', 'Cache lookups by result', ('cache', 'result'))
+LOOP_LAG_SECONDS = Histogram('bot_event_loop_lag_seconds', 'How late the event loop ran a scheduled wakeup')
+LOOP_LAG_LAST = Gauge('bot_event_loop_lag_last_seconds', 'Most recent event loop lag sample')
+STARTUP_SECONDS = Gauge('bot_startup_phase_seconds', 'How long each startup phase took', ('phase',))
+SHARD_QUEUE_STALL_SECONDS = Histogram('bot_shard_queue_stall_seconds', 'Time routing waited on a full worker queue', ('worker',))
+READY = Gauge('bot_ready', 'Whether a component is up (1), still starting (0) or unavailable (-1)', ('component',))
+
+# bot_ready values
+STARTING = 0
+UP = 1
+UNAVAILABLE = -1
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.help_text}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{labels} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def instrument_handler(name, handler, branch=None):
+    """Wrap an update handler to time it; branch(update, context) labels the path taken"""
+    if not enabled:
+        return handler
+    
+    async def timed_handler(update, context):
+        label = branch(update, context) if branch else ''
+        started = time.perf_counter()
+        try:
+            return await handler(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(name, label)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name, label)
+    
+    return timed_handler
+
+
+async def monitor_event_loop(interval=0.5):
+    """Sample how late asyncio.sleep wakes up; a busy or blocked loop shows up as lag"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - started - interval)
+        LOOP_LAG_SECONDS.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def start_server(host, port):
+    """Serve /metrics from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+    return server
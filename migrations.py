@@ -0,0 +1,342 @@
+"""Versioned schema migrations.
+
+The schema version is kept in PRAGMA user_version; run_migrations() applies
+every migration newer than it, in order, each in its own transaction.
+"""
+
+
+def create_base_schema(cursor):
+    """The tables Database.init_db used to create on every start"""
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            telegram_id INTEGER UNIQUE,
+            phone_number TEXT,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            language TEXT DEFAULT 'en',
+            is_subscribed INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Movies table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS movies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            movie_id TEXT UNIQUE,
+            title TEXT,
+            description TEXT,
+            genre TEXT,
+            year INTEGER,
+            file_id TEXT,
+            file_type TEXT,
+            added_by INTEGER,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            views INTEGER DEFAULT 0
+        )
+    ''')
+    
+    # Watched movies table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS watched_movies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            movie_id TEXT,
+            watched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (movie_id) REFERENCES movies (movie_id)
+        )
+    ''')
+    
+    # Watch later table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS watch_later (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            movie_id TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (movie_id) REFERENCES movies (movie_id)
+        )
+    ''')
+    
+    # User subscriptions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            subscribed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def add_watch_list_indexes(cursor):
+    """Unique (user_id, movie_id) pairs plus indexes for paging, counts and joins"""
+    # Drop duplicates left by the old check-then-insert before enforcing uniqueness
+    cursor.execute('''
+        DELETE FROM watched_movies WHERE id NOT IN (
+            SELECT MIN(id) FROM watched_movies GROUP BY user_id, movie_id
+        )
+    ''')
+    cursor.execute('''
+        DELETE FROM watch_later WHERE id NOT IN (
+            SELECT MIN(id) FROM watch_later GROUP BY user_id, movie_id
+        )
+    ''')
+    
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_watched_user_movie ON watched_movies (user_id, movie_id)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_watch_later_user_movie ON watch_later (user_id, movie_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_watched_user_time ON watched_movies (user_id, watched_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_watch_later_user_time ON watch_later (user_id, added_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_watched_movie ON watched_movies (movie_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_watch_later_movie ON watch_later (movie_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_movies_added_at ON movies (added_at, id)')
+
+
+def add_broadcasts(cursor):
+    """Admin broadcasts with per-recipient progress, and users who blocked the bot"""
+    cursor.execute('ALTER TABLE users ADD COLUMN is_blocked INTEGER DEFAULT 0')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER,
+            language TEXT,
+            text TEXT,
+            status TEXT DEFAULT 'running',
+            last_user_id INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            blocked INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_recipients (
+            broadcast_id INTEGER,
+            user_id INTEGER,
+            status TEXT,
+            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (broadcast_id, user_id),
+            FOREIGN KEY (broadcast_id) REFERENCES broadcasts (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) WITHOUT ROWID
+    ''')
+
+
+def fill_stats(cursor):
+    """Recompute every stats counter from the source tables"""
+    cursor.execute('DELETE FROM stats_counters')
+    cursor.execute('DELETE FROM user_activity')
+    
+    # The user_activity insert trigger rebuilds the active:* counters as it goes
+    cursor.execute('''
+        INSERT INTO user_activity (period, user_id)
+        SELECT DISTINCT 'd:' || date(watched_at), user_id FROM watched_movies
+        UNION
+        SELECT DISTINCT 'w:' || strftime('%Y-%W', watched_at), user_id FROM watched_movies
+    ''')
+    cursor.execute('''
+        INSERT INTO stats_counters (name, value)
+        SELECT 'users', COUNT(*) FROM users
+        UNION ALL SELECT 'subscribed', COALESCE(SUM(is_subscribed = 1), 0) FROM users
+        UNION ALL SELECT 'blocked', COALESCE(SUM(is_blocked = 1), 0) FROM users
+        UNION ALL SELECT 'movies', COUNT(*) FROM movies
+    ''')
+    cursor.execute('''
+        INSERT INTO stats_counters (name, value)
+        SELECT 'language:' || COALESCE(language, 'en'), COUNT(*) FROM users GROUP BY 1
+    ''')
+
+
+def add_stats_counters(cursor):
+    """Counters for the admin panel, kept current by triggers instead of scanning tables"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    
+    # One row per user per day ('d:YYYY-MM-DD') and week ('w:YYYY-WW') they watched something
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_activity (
+            period TEXT,
+            user_id INTEGER,
+            PRIMARY KEY (period, user_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_users_insert AFTER INSERT ON users BEGIN
+            INSERT INTO stats_counters (name, value) VALUES
+                ('users', 1),
+                ('language:' || COALESCE(NEW.language, 'en'), 1),
+                ('subscribed', NEW.is_subscribed = 1),
+                ('blocked', NEW.is_blocked = 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_users_delete AFTER DELETE ON users BEGIN
+            INSERT INTO stats_counters (name, value) VALUES
+                ('users', -1),
+                ('language:' || COALESCE(OLD.language, 'en'), -1),
+                ('subscribed', -(OLD.is_subscribed = 1)),
+                ('blocked', -(OLD.is_blocked = 1))
+            ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_users_update AFTER UPDATE OF language, is_subscribed, is_blocked ON users
+        WHEN OLD.language IS NOT NEW.language
+            OR OLD.is_subscribed IS NOT NEW.is_subscribed
+            OR OLD.is_blocked IS NOT NEW.is_blocked
+        BEGIN
+            INSERT INTO stats_counters (name, value) VALUES
+                ('language:' || COALESCE(OLD.language, 'en'), -1),
+                ('language:' || COALESCE(NEW.language, 'en'), 1),
+                ('subscribed', (NEW.is_subscribed = 1) - (OLD.is_subscribed = 1)),
+                ('blocked', (NEW.is_blocked = 1) - (OLD.is_blocked = 1))
+            ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_movies_insert AFTER INSERT ON movies BEGIN
+            INSERT INTO stats_counters (name, value) VALUES ('movies', 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_movies_delete AFTER DELETE ON movies BEGIN
+            INSERT INTO stats_counters (name, value) VALUES ('movies', -1)
+            ON CONFLICT (name) DO UPDATE SET value = value - 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_watched_insert AFTER INSERT ON watched_movies BEGIN
+            INSERT OR IGNORE INTO user_activity (period, user_id) VALUES
+                ('d:' || date(NEW.watched_at), NEW.user_id),
+                ('w:' || strftime('%Y-%W', NEW.watched_at), NEW.user_id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_activity_insert AFTER INSERT ON user_activity BEGIN
+            INSERT INTO stats_counters (name, value) VALUES ('active:' || NEW.period, 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+        END
+    ''')
+    
+    # Top movies by views walk this index instead of sorting the table
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_movies_views ON movies (views)')
+    
+    fill_stats(cursor)
+
+
+def add_recommendations(cursor):
+    # Item-item co-occurrence: how many users watched both movies, stored in
+    # both directions; the diagonal (movie_a = movie_b) is the watcher count
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS movie_cooccurrence (
+            movie_a TEXT NOT NULL,
+            movie_b TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (movie_a, movie_b)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Precomputed top-k most similar movies per movie
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS movie_similar (
+            movie_id TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            similar_id TEXT NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (movie_id, rank)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Progress of the incremental update through watched_movies
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recommendation_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+
+
+def add_trending(cursor):
+    # Ranked trending lists per period and watcher language ('' = everyone),
+    # rewritten by the background refresh so a page is a range read
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS trending_scores (
+            period TEXT NOT NULL,
+            language TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            movie_id TEXT NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (period, language, rank)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Recent watch events for the refresh, without scanning the whole history
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_watched_at ON watched_movies (watched_at)')
+
+
+def add_persistence(cursor):
+    # PTB persistence (persistence.py): one JSON row per user, chat or
+    # conversation; kind is 'user', 'chat', 'bot' or 'conversation:<name>'
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS persistence (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID
+    ''')
+
+
+# (version, migration) pairs; append new ones, never edit or reorder applied ones
+MIGRATIONS = [
+    (1, create_base_schema),
+    (2, add_watch_list_indexes),
+    (3, add_broadcasts),
+    (4, add_stats_counters),
+    (5, add_recommendations),
+    (6, add_trending),
+    (7, add_persistence),
+]
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(conn):
+    """Apply pending migrations; returns the list of versions applied"""
+    applied = []
+    current = get_schema_version(conn)
+    
+    for version, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        try:
+            migration(cursor)
+            cursor.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied database migration {version}: {migration.__name__}")
+        applied.append(version)
+    return applied
@@ -0,0 +1,165 @@
+"""python-telegram-bot persistence on the bot's own SQLite database.
+
+user_data, chat_data and conversation states are stored as one JSON row
+each in the persistence table, so multi-step state such as
+waiting_for_search survives a restart and a user's state follows them to
+whichever shard worker handles them.
+
+Unlike PicklePersistence nothing is loaded at boot and nothing is rewritten
+wholesale: a user's (or chat's) row is read the first time one of their
+updates is processed (refresh_user_data), only documents that changed since
+they were read or last written are saved, and every change from one
+persistence run is written in a single transaction. What was last read or
+written is remembered for the max_entries most recently used documents; a
+document forgotten since is written again the next time it's saved.
+
+bot_data and callback_data aren't stored by default: every shard worker
+has its own copy, and they would overwrite each other's. Neither is
+chat_data, which the bot doesn't use.
+"""
+import asyncio
+import collections
+import json
+from telegram.ext import BasePersistence, PersistenceInput
+
+
+def _dump(data):
+    """JSON for a document; None for an empty one, which needs no row"""
+    return json.dumps(data, sort_keys=True, separators=(',', ':')) if data else None
+
+
+class SQLitePersistence(BasePersistence):
+    def __init__(self, db, update_interval=60, store_data=None, max_entries=100000):
+        super().__init__(
+            store_data or PersistenceInput(bot_data=False, chat_data=False, callback_data=False), update_interval
+        )
+        self.db = db
+        self.max_entries = max_entries
+        # (kind, key) -> JSON last read from or written to the database, least recently used first
+        self._saved = collections.OrderedDict()
+        # (kind, key) -> JSON to write (None deletes the row)
+        self._pending = {}
+        # The same for the write in progress
+        self._writing = {}
+        self._write_task = None
+    
+    def _remember(self, document, stored):
+        self._saved[document] = stored
+        self._saved.move_to_end(document)
+        if len(self._saved) <= self.max_entries:
+            return
+        # Documents still to be written stay, so they're never read back stale
+        for oldest in self._saved:
+            if oldest not in self._pending and oldest not in self._writing:
+                del self._saved[oldest]
+                return
+    
+    async def _load(self, kind, key, data):
+        """Read one document into data the first time it's used"""
+        if (kind, key) in self._saved:
+            self._saved.move_to_end((kind, key))
+            return
+        if data:
+            # Loaded before and forgotten since: what the application holds
+            # is at least as new as the row
+            return
+        stored = await self.db.get_persisted(kind, key)
+        # Another update for the same key may have loaded it while we waited
+        if (kind, key) in self._saved:
+            return
+        self._remember((kind, key), stored)
+        if stored:
+            data.update(json.loads(stored))
+    
+    def _stage(self, kind, key, data):
+        """Queue a document for the next batched write if it changed"""
+        try:
+            dumped = _dump(data)
+        except (TypeError, ValueError) as e:
+            print(f"Error persisting {kind} {key}: {e}")
+            return
+        if self._pending.get((kind, key), self._saved.get((kind, key))) == dumped:
+            return
+        self._pending[(kind, key)] = dumped
+        if self._write_task is None:
+            self._write_task = asyncio.create_task(self._write_pending())
+    
+    async def _write_pending(self):
+        # The application updates every user and chat of a persistence run at
+        # once; yielding first lets all of them be staged into this write
+        await asyncio.sleep(0)
+        self._writing, self._pending = self._pending, {}
+        for document, data in self._writing.items():
+            self._remember(document, data)
+        try:
+            await self.db.save_persisted([(kind, key, data) for (kind, key), data in self._writing.items()])
+        except Exception as e:
+            print(f"Error saving persistence: {e}")
+            # Retried with the next write; anything staged since is newer
+            self._pending = {**self._writing, **self._pending}
+            self._writing = {}
+            self._write_task = None
+            return
+        self._writing = {}
+        # Changes staged while this write ran go out in the next one
+        self._write_task = asyncio.create_task(self._write_pending()) if self._pending else None
+    
+    async def get_user_data(self):
+        # Loaded per user on first use
+        return {}
+    
+    async def get_chat_data(self):
+        return {}
+    
+    async def get_bot_data(self):
+        stored = await self.db.get_persisted('bot', '')
+        self._remember(('bot', ''), stored)
+        return json.loads(stored) if stored else {}
+    
+    async def get_callback_data(self):
+        return None
+    
+    async def get_conversations(self, name):
+        conversations = {}
+        for key, stored in await self.db.get_all_persisted(f'conversation:{name}'):
+            self._remember((f'conversation:{name}', key), stored)
+            conversations[tuple(json.loads(key))] = json.loads(stored)[0]
+        return conversations
+    
+    async def update_conversation(self, name, key, new_state):
+        # States are wrapped in a list so that falsy ones (0, '') still get a row
+        self._stage(f'conversation:{name}', json.dumps(list(key)), None if new_state is None else [new_state])
+    
+    async def update_user_data(self, user_id, data):
+        self._stage('user', str(user_id), data)
+    
+    async def update_chat_data(self, chat_id, data):
+        self._stage('chat', str(chat_id), data)
+    
+    async def update_bot_data(self, data):
+        self._stage('bot', '', data)
+    
+    async def update_callback_data(self, data):
+        pass
+    
+    async def drop_user_data(self, user_id):
+        self._stage('user', str(user_id), None)
+    
+    async def drop_chat_data(self, chat_id):
+        self._stage('chat', str(chat_id), None)
+    
+    async def refresh_user_data(self, user_id, user_data):
+        await self._load('user', str(user_id), user_data)
+    
+    async def refresh_chat_data(self, chat_id, chat_data):
+        await self._load('chat', str(chat_id), chat_data)
+    
+    async def refresh_bot_data(self, bot_data):
+        pass
+    
+    async def flush(self):
+        """Write whatever is still staged; called when the application shuts down"""
+        while self._write_task:
+            await self._write_task
+        if self._pending:
+            await self._write_pending()
@@ -0,0 +1,155 @@
+import asyncio
+import bisect
+import re
+
+# Same folding as the full-text index: case, ё -> е, and the Uzbek
+# apostrophe letters treated as word separators
+_SEPARATORS = str.maketrans({'ё': 'е', 'ʻ': ' ', 'ʼ': ' ', "'": ' '})
+_WORD = re.compile(r'\w+')
+_PREFIX_END = '\U0010ffff'
+
+
+def normalize_words(text):
+    """Lower-cased words of text, folded the way the search index folds them"""
+    return _WORD.findall((text or '').casefold().translate(_SEPARATORS))
+
+
+class PrefixIndex:
+    """In-memory typeahead index over movie titles for inline queries.
+    
+    Every title word is a (word, title, movie_id) key in one sorted list, so
+    the movies with a word starting with a prefix are a contiguous slice
+    found with two bisections. Queries of several words scan the smallest
+    slice and check the other words against the movie's word list. The
+    index is loaded from the database at startup and then kept up to date
+    incrementally: new rows (by id) are picked up every refresh_interval
+    seconds or when refresh() is called, and a full reload follows when the
+    count and sum of the indexed row ids no longer match the table's, which
+    any deletion causes. The bot loads it lazily, on the first inline query
+    (ensure_loaded), so startup doesn't wait for the whole catalog.
+    """
+    
+    def __init__(self, db, refresh_interval):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.movies = {}
+        self._words = {}
+        self._row_ids = {}
+        self._keys = []
+        self._last_id = 0
+        self._id_sum = 0
+        self._refresh_lock = asyncio.Lock()
+        self._task = None
+    
+    def __len__(self):
+        return len(self.movies)
+    
+    def add(self, rows):
+        """Index (id, movie_id, title, year, genre) rows"""
+        keys = []
+        for row_id, movie_id, title, year, genre in rows:
+            if movie_id in self.movies:
+                self.remove(movie_id)
+            words = tuple(dict.fromkeys(normalize_words(title)))
+            self.movies[movie_id] = (movie_id, title, year, genre)
+            self._words[movie_id] = words
+            self._row_ids[movie_id] = row_id
+            self._id_sum += row_id
+            sort_title = (title or '').casefold()
+            keys.extend((word, sort_title, movie_id) for word in words)
+            self._last_id = max(self._last_id, row_id)
+        
+        if len(keys) > 64:
+            self._keys.extend(keys)
+            self._keys.sort()
+        else:
+            for key in keys:
+                bisect.insort(self._keys, key)
+    
+    def remove(self, movie_id):
+        movie = self.movies.pop(movie_id, None)
+        if movie is None:
+            return
+        self._id_sum -= self._row_ids.pop(movie_id)
+        sort_title = (movie[1] or '').casefold()
+        for word in self._words.pop(movie_id):
+            position = bisect.bisect_left(self._keys, (word, sort_title, movie_id))
+            if position < len(self._keys) and self._keys[position][2] == movie_id:
+                del self._keys[position]
+    
+    def _range(self, prefix):
+        low = bisect.bisect_left(self._keys, (prefix,))
+        high = bisect.bisect_left(self._keys, (prefix + _PREFIX_END,), low)
+        return low, high
+    
+    def search(self, query, offset=0, limit=20):
+        """Movies whose title words start with every query word; returns (movies, next offset or None)"""
+        terms = normalize_words(query)
+        if terms:
+            ranges = {term: self._range(term) for term in set(terms)}
+            driver = min(ranges, key=lambda term: ranges[term][1] - ranges[term][0])
+            others = [term for term in ranges if term != driver]
+            candidates = (self._keys[position][2] for position in range(*ranges[driver]))
+        else:
+            # Empty query: the newest movies
+            others = []
+            candidates = reversed(self.movies)
+        
+        # One match past the page tells whether there is a next one
+        matches = []
+        seen = set()
+        for movie_id in candidates:
+            if movie_id in seen:
+                continue
+            seen.add(movie_id)
+            words = self._words[movie_id]
+            if all(any(word.startswith(term) for word in words) for term in others):
+                matches.append(movie_id)
+                if len(matches) > offset + limit:
+                    break
+        
+        page = [self.movies[movie_id] for movie_id in matches[offset:offset + limit]]
+        return page, offset + limit if len(matches) > offset + limit else None
+    
+    async def load(self):
+        """Replace the index with the current catalog"""
+        rows = await self.db.get_movie_titles()
+        self.movies, self._words, self._row_ids, self._keys = {}, {}, {}, []
+        self._last_id = self._id_sum = 0
+        self.add(rows)
+    
+    async def refresh(self):
+        """Pick up movies added since the last refresh; reload if any were deleted"""
+        if self._task is None:
+            # Not loaded yet; ensure_loaded() will read the current catalog
+            return
+        async with self._refresh_lock:
+            rows = await self.db.get_movie_titles(self._last_id)
+            self.add(rows)
+            if (len(self.movies), self._id_sum) != tuple(await self.db.get_movie_ids_checksum()):
+                await self.load()
+    
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error refreshing title index: {e}")
+    
+    async def start(self):
+        await self.load()
+        self._task = asyncio.create_task(self._refresh_loop())
+    
+    async def ensure_loaded(self):
+        """Load the index and start refreshing it on first use"""
+        if self._task is not None:
+            return
+        async with self._refresh_lock:
+            if self._task is None:
+                await self.start()
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
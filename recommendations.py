@@ -0,0 +1,135 @@
+"""Item-item recommendations from watch history ("Because you watched...").
+
+Two movies are similar when the same users watched both: the score is the
+cosine similarity of their watcher sets, co-watchers / sqrt(watchers_a *
+watchers_b). The co-occurrence counts live in movie_cooccurrence and the
+top-k neighbours of every movie in movie_similar, so serving a
+recommendation is one indexed read.
+
+Recommender keeps both tables current in the background: it folds new
+watched_movies rows into the counts in batches and merges the fresh score
+of every pair they form into both movies' top k, re-scoring what is
+already there. A movie that fell out of a list only returns when a new
+co-watch brings it back, so lists drift slightly from an exact ranking
+between rebuilds; the counts are always exact.
+
+rebuild() recomputes everything at once from the full history as a sparse
+user x movie matrix product; it uses NumPy and SciPy when they are
+installed and plain Python counting otherwise.
+"""
+import asyncio
+import collections
+import heapq
+import itertools
+import math
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+
+
+class Recommender:
+    """Background incremental update of the recommendation tables (primary worker only)"""
+    
+    def __init__(self, db, top_k, refresh_interval, batch_size):
+        self.db = db
+        self.top_k = top_k
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self._task = None
+    
+    async def update(self):
+        """Process watch events until caught up; returns how many were processed"""
+        total = 0
+        while True:
+            events = await self.db.apply_watch_events(self.batch_size, self.top_k)
+            if not events:
+                return total
+            total += events
+    
+    async def _update_loop(self, delay):
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                await self.update()
+            except Exception as e:
+                print(f"Error updating recommendations: {e}")
+            await asyncio.sleep(self.refresh_interval)
+    
+    def start(self, delay=0):
+        """Catch up on watch events every refresh_interval, the first time after delay seconds"""
+        self._task = asyncio.create_task(self._update_loop(delay))
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+def _build_vectorized(pairs, top_k):
+    users, user_index = np.unique(np.array([user_id for user_id, _ in pairs]), return_inverse=True)
+    movies, movie_index = np.unique(np.array([movie_id for _, movie_id in pairs], dtype=object), return_inverse=True)
+    watched = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.int32), (user_index, movie_index)), shape=(len(users), len(movies))
+    )
+    watched.data[:] = 1  # a user counts once per movie
+    
+    counts = (watched.T @ watched).tocoo()
+    watchers = np.asarray(watched.sum(axis=0)).ravel()
+    cooccurrence = zip(movies[counts.row].tolist(), movies[counts.col].tolist(), counts.data.tolist())
+    
+    # Rank every row's off-diagonal entries by score (ties by movie ID, as heapq.nlargest
+    # does in the incremental path) and keep the first top_k
+    off_diagonal = counts.row != counts.col
+    rows, cols, shared = counts.row[off_diagonal], counts.col[off_diagonal], counts.data[off_diagonal]
+    scores = shared / np.sqrt(watchers[rows].astype(np.float64) * watchers[cols])
+    order = np.lexsort((-cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    starts = np.searchsorted(rows, rows, side='left')
+    ranks = np.arange(len(rows)) - starts
+    keep = ranks < top_k
+    similar = zip(
+        movies[rows[keep]].tolist(), ranks[keep].tolist(), movies[cols[keep]].tolist(), scores[keep].tolist()
+    )
+    return list(cooccurrence), list(similar)
+
+
+def _build_python(pairs, top_k):
+    histories = collections.defaultdict(set)
+    for user_id, movie_id in pairs:
+        histories[user_id].add(movie_id)
+    
+    counts = collections.Counter()
+    for history in histories.values():
+        for movie_id in history:
+            counts[movie_id, movie_id] += 1
+        for movie_a, movie_b in itertools.permutations(history, 2):
+            counts[movie_a, movie_b] += 1
+    
+    neighbours = collections.defaultdict(list)
+    for (movie_a, movie_b), count in counts.items():
+        if movie_a != movie_b:
+            score = count / math.sqrt(counts[movie_a, movie_a] * counts[movie_b, movie_b])
+            neighbours[movie_a].append((score, movie_b))
+    
+    similar = [
+        (movie_id, rank, similar_id, score)
+        for movie_id, scored in neighbours.items()
+        for rank, (score, similar_id) in enumerate(heapq.nlargest(top_k, scored))
+    ]
+    return [(movie_a, movie_b, count) for (movie_a, movie_b), count in counts.items()], similar
+
+
+def rebuild(db, top_k, vectorized=None):
+    """Recompute both recommendation tables from the whole watch history; returns (movies, pairs)"""
+    last_id, pairs = db.get_watch_pairs()
+    if vectorized is None:
+        vectorized = np is not None
+    if vectorized and pairs:
+        cooccurrence, similar = _build_vectorized(pairs, top_k)
+    else:
+        cooccurrence, similar = _build_python(pairs, top_k)
+    db.replace_recommendations(cooccurrence, similar, last_id)
+    return len({row[0] for row in similar}), len(cooccurrence)
@@ -0,0 +1,221 @@
+import asyncio
+import heapq
+import itertools
+import time
+from telegram.error import RetryAfter
+import metrics
+
+# Send priorities: lower goes first
+INTERACTIVE = 0
+BULK = 1
+
+
+class TokenBucket:
+    """Classic token bucket: rate tokens per second, up to capacity stored"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+    
+    def delay(self, now):
+        """Seconds until a token is available"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+    
+    def consume(self, now):
+        self._refill(now)
+        self.tokens -= 1
+    
+    def is_idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class SendJob:
+    __slots__ = ('chat_id', 'method', 'args', 'kwargs', 'priority', 'seq', 'future', 'attempts', 'queued_at')
+    
+    def __init__(self, chat_id, method, args, kwargs, priority, seq, future):
+        self.chat_id = chat_id
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+
+
+class SendScheduler:
+    """Single outbound queue for every Bot API send.
+    
+    A global and a per-chat token bucket keep traffic under Telegram's flood
+    limits, interactive replies go ahead of bulk traffic, and a RetryAfter
+    from Telegram pauses all sending for the time it asks for before the
+    send is retried.
+    """
+    
+    def __init__(self, global_rate, global_burst, per_chat_rate, per_chat_burst, max_in_flight, max_retries):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets = {}
+        self._ready = []
+        self._delayed = []
+        self._seq = itertools.count()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._wakeup = asyncio.Event()
+        self._paused_until = 0
+        self._task = None
+        self._in_flight = 0
+        # Running _execute tasks; asyncio only keeps weak references to tasks
+        self._sending = set()
+        self.counters = {'sent': 0, 'failed': 0, 'retried': 0, 'flood_waits': 0}
+    
+    async def send(self, chat_id, method, /, *args, priority=INTERACTIVE, **kwargs):
+        """Queue method(*args, **kwargs) for chat_id and wait for its result"""
+        if self._task is None:
+            self.start()
+        
+        future = asyncio.get_running_loop().create_future()
+        job = SendJob(chat_id, method, args, kwargs, priority, next(self._seq), future)
+        heapq.heappush(self._ready, (job.priority, job.seq, job))
+        self._wakeup.set()
+        return await future
+    
+    def start(self):
+        self._task = asyncio.create_task(self._dispatch())
+    
+    async def stop(self, timeout=5):
+        """Drop queued sends, give in-flight ones up to timeout seconds to finish, then cancel them"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for queue in (self._ready, self._delayed):
+            for _, _, job in queue:
+                if not job.future.done():
+                    job.future.cancel()
+            queue.clear()
+        if self._sending:
+            _, unfinished = await asyncio.wait(set(self._sending), timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.wait(unfinished)
+    
+    def stats(self):
+        """Queue depths and totals for monitoring"""
+        interactive = sum(1 for priority, _, _ in self._ready if priority == INTERACTIVE)
+        return {
+            'interactive_queued': interactive,
+            'bulk_queued': len(self._ready) - interactive,
+            'delayed': len(self._delayed),
+            'in_flight': self._in_flight,
+            **self.counters
+        }
+    
+    def _chat_bucket(self, chat_id, now):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.is_idle(now)
+                }
+            bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+    
+    def _defer(self, job, ready_at):
+        heapq.heappush(self._delayed, (ready_at, job.seq, job))
+    
+    async def _dispatch(self):
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, _, job = heapq.heappop(self._delayed)
+                heapq.heappush(self._ready, (job.priority, job.seq, job))
+            
+            if not self._ready:
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            wait = max(self._paused_until - now, self.global_bucket.delay(now))
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            
+            _, _, job = heapq.heappop(self._ready)
+            if job.future.done():
+                continue
+            
+            chat_bucket = self._chat_bucket(job.chat_id, now)
+            chat_wait = chat_bucket.delay(now)
+            if chat_wait > 0:
+                # This chat is over its own limit; let other chats go meanwhile
+                self._defer(job, now + chat_wait)
+                continue
+            
+            await self._slots.acquire()
+            chat_bucket.consume(now)
+            self.global_bucket.consume(now)
+            self._in_flight += 1
+            task = asyncio.create_task(self._execute(job))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+    
+    async def _execute(self, job):
+        method = getattr(job.method, '__name__', 'call')
+        started = time.monotonic()
+        if metrics.enabled and job.attempts == 0:
+            lane = 'interactive' if job.priority == INTERACTIVE else 'bulk'
+            metrics.API_WAIT_SECONDS.observe(started - job.queued_at, lane)
+        try:
+            job.attempts += 1
+            result = await job.method(*job.args, **job.kwargs)
+        except RetryAfter as e:
+            metrics.API_CALLS.inc(method, 'retry_after')
+            self.counters['flood_waits'] += 1
+            resume_at = time.monotonic() + e.retry_after
+            self._paused_until = max(self._paused_until, resume_at)
+            if job.attempts <= self.max_retries:
+                self.counters['retried'] += 1
+                self._defer(job, resume_at)
+                self._wakeup.set()
+            else:
+                self.counters['failed'] += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+        except asyncio.CancelledError:
+            # Cancelled by stop(); don't leave the caller waiting
+            if not job.future.done():
+                job.future.cancel()
+            raise
+        except Exception as e:
+            metrics.API_CALLS.inc(method, 'error')
+            self.counters['failed'] += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            metrics.API_CALLS.inc(method, 'ok')
+            self.counters['sent'] += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            metrics.API_SECONDS.observe(time.monotonic() - started, method)
+            self._in_flight -= 1
+            self._slots.release()
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import time
+import httpx
+from telegram import Update
+import metrics
+
+
+def shard_key(data):
+    """The user an update belongs to (effective_user, falling back to the chat), from raw update JSON"""
+    for key, value in data.items():
+        if not isinstance(value, dict):
+            continue
+        for field in ('from', 'user'):
+            if isinstance(value.get(field), dict):
+                return value[field]['id']
+        chat = value.get('chat') or (value.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+    return 0
+
+
+def shard_session(session, index):
+    """Per-worker copy of the Telethon session so processes don't share one SQLite file"""
+    name = f"{session}_shard{index}"
+    if os.path.exists(f"{session}.session"):
+        shutil.copyfile(f"{session}.session", f"{name}.session")
+    return name
+
+
+class CacheBus:
+    """Cache invalidations fanned out from one worker process to all the others.
+    
+    Every worker owns one inbound queue; publish() puts (kind, args) on every
+    queue but its own and listen() hands received messages to the handler
+    subscribed for that kind.
+    """
+    
+    def __init__(self, queues, index):
+        self.queues = queues
+        self.index = index
+        self.handlers = {}
+    
+    def subscribe(self, kind, handler):
+        self.handlers[kind] = handler
+    
+    def publish(self, kind, *args):
+        for index, queue in enumerate(self.queues):
+            if index != self.index:
+                queue.put((kind, args))
+    
+    async def listen(self):
+        loop = asyncio.get_running_loop()
+        inbox = self.queues[self.index]
+        while True:
+            message = await loop.run_in_executor(None, inbox.get)
+            if message is None:
+                break
+            kind, args = message
+            handler = self.handlers.get(kind)
+            if handler:
+                try:
+                    handler(*args)
+                except Exception as e:
+                    print(f"Error applying {kind} invalidation: {e}")
+
+
+async def serve_worker(application, updates, bus):
+    """Run the application's handlers on updates forwarded by the front receiver"""
+    loop = asyncio.get_running_loop()
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    listener = asyncio.create_task(bus.listen())
+    try:
+        while True:
+            batch = await loop.run_in_executor(None, updates.get)
+            if batch is None:
+                break
+            for data in batch:
+                await application.update_queue.put(Update.de_json(data, application.bot))
+    finally:
+        listener.cancel()
+        await application.stop()
+        # Same order as run_polling: shutdown() still writes persistence, then post_shutdown closes the database
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def run_worker(index, workers, factory, updates, bus_queues):
+    # The front receiver owns Ctrl+C and stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # A fresh loop for this process; the bot's Telethon client binds to it when it is created
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    bus = CacheBus(bus_queues, index)
+    application = factory(index, workers, bus)
+    loop.run_until_complete(serve_worker(application, updates, bus))
+
+
+class FrontReceiver:
+    """Receives updates for the whole bot and shards them over worker processes.
+    
+    Updates are routed on their raw JSON without being parsed into Update
+    objects, hashed on the user id so every update from one user lands on the
+    same worker and keeps its order. factory(index, workers, bus) builds each
+    worker's Application inside its process.
+    """
+    
+    def __init__(self, workers, factory, bot_token, base_url='https://api.telegram.org', queue_size=1000):
+        self.workers = workers
+        self.factory = factory
+        self.api_url = f"{base_url}/bot{bot_token}"
+        self.queues = [multiprocessing.Queue(queue_size) for _ in range(workers)]
+        self.bus_queues = [multiprocessing.Queue() for _ in range(workers)]
+        # Keeps batches for one worker in order while a full queue is waited on
+        self.put_locks = [asyncio.Lock() for _ in range(workers)]
+        self.processes = []
+    
+    def start(self):
+        for index in range(self.workers):
+            process = multiprocessing.Process(
+                target=run_worker,
+                args=(index, self.workers, self.factory, self.queues[index], self.bus_queues),
+                name=f"bot-shard-{index}"
+            )
+            process.start()
+            self.processes.append(process)
+    
+    def stop(self):
+        for queue in self.queues + self.bus_queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join(30)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+    
+    async def put(self, index, batch):
+        """Hand a batch to a worker; a full queue is waited on in an executor, not on the loop"""
+        async with self.put_locks[index]:
+            try:
+                self.queues[index].put_nowait(batch)
+                return
+            except queue.Full:
+                pass
+            started = time.perf_counter()
+            await asyncio.get_running_loop().run_in_executor(None, self.queues[index].put, batch)
+            metrics.SHARD_QUEUE_STALL_SECONDS.observe(time.perf_counter() - started, str(index))
+    
+    async def route(self, updates):
+        batches = {}
+        for data in updates:
+            batches.setdefault(shard_key(data) % self.workers, []).append(data)
+        await asyncio.gather(*(self.put(index, batch) for index, batch in batches.items()))
+    
+    async def _call(self, client, method, **params):
+        params = {key: value for key, value in params.items() if value is not None}
+        response = await client.post(f"{self.api_url}/{method}", json=params)
+        data = response.json()
+        if not data.get('ok'):
+            raise RuntimeError(f"{method} failed: {data.get('description')}")
+        return data['result']
+    
+    async def poll(self, timeout=10, allowed_updates=None, drop_pending_updates=False):
+        """Long-poll getUpdates and route every batch"""
+        async with httpx.AsyncClient(timeout=timeout + 10) as client:
+            await self._call(client, 'deleteWebhook', drop_pending_updates=drop_pending_updates)
+            offset = 0
+            while True:
+                try:
+                    updates = await self._call(
+                        client, 'getUpdates', offset=offset, timeout=timeout, allowed_updates=allowed_updates
+                    )
+                except Exception as e:
+                    print(f"Error fetching updates: {e}")
+                    await asyncio.sleep(1)
+                    continue
+                if updates:
+                    offset = updates[-1]['update_id'] + 1
+                    await self.route(updates)
+    
+    async def serve_webhook(self, listen, port, path, webhook_url=None, secret_token=None,
+                            max_connections=40, allowed_updates=None, drop_pending_updates=False):
+        """Accept Telegram's webhook POSTs and route each update"""
+        import tornado.httpserver
+        import tornado.web
+        
+        receiver = self
+        
+        class WebhookHandler(tornado.web.RequestHandler):
+            async def post(self):
+                if secret_token and self.request.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret_token:
+                    self.set_status(403)
+                    return
+                try:
+                    data = json.loads(self.request.body)
+                except ValueError:
+                    self.set_status(400)
+                    return
+                await receiver.route([data])
+        
+        server = tornado.httpserver.HTTPServer(tornado.web.Application([(f"/{path}", WebhookHandler)]))
+        server.listen(port, listen)
+        if webhook_url:
+            async with httpx.AsyncClient(timeout=30) as client:
+                await self._call(
+                    client, 'setWebhook', url=webhook_url, secret_token=secret_token,
+                    max_connections=max_connections, allowed_updates=allowed_updates,
+                    drop_pending_updates=drop_pending_updates
+                )
+        try:
+            await asyncio.Event().wait()
+        finally:
+            server.stop()
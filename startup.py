@@ -0,0 +1,42 @@
+"""Startup phase timing.
+
+MovieBot times each phase of its startup (opening the database, starting
+background jobs, connecting Telethon) and prints them as one report once
+the bot can take updates. Telethon connects in the background, so it is
+reported on its own line when it comes up. With metrics enabled every phase
+is also exported as bot_startup_phase_seconds.
+"""
+import contextlib
+import time
+import metrics
+
+
+class StartupReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # (phase, seconds, succeeded)
+        self.phases = []
+    
+    def elapsed(self):
+        return time.perf_counter() - self.started
+    
+    def record(self, name, seconds, ok=True):
+        self.phases.append((name, seconds, ok))
+        metrics.STARTUP_SECONDS.set(seconds, name)
+    
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the block as one phase; a phase that raises is recorded as failed and the error re-raised"""
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(name, time.perf_counter() - started, ok)
+    
+    def summary(self, title):
+        lines = [f"{title} in {self.elapsed() * 1000:.0f} ms:"]
+        for name, seconds, ok in self.phases:
+            lines.append(f"  {name:22} {seconds * 1000:8.1f} ms{'' if ok else '  (failed)'}")
+        return '\n'.join(lines)
@@ -0,0 +1,87 @@
+import asyncio
+import collections
+import time
+import metrics
+
+
+class SubscriptionCache:
+    """In-memory cache of channel subscription results keyed by Telegram user id.
+    
+    Positive and negative results expire after separate TTLs, and concurrent
+    checks for the same user share a single in-flight request. At most
+    max_entries users are kept; when full, the entry set longest ago goes first.
+    """
+    
+    def __init__(self, positive_ttl, negative_ttl, max_entries=100000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # user_id -> (status, expires_at), oldest set first
+        self._entries = collections.OrderedDict()
+        self._pending = {}
+        # Users seeded from the stored status, oldest first; bounded like _entries
+        self._warmed = collections.OrderedDict()
+    
+    def get(self, user_id):
+        """Return the cached status, or None when unknown or expired"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        
+        status, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        return status
+    
+    def set(self, user_id, status):
+        ttl = self.positive_ttl if status else self.negative_ttl
+        self._entries.pop(user_id, None)
+        while len(self._entries) >= self.max_entries:
+            self._entries.popitem(last=False)
+        self._entries[user_id] = (status, time.monotonic() + ttl)
+    
+    def warm(self, user_id, stored_status):
+        """Seed the cache from the stored is_subscribed column.
+        
+        Only done once per user per process, so a restart doesn't trigger a
+        burst of live checks but stale stored values are still re-verified.
+        """
+        if not stored_status or user_id in self._warmed:
+            return
+        self._warmed[user_id] = None
+        if len(self._warmed) > self.max_entries:
+            self._warmed.popitem(last=False)
+        if self.get(user_id) is None:
+            self.set(user_id, True)
+    
+    def invalidate(self, user_id):
+        self._entries.pop(user_id, None)
+    
+    def prune(self):
+        """Drop expired entries"""
+        now = time.monotonic()
+        for user_id in [uid for uid, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            del self._entries[user_id]
+    
+    async def resolve(self, user_id, check):
+        """Return the cached status or run check(user_id), merging concurrent callers"""
+        status = self.get(user_id)
+        if status is not None:
+            metrics.CACHE_REQUESTS.inc('subscription', 'hit')
+            return status
+        
+        future = self._pending.get(user_id)
+        if future is None:
+            metrics.CACHE_REQUESTS.inc('subscription', 'miss')
+            future = asyncio.ensure_future(check(user_id))
+            self._pending[user_id] = future
+            future.add_done_callback(lambda done: self._finish(user_id, done))
+        else:
+            metrics.CACHE_REQUESTS.inc('subscription', 'merged')
+        return await asyncio.shield(future)
+    
+    def _finish(self, user_id, future):
+        self._pending.pop(user_id, None)
+        if not future.cancelled() and future.exception() is None:
+            self.set(user_id, future.result())
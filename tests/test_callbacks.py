@@ -0,0 +1,113 @@
+import os
+from unittest import mock
+
+import pytest
+
+from bot import MovieBot
+from callbacks import ACTION_CODES, MAX_LENGTH, action_name, decode, encode
+from database import Database, AsyncDatabase
+
+# Arguments each action's buttons are built with
+EXAMPLES = {
+    'lang': ('uz',),
+    'page': ('later', 1, 1700000000, 87),
+    'preview': ('movies', 0, 1700000000, 1042),
+    'open': ('history', 1042),
+    'watch': (1042,),
+    'later': (1042,),
+    'remove_later': (1042,)
+}
+
+
+@pytest.fixture
+def bot(tmp_path):
+    # Telethon is never called while routing
+    bot = MovieBot(db=AsyncDatabase(Database(os.path.join(tmp_path, 'bot.db'))), client=mock.Mock())
+    yield bot
+    bot.db.close()
+
+
+@pytest.fixture
+def router(bot):
+    return bot.callbacks
+
+
+def test_every_action_is_routed(router):
+    assert set(router.routes) == set(ACTION_CODES)
+
+
+def test_routes_reach_their_handlers(bot, router):
+    assert router.resolve(encode('watch', 1))[0].handler == bot.handle_watch
+    assert router.resolve(encode('later', 1))[0].handler == bot.handle_watch_later
+    assert router.resolve(encode('remove_later', 1))[0].handler == bot.handle_remove_watch_later
+    assert router.resolve(encode('lang', 'en'))[0].handler == bot.handle_language_selection
+
+
+def test_examples_cover_every_action():
+    assert set(EXAMPLES) == set(ACTION_CODES)
+
+
+@pytest.mark.parametrize('action', sorted(ACTION_CODES))
+def test_encode_decode_round_trip(router, action):
+    data = encode(action, *EXAMPLES[action])
+    assert decode(data) == ('1', action, [str(arg) for arg in EXAMPLES[action]])
+    assert action_name(data) == action
+    
+    route, args = router.resolve(data)
+    assert route.action == action
+    assert args == list(EXAMPLES[action])
+
+
+def test_encode_without_args():
+    assert decode(encode('watch')) == ('1', 'watch', [])
+
+
+@pytest.mark.parametrize('data, action, args', [
+    ('lang_ru', 'lang', ['ru']),
+    ('watch_AB12CD34', 'watch', ['AB12CD34']),
+    ('watch_later_AB12CD34', 'later', ['AB12CD34']),
+    ('remove_watch_later_AB12CD34', 'remove_later', ['AB12CD34']),
+    ('page_later', 'page', ['later']),
+    ('page_later_p_1700000000_87', 'page', ['later', '1', '1700000000', '87']),
+    ('page_history_n_1700000000_87', 'page', ['history', '0', '1700000000', '87']),
+    ('preview_movies_n_1700000000_5', 'preview', ['movies', '0', '1700000000', '5']),
+    ('open_later_AB12CD34', 'open', ['later', 'AB12CD34'])
+])
+def test_legacy_decoding_takes_the_longest_prefix(data, action, args):
+    assert decode(data) == ('0', action, args)
+
+
+def test_legacy_movie_ids_stay_strings(router):
+    route, args = router.resolve('watch_later_AB12CD34')
+    assert route.action == 'later'
+    assert args == ['AB12CD34']
+    
+    route, args = router.resolve('open_later_AB12CD34')
+    assert route.action == 'open'
+    assert args == ['later', 'AB12CD34']
+    
+    route, args = router.resolve('page_later_p_1700000000_87')
+    assert args == ['later', 1, 1700000000, 87]
+
+
+@pytest.mark.parametrize('data', [
+    '1w:abc',
+    '1w:1:2',
+    '1o:later',
+    '1p:later:1:1700000000:87:5',
+    '1z:1',
+    'unknown_1',
+    '',
+    None
+])
+def test_resolve_rejects(router, data):
+    assert router.resolve(data) == (None, [])
+
+
+def test_encode_rejects_data_over_the_limit():
+    assert len(encode('lang', 'x' * (MAX_LENGTH - len('1l:')))) == MAX_LENGTH
+    with pytest.raises(ValueError):
+        encode('lang', 'x' * MAX_LENGTH)
+    # The limit is in bytes, not characters
+    with pytest.raises(ValueError):
+        encode('lang', 'я' * (MAX_LENGTH // 2))
@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+import migrations
+from migrations import MIGRATIONS, create_base_schema, get_schema_version, run_migrations
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'movie_bot.db'))
+    yield conn
+    conn.close()
+
+
+def tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_versions_only_go_up():
+    versions = [version for version, _ in MIGRATIONS]
+    assert versions == sorted(set(versions))
+    assert versions[0] == 1
+
+
+def test_fresh_database_gets_every_migration_once(conn):
+    assert run_migrations(conn) == [version for version, _ in MIGRATIONS]
+    assert get_schema_version(conn) == MIGRATIONS[-1][0]
+    assert {'users', 'movies', 'watched_movies', 'watch_later', 'broadcasts', 'persistence'} <= tables(conn)
+    
+    assert run_migrations(conn) == []
+
+
+def test_upgrade_removes_duplicate_watch_rows(conn):
+    # A database from before versioning: the base schema, user_version 0
+    create_base_schema(conn.cursor())
+    conn.executemany(
+        'INSERT INTO watch_later (user_id, movie_id) VALUES (?, ?)',
+        [(1, 'AB12CD34'), (1, 'AB12CD34'), (1, 'EF56GH78'), (2, 'AB12CD34')]
+    )
+    conn.commit()
+    
+    run_migrations(conn)
+    
+    assert conn.execute('SELECT COUNT(*) FROM watch_later').fetchone()[0] == 3
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO watch_later (user_id, movie_id) VALUES (1, 'AB12CD34')")
+
+
+def test_failed_migration_is_rolled_back(conn, monkeypatch):
+    def broken(cursor):
+        cursor.execute('CREATE TABLE half_done (id INTEGER)')
+        raise RuntimeError('boom')
+    
+    monkeypatch.setattr(migrations, 'MIGRATIONS', [MIGRATIONS[0], (2, broken)])
+    with pytest.raises(RuntimeError):
+        run_migrations(conn)
+    
+    assert get_schema_version(conn) == 1
+    assert 'half_done' not in tables(conn)
@@ -0,0 +1,73 @@
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(db_path=str(tmp_path / 'movie_bot.db'))
+    for number in range(25):
+        db.add_movie(f'M{number:07d}', f'Movie {number}', '', 'Drama', 2000, f'file{number}', 'video', None)
+    conn = db.get_connection()
+    # Some movies share a timestamp, so ties have to be broken by id
+    conn.execute("UPDATE movies SET added_at = datetime('2024-01-01', '+' || (id / 3) || ' hours')")
+    conn.commit()
+    db.release_connection(conn)
+    yield db
+    db.close()
+
+
+def newest_first(db):
+    conn = db.get_connection()
+    movie_ids = [row[0] for row in conn.execute('SELECT movie_id FROM movies ORDER BY added_at DESC, id DESC')]
+    db.release_connection(conn)
+    return movie_ids
+
+
+def walk(fetch, limit):
+    """Every page from the first one on, following the next cursors"""
+    pages = [fetch(None, False, limit)]
+    while pages[-1]['next']:
+        pages.append(fetch(pages[-1]['next'], False, limit))
+    return pages
+
+
+def movie_ids(page):
+    return [movie[1] for movie in page['movies']]
+
+
+def test_pages_cover_the_catalog_once_in_order(db):
+    pages = walk(db.get_movies_page, 10)
+    assert [len(page['movies']) for page in pages] == [10, 10, 5]
+    assert [movie_id for page in pages for movie_id in movie_ids(page)] == newest_first(db)
+    assert pages[0]['prev'] is None
+    assert pages[-1]['next'] is None
+
+
+def test_prev_cursors_lead_back_to_the_same_pages(db):
+    pages = walk(db.get_movies_page, 10)
+    page = pages[-1]
+    for expected in reversed(pages[:-1]):
+        page = db.get_movies_page(page['prev'], True, 10)
+        assert movie_ids(page) == movie_ids(expected)
+    assert page['prev'] is None
+
+
+def test_exact_multiple_has_no_empty_last_page(db):
+    pages = walk(db.get_movies_page, 5)
+    assert [len(page['movies']) for page in pages] == [5] * 5
+
+
+def test_watch_list_pages_are_per_user(db):
+    for number in range(12):
+        db.add_to_watch_later(1, f'M{number:07d}')
+    db.add_to_watch_later(2, 'M0000000')
+    
+    pages = walk(lambda cursor, backwards, limit: db.get_watch_later_page(1, cursor, backwards, limit), 5)
+    seen = [movie_id for page in pages for movie_id in movie_ids(page)]
+    assert sorted(seen) == [f'M{number:07d}' for number in range(12)]
+    assert movie_ids(db.get_watch_later_page(2)) == ['M0000000']
+
+
+def test_empty_list(db):
+    assert db.get_watched_page(1) == {'movies': [], 'next': None, 'prev': None}
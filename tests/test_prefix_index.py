@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from database import Database, AsyncDatabase
+from prefix_index import PrefixIndex, normalize_words
+
+ROWS = [
+    (1, 'M1', 'The Dark Knight', 2008, 'Action'),
+    (2, 'M2', 'Dark City', 1998, 'Drama'),
+    (3, 'M3', 'Ёлки', 2010, 'Комедия'),
+    (4, 'M4', "O'zbekcha sevgi", 2015, 'Drama'),
+    (5, 'M5', 'Knight and Day', 2010, 'Comedy')
+]
+
+
+@pytest.fixture
+def index():
+    index = PrefixIndex(db=None, refresh_interval=60)
+    index.add(ROWS)
+    return index
+
+
+def titles(movies):
+    return [movie[1] for movie in movies]
+
+
+def test_normalize_words_folds_like_the_search_index():
+    assert normalize_words("Ёлки O'zbek ʻTest") == ['елки', 'o', 'zbek', 'test']
+    assert normalize_words(None) == []
+
+
+def test_prefix_matches_any_title_word(index):
+    assert titles(index.search('dar')[0]) == ['Dark City', 'The Dark Knight']
+    assert titles(index.search('KNI')[0]) == ['Knight and Day', 'The Dark Knight']
+    assert titles(index.search('елк')[0]) == ['Ёлки']
+    assert titles(index.search('zbek')[0]) == ["O'zbekcha sevgi"]
+    assert index.search('xyz') == ([], None)
+
+
+def test_every_query_word_must_match(index):
+    assert titles(index.search('dark kni')[0]) == ['The Dark Knight']
+    assert titles(index.search('kni dark')[0]) == ['The Dark Knight']
+
+
+def test_empty_query_lists_newest_first(index):
+    assert titles(index.search('', limit=2)[0]) == ['Knight and Day', "O'zbekcha sevgi"]
+
+
+def test_offsets_page_through_matches(index):
+    page, next_offset = index.search('', limit=2)
+    assert next_offset == 2
+    page, next_offset = index.search('', next_offset, 2)
+    assert titles(page) == ['Ёлки', 'Dark City']
+    page, next_offset = index.search('', next_offset, 2)
+    assert titles(page) == ['The Dark Knight']
+    assert next_offset is None
+
+
+def test_removed_and_replaced_titles(index):
+    index.remove('M2')
+    assert titles(index.search('dark')[0]) == ['The Dark Knight']
+    index.add([(6, 'M1', 'Bright Knight', 2020, 'Action')])
+    assert titles(index.search('dark')[0]) == []
+    assert titles(index.search('bri')[0]) == ['Bright Knight']
+    assert len(index) == 4
+
+
+def test_refresh_picks_up_additions_and_deletions(tmp_path):
+    async def main():
+        database = Database(db_path=str(tmp_path / 'movie_bot.db'))
+        db = AsyncDatabase(database)
+        database.add_movie('M1', 'Alien', '', '', 1979, 'f1', 'video', None)
+        database.add_movie('M2', 'Aliens', '', '', 1986, 'f2', 'video', None)
+        index = PrefixIndex(db, refresh_interval=60)
+        await index.ensure_loaded()
+        try:
+            # A deletion balanced by an addition leaves the count unchanged
+            database.delete_movie('M2')
+            database.add_movie('M3', 'Avatar', '', '', 2009, 'f3', 'video', None)
+            await index.refresh()
+            assert sorted(titles(index.search('a')[0])) == ['Alien', 'Avatar']
+        finally:
+            await index.stop()
+            db.close()
+    
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter
+
+from send_scheduler import BULK, INTERACTIVE, SendScheduler, TokenBucket
+
+
+def test_bucket_starts_full_and_refills_at_its_rate():
+    bucket = TokenBucket(rate=2, capacity=3)
+    now = bucket.updated
+    for _ in range(3):
+        assert bucket.delay(now) == 0
+        bucket.consume(now)
+    assert bucket.delay(now) == pytest.approx(0.5)
+    assert bucket.delay(now + 0.5) == 0
+
+
+def test_bucket_never_stores_more_than_capacity():
+    bucket = TokenBucket(rate=10, capacity=2)
+    now = bucket.updated
+    bucket.consume(now)
+    bucket.consume(now)
+    assert not bucket.is_idle(now)
+    # Ten tokens' worth of time later it holds only its capacity
+    assert bucket.is_idle(now + 1)
+    assert bucket.tokens == 2
+
+
+def scheduler(**overrides):
+    settings = dict(
+        global_rate=1000, global_burst=1000, per_chat_rate=1000, per_chat_burst=1000,
+        max_in_flight=10, max_retries=2
+    )
+    settings.update(overrides)
+    return SendScheduler(**settings)
+
+
+def test_send_returns_the_result_and_raises_errors():
+    async def main():
+        sender = scheduler()
+        
+        async def echo(text):
+            return text
+        
+        async def broken():
+            raise ValueError('bad request')
+        
+        assert await sender.send(1, echo, 'hi') == 'hi'
+        with pytest.raises(ValueError):
+            await sender.send(1, broken)
+        await sender.stop()
+        assert sender.counters['sent'] == 1
+        assert sender.counters['failed'] == 1
+    
+    asyncio.run(main())
+
+
+def test_interactive_sends_go_ahead_of_bulk():
+    async def main():
+        sender = scheduler(max_in_flight=1)
+        order = []
+        gate = asyncio.Event()
+        
+        async def blocker():
+            await gate.wait()
+        
+        async def record(name):
+            order.append(name)
+        
+        first = asyncio.create_task(sender.send(1, blocker))
+        await asyncio.sleep(0.01)
+        queued = [
+            asyncio.create_task(sender.send(chat_id, record, f'bulk{chat_id}', priority=BULK)) for chat_id in (2, 3)
+        ]
+        queued.append(asyncio.create_task(sender.send(4, record, 'interactive', priority=INTERACTIVE)))
+        await asyncio.sleep(0.01)
+        gate.set()
+        await asyncio.gather(first, *queued)
+        await sender.stop()
+        assert order == ['interactive', 'bulk2', 'bulk3']
+    
+    asyncio.run(main())
+
+
+def test_retry_after_is_retried_then_given_up():
+    async def main():
+        sender = scheduler(max_retries=1)
+        calls = []
+        
+        async def flooded():
+            calls.append(1)
+            raise RetryAfter(0)
+        
+        with pytest.raises(RetryAfter):
+            await asyncio.wait_for(sender.send(1, flooded), 1)
+        await sender.stop()
+        assert len(calls) == 2
+        assert sender.counters['retried'] == 1
+        assert sender.counters['flood_waits'] == 2
+    
+    asyncio.run(main())
+
+
+def test_a_chat_over_its_limit_doesnt_hold_up_others():
+    async def main():
+        # One send per chat, and the next one for that chat only after ~1000s
+        sender = scheduler(per_chat_rate=0.001, per_chat_burst=1)
+        
+        async def ok(name):
+            return name
+        
+        assert await sender.send(1, ok, 'a1') == 'a1'
+        waiting = asyncio.create_task(sender.send(1, ok, 'a2'))
+        assert await asyncio.wait_for(sender.send(2, ok, 'b1'), 1) == 'b1'
+        assert not waiting.done()
+        assert sender.stats()['delayed'] == 1
+        
+        await sender.stop()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+    
+    asyncio.run(main())
+
+
+def test_stop_cancels_sends_still_running_after_the_timeout():
+    async def main():
+        sender = scheduler()
+        
+        async def hangs():
+            await asyncio.Event().wait()
+        
+        pending = asyncio.create_task(sender.send(1, hangs))
+        await asyncio.sleep(0.01)
+        await sender.stop(timeout=0.01)
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+        assert sender.stats()['in_flight'] == 0
+    
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+import asyncio
+import types
+
+import pytest
+
+import subscription
+from subscription import SubscriptionCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(subscription, 'time', types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_positive_and_negative_results_expire_separately(clock):
+    cache = SubscriptionCache(positive_ttl=60, negative_ttl=10)
+    cache.set(1, True)
+    cache.set(2, False)
+    assert cache.get(1) is True
+    assert cache.get(2) is False
+    
+    clock.now += 10
+    assert cache.get(1) is True
+    assert cache.get(2) is None
+    
+    clock.now += 50
+    assert cache.get(1) is None
+
+
+def test_full_cache_evicts_the_oldest_entry(clock):
+    cache = SubscriptionCache(60, 60, max_entries=3)
+    for user_id in range(1, 4):
+        cache.set(user_id, True)
+    # Setting again makes an entry the newest
+    cache.set(1, False)
+    cache.set(4, True)
+    assert cache.get(2) is None
+    assert [cache.get(user_id) for user_id in (1, 3, 4)] == [False, True, True]
+    assert len(cache._entries) == 3
+
+
+def test_warm_seeds_once_per_user_and_stays_bounded(clock):
+    cache = SubscriptionCache(60, 60, max_entries=2)
+    cache.warm(1, 0)
+    assert cache.get(1) is None
+    
+    cache.warm(1, 1)
+    assert cache.get(1) is True
+    cache.invalidate(1)
+    # Already warmed: a stale stored status isn't trusted again
+    cache.warm(1, 1)
+    assert cache.get(1) is None
+    
+    for user_id in range(2, 10):
+        cache.warm(user_id, 1)
+    assert len(cache._warmed) == 2
+
+
+def test_prune_drops_only_expired_entries(clock):
+    cache = SubscriptionCache(60, 10)
+    cache.set(1, True)
+    cache.set(2, False)
+    clock.now += 30
+    cache.prune()
+    assert list(cache._entries) == [1]
+
+
+def test_concurrent_checks_for_a_user_are_merged(clock):
+    cache = SubscriptionCache(60, 60)
+    calls = []
+    
+    async def check(user_id):
+        calls.append(user_id)
+        await asyncio.sleep(0.01)
+        return True
+    
+    async def main():
+        results = await asyncio.gather(*(cache.resolve(7, check) for _ in range(5)))
+        assert results == [True] * 5
+        assert await cache.resolve(7, check) is True
+    
+    asyncio.run(main())
+    assert calls == [7]
+
+
+def test_failed_check_is_not_cached(clock):
+    cache = SubscriptionCache(60, 60)
+    
+    async def check(user_id):
+        raise ConnectionError('telethon down')
+    
+    async def main():
+        with pytest.raises(ConnectionError):
+            await cache.resolve(7, check)
+    
+    asyncio.run(main())
+    assert cache.get(7) is None
+    assert cache._pending == {}
@@ -0,0 +1,119 @@
+import asyncio
+import collections
+import datetime
+import random
+
+from telegram import Chat, Message, Update, User
+
+from update_processor import PerUserUpdateProcessor
+
+
+def text_update(update_id, user_id, text):
+    user = User(user_id, f'user{user_id}', False)
+    chat = Chat(user_id, Chat.PRIVATE)
+    message = Message(update_id, datetime.datetime.now(datetime.timezone.utc), chat, from_user=user, text=text)
+    return Update(update_id, message=message)
+
+
+def run_interleaved(processor, users, messages, seed=1):
+    """Feed every user's numbered burst, randomly interleaved; returns (numbers seen per user, stats)"""
+    seen = collections.defaultdict(list)
+    stats = {'running': 0, 'peak': 0, 'user_overlaps': 0}
+    running_users = set()
+    
+    async def handle(user_id, number):
+        if user_id in running_users:
+            stats['user_overlaps'] += 1
+        running_users.add(user_id)
+        stats['running'] += 1
+        stats['peak'] = max(stats['peak'], stats['running'])
+        try:
+            seen[user_id].append(number)
+            await asyncio.sleep(rng.uniform(0, 0.003))
+        finally:
+            stats['running'] -= 1
+            running_users.discard(user_id)
+    
+    rng = random.Random(seed)
+    order = [user_id for user_id in range(1, users + 1) for _ in range(messages)]
+    rng.shuffle(order)
+    
+    async def main():
+        counters = collections.Counter()
+        tasks = []
+        for update_id, user_id in enumerate(order, 1):
+            number = counters[user_id]
+            counters[user_id] += 1
+            update = text_update(update_id, user_id, str(number))
+            # As Application does: one task per update, started in arrival order
+            tasks.append(asyncio.create_task(processor.process_update(update, handle(user_id, number))))
+            if rng.random() < 0.3:
+                await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+    
+    asyncio.run(main())
+    return seen, stats
+
+
+def test_each_users_updates_run_in_order():
+    seen, stats = run_interleaved(PerUserUpdateProcessor(8), users=20, messages=15)
+    assert len(seen) == 20
+    for numbers in seen.values():
+        assert numbers == list(range(15))
+    assert stats['user_overlaps'] == 0
+
+
+def test_concurrency_is_capped():
+    seen, stats = run_interleaved(PerUserUpdateProcessor(4), users=30, messages=5)
+    assert sum(len(numbers) for numbers in seen.values()) == 150
+    # Different users do run side by side, up to the limit
+    assert stats['peak'] == 4
+
+
+def test_one_users_burst_leaves_slots_for_others():
+    processor = PerUserUpdateProcessor(2)
+    started = []
+    
+    async def handle(user_id, gate=None):
+        started.append(user_id)
+        if gate:
+            await gate.wait()
+    
+    async def main():
+        gate = asyncio.Event()
+        burst = [
+            asyncio.create_task(processor.process_update(text_update(n, 1, 'x'), handle(1, gate)))
+            for n in range(5)
+        ]
+        await asyncio.sleep(0.01)
+        # User 1 holds one slot and queues the rest behind their own lock
+        other = asyncio.create_task(processor.process_update(text_update(10, 2, 'x'), handle(2)))
+        await asyncio.wait_for(other, 1)
+        assert started == [1, 2]
+        gate.set()
+        await asyncio.gather(*burst)
+    
+    asyncio.run(main())
+
+
+def test_idle_users_are_forgotten():
+    processor = PerUserUpdateProcessor(4)
+    run_interleaved(processor, users=10, messages=3)
+    assert processor.waiting() == 0
+
+
+def test_updates_without_a_user_still_take_a_slot():
+    processor = PerUserUpdateProcessor(1)
+    running = []
+    
+    async def handle():
+        running.append(1)
+        assert len(running) == 1
+        await asyncio.sleep(0.001)
+        running.pop()
+    
+    async def main():
+        await asyncio.gather(*(processor.process_update(object(), handle()) for _ in range(5)))
+    
+    asyncio.run(main())
+    assert processor.max_concurrent_updates == 1
@@ -0,0 +1,84 @@
+"""Trending movies: time-decayed watch counts, ranked ahead of time.
+
+Every watch event counts 0.5 ** (age / half life) towards its movie within
+a period's span, so a movie watched a lot in the last hours outranks one
+that was busy yesterday. The all-time list is plain watcher counts. Lists
+are ranked for everyone and, when enabled, for the watchers of each
+language, and written to trending_scores by a background refresh; the
+Trending menu reads a page of a list by rank.
+"""
+import asyncio
+import collections
+import heapq
+
+# period -> (span in hours, half life in hours); None spans the whole history
+PERIODS = {
+    '24h': (24, 6),
+    '7d': (7 * 24, 48),
+    'all': (None, None)
+}
+DEFAULT_PERIOD = '7d'
+
+
+def rank_lists(scores, size):
+    """{(period, language): {movie_id: score}} -> (period, language, rank, movie_id, score) rows"""
+    rows = []
+    for (period, language), movie_scores in scores.items():
+        top = heapq.nlargest(size, movie_scores.items(), key=lambda item: (item[1], item[0]))
+        rows.extend((period, language, rank, movie_id, score) for rank, (movie_id, score) in enumerate(top))
+    return rows
+
+
+class Trending:
+    """Background refresh of the ranked trending lists (primary worker only)"""
+    
+    def __init__(self, db, refresh_interval, size, by_language):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.size = size
+        self.by_language = by_language
+        self._task = None
+    
+    def rank(self, recent, totals):
+        """Ranked rows from get_recent_watches and get_watch_totals results"""
+        scores = collections.defaultdict(collections.Counter)
+        
+        def add(period, language, movie_id, score):
+            scores[period, ''][movie_id] += score
+            if self.by_language and language:
+                scores[period, language][movie_id] += score
+        
+        for movie_id, language, age, events in recent:
+            for period, (span, half_life) in PERIODS.items():
+                if span and age < span:
+                    add(period, language, movie_id, events * 0.5 ** (age / half_life))
+        for movie_id, language, watchers in totals:
+            add('all', language, movie_id, watchers)
+        return rank_lists(scores, self.size)
+    
+    async def refresh(self):
+        """Recompute every list from the watch history; returns the number of ranked rows"""
+        longest = max(span for span, _ in PERIODS.values() if span)
+        recent = await self.db.get_recent_watches(longest)
+        totals = await self.db.get_watch_totals()
+        rows = await asyncio.get_running_loop().run_in_executor(None, self.rank, recent, totals)
+        await self.db.replace_trending(rows)
+        return len(rows)
+    
+    async def _refresh_loop(self, delay):
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error refreshing trending lists: {e}")
+            await asyncio.sleep(self.refresh_interval)
+    
+    def start(self, delay=0):
+        """Refresh every refresh_interval, the first time after delay seconds"""
+        self._task = asyncio.create_task(self._refresh_loop(delay))
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
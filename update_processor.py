@@ -0,0 +1,74 @@
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Base class semaphore size that never limits anything
+UNBOUNDED = 1 << 30
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Process updates from different users concurrently, each user's in order.
+    
+    An update first waits for its user's lock and only then takes one of the
+    max_concurrent_updates slots, so a user sending a burst queues behind
+    their own updates instead of filling every slot, and flags kept in
+    context.user_data are never touched by two of that user's updates at once.
+    Locks are handed out in arrival order and dropped when a user goes idle.
+    """
+    
+    def __init__(self, max_concurrent_updates):
+        # BaseUpdateProcessor.process_update (final) takes the base semaphore
+        # before do_process_update runs, i.e. before the user's lock. The base
+        # class sizes it from max_concurrent_updates, which reads as UNBOUNDED
+        # until _limit is set, so it never blocks; _slots is the real limit,
+        # taken after the lock
+        if max_concurrent_updates < 1:
+            raise ValueError('max_concurrent_updates must be a positive integer')
+        self._limit = None
+        super().__init__(UNBOUNDED)
+        self._limit = max_concurrent_updates
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._users = {}
+    
+    @property
+    def max_concurrent_updates(self):
+        return UNBOUNDED if self._limit is None else self._limit
+    
+    @staticmethod
+    def ordering_key(update):
+        if isinstance(update, Update):
+            if update.effective_user:
+                return update.effective_user.id
+            if update.effective_chat:
+                return update.effective_chat.id
+        return None
+    
+    def waiting(self):
+        """Number of users with updates queued or running"""
+        return len(self._users)
+    
+    async def do_process_update(self, update, coroutine):
+        key = self.ordering_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+        
+        entry = self._users.get(key)
+        if entry is None:
+            entry = self._users[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._slots:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._users[key]
+    
+    async def initialize(self):
+        pass
+    
+    async def shutdown(self):
+        pass
@@ -0,0 +1,67 @@
+import asyncio
+
+
+class ViewCounter:
+    """Write-behind aggregation of movie view counts.
+    
+    Views are summed in memory per movie and written to movies.views in one
+    batched transaction every flush_interval seconds, or sooner once
+    max_pending views have piled up. stop() flushes whatever is left.
+    """
+    
+    def __init__(self, db, flush_interval, max_pending):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._pending_total = 0
+        self._in_flight = {}
+        self._flush_lock = asyncio.Lock()
+        # Early flushes started by add(), referenced until they finish
+        self._flushing = set()
+        self._task = None
+    
+    def add(self, movie_id, count=1):
+        self._pending[movie_id] = self._pending.get(movie_id, 0) + count
+        self._pending_total += count
+        if self._pending_total >= self.max_pending and not self._flush_lock.locked():
+            task = asyncio.create_task(self.flush())
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+    
+    def pending(self, movie_id):
+        """Views not yet in the database, to add to the stored count"""
+        return self._pending.get(movie_id, 0) + self._in_flight.get(movie_id, 0)
+    
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._in_flight, self._pending = self._pending, {}
+            self._pending_total = 0
+            try:
+                await self.db.add_views(self._in_flight)
+            except Exception as e:
+                print(f"Error flushing view counts: {e}")
+                # Keep the counts for the next attempt
+                for movie_id, count in self._in_flight.items():
+                    self._pending[movie_id] = self._pending.get(movie_id, 0) + count
+                    self._pending_total += count
+            finally:
+                self._in_flight = {}
+    
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    def start(self):
+        self._task = asyncio.create_task(self._flush_loop())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._flushing:
+            await asyncio.wait(set(self._flushing))
+        await self.flush()